@@ -0,0 +1,61 @@
+"""
+Import-time benchmark for chart_builder.
+
+Imports the package in fresh interpreters and reports the median wall time.
+Fails (exit code 1) if the import pulls in one of the optional heavy
+dependencies that should only load inside the functions that use them, or if
+it takes longer than --budget seconds.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --module chart_builder.scripts.plots --budget 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Only needed by show_file_and_img, or no longer used at all
+LAZY_MODULES = ('matplotlib', 'colorcet', 'IPython', 'networkx', 'svgwrite', 'plotly.express')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(seconds=elapsed, loaded=[m for m in {lazy!r} if m in sys.modules])))
+"""
+
+def time_import(module, repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    code = PROBE.format(module=module, lazy=LAZY_MODULES)
+
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(run['seconds'] for run in runs), sorted(set().union(*(run['loaded'] for run in runs)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='chart_builder.scripts.visualization_pipeline')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='fail if the median import takes longer (seconds)')
+    args = parser.parse_args()
+
+    seconds, loaded = time_import(args.module, repeat=args.repeat)
+    print(f'import {args.module}: {seconds:.3f}s (median of {args.repeat})')
+
+    failed = False
+    if loaded:
+        print(f'FAIL: imported eagerly: {", ".join(loaded)}')
+        failed = True
+    if args.budget is not None and seconds > args.budget:
+        print(f'FAIL: over the {args.budget:.2f}s budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import inspect
+import os
+import time
+import traceback
+import atexit
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chart_builder.scripts.diagnostics import logger
+from chart_builder.scripts.render import render_session
+from chart_builder.scripts.utils import main
+from chart_builder.scripts.visualization_pipeline import visualization_pipeline
+
+PIPELINE_ARGS = frozenset(inspect.signature(visualization_pipeline.__init__).parameters) - {'self'}
+MAIN_ARGS = frozenset(inspect.signature(main).parameters) - {'fig'}
+
+# Batch runs are headless: don't open a browser tab or dump frames per chart
+MAIN_DEFAULTS = dict(show=False, show_index_and_cols=False)
+
+# One render session per worker process, opened by the pool initializer
+_worker_session = None
+
+def split_spec(spec):
+    """
+    Split one chart spec into (visualization_pipeline kwargs, main kwargs).
+
+    Keys of visualization_pipeline.__init__ go to the pipeline, keys of utils.main go
+    to main. A few names exist in both with different meanings (title, subtitle,
+    groupby, ...); flat keys always go to the pipeline, so pass main's versions in
+    a nested 'main' dict:
+
+        dict(chart_type='line', title='tvl_chart', file='tvl.csv', cols_to_plot=['TVL'],
+             main=dict(title='Total Value Locked', save=True))
+    """
+    spec = dict(spec)
+    main_kwargs = dict(MAIN_DEFAULTS)
+    main_kwargs.update(spec.pop('main', None) or {})
+
+    pipeline_kwargs = {}
+    unknown = []
+    for key, value in spec.items():
+        if key in PIPELINE_ARGS:
+            pipeline_kwargs[key] = value
+        elif key in MAIN_ARGS:
+            main_kwargs[key] = value
+        else:
+            unknown.append(key)
+
+    unknown += [key for key in main_kwargs if key not in MAIN_ARGS]
+    if unknown:
+        raise TypeError(f'Unknown chart spec keys: {sorted(set(unknown))}')
+
+    return pipeline_kwargs, main_kwargs
+
+def render_one(spec, index=0):
+    """Build and export a single spec, returning its timing/error record."""
+    start = time.perf_counter()
+    title = spec.get('title') if isinstance(spec, dict) else None
+    result = dict(index=index, title=title, seconds=None, error=None, traceback=None)
+
+    try:
+        pipeline_kwargs, main_kwargs = split_spec(spec)
+        fig = visualization_pipeline(**pipeline_kwargs)
+        main(fig, **main_kwargs)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+        result['traceback'] = traceback.format_exc()
+        logger.warning('chart %s (%s) failed: %s', index, title, result['error'])
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _close_worker_session():
+    global _worker_session
+    if _worker_session is not None:
+        _worker_session.close()
+        _worker_session = None
+
+def _init_worker(open_session):
+    global _worker_session
+    if not open_session:
+        return
+    try:
+        _worker_session = render_session().open()
+        atexit.register(_close_worker_session)
+    except Exception as e:
+        # Without a shared renderer each export falls back to a one-off render
+        logger.warning('Could not start a render session in worker %s: %s', os.getpid(), e)
+
+def render_batch(specs, workers=None, use_render_session=True):
+    """
+    Build and export many charts across a process pool.
+
+    specs: list of dicts of visualization_pipeline kwargs plus utils.main options
+    (see split_spec). Every chart runs to completion or failure independently; the
+    return value is one dict per spec, in input order, with index, title, seconds,
+    error and traceback (error/traceback are None on success).
+
+    workers: number of processes (default os.cpu_count()). workers=1 renders in
+    this process, which is easier to debug.
+    """
+    specs = list(specs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(specs) or 1))
+
+    logger.debug('rendering %s charts on %s workers', len(specs), workers)
+
+    if workers == 1:
+        if use_render_session:
+            try:
+                session = render_session().open()
+            except Exception as e:
+                logger.warning('Could not start a render session: %s', e)
+                session = None
+        else:
+            session = None
+        try:
+            return [render_one(spec, index) for index, spec in enumerate(specs)]
+        finally:
+            if session is not None:
+                session.close()
+
+    results = [None] * len(specs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(use_render_session,)) as pool:
+        futures = {pool.submit(render_one, spec, index): index for index, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                # The worker itself died (or the spec couldn't be pickled)
+                results[index] = dict(index=index, title=specs[index].get('title') if isinstance(specs[index], dict) else None,
+                                      seconds=None, error=f'{type(e).__name__}: {e}', traceback=traceback.format_exc())
+                logger.warning('chart %s failed in the pool: %s', index, e)
+
+    return results
@@ -0,0 +1,190 @@
+import datetime as dt
+import hashlib
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+from chart_builder.scripts.diagnostics import logger
+from chart_builder.scripts.frames import share
+
+def _freeze(value):
+    # Make processing options hashable/reprable in a stable way
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, pd.Index)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def file_fingerprint(path, hash_content=False):
+    """(abspath, mtime_ns, size[, sha1]) for a file, or None if it can't be stat'ed."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+
+    fingerprint = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if hash_content:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint += (digest.hexdigest(),)
+    return fingerprint
+
+# Memory the in-memory tier may hold, summed over its frames
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+class data_cache():
+    """
+    Cache of processed DataFrames keyed on the source file plus processing options.
+
+    The key is the file's path, mtime and size (plus a content hash when
+    hash_content=True), the data_processing arguments and today's date (clean_dates
+    trims relative to today). Entries live in an in-memory LRU of at most max_items
+    frames and max_bytes bytes (memory_usage(deep=True)); a frame larger than
+    max_bytes is not kept in memory at all. With disk_dir set they are also written
+    there as Parquet or Feather so a new process can skip parsing too. Frames go
+    in and out through frames.share: under copy-on-write that is a shallow copy
+    that only copies when one side is written to, otherwise a full copy. Either
+    way, writes to a returned frame don't reach the cached one.
+    """
+    def __init__(self, max_items=16, disk_dir=None, disk_format='parquet', hash_content=False, max_bytes=DEFAULT_MAX_BYTES):
+        if disk_format not in ('parquet', 'feather'):
+            raise ValueError("disk_format must be 'parquet' or 'feather'")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._sizes = {}
+        self.disk_dir = disk_dir
+        self.disk_format = disk_format
+        self.hash_content = hash_content
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+
+    def key(self, path, options):
+        fingerprint = file_fingerprint(path, hash_content=self.hash_content)
+        if fingerprint is None:
+            return None
+        return (fingerprint, _freeze(options), dt.date.today().isoformat())
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f'{digest}.{self.disk_format}')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        disk_path = self._disk_path(key)
+        if not os.path.exists(disk_path):
+            return None
+        try:
+            if self.disk_format == 'parquet':
+                df = pd.read_parquet(disk_path)
+            else:
+                df = pd.read_feather(disk_path)
+                # Feather can't hold an index, it was stored as the first column
+                df = df.set_index(df.columns[0])
+                if df.index.name == '__index__':
+                    df.index.name = None
+        except Exception as e:
+            logger.warning('Warning: could not read cached frame %s: %s', disk_path, e)
+            return None
+
+        if isinstance(df.index, pd.DatetimeIndex) and df.index.freq is None and len(df.index) > 2:
+            # Resampled indexes carry a freq that the file formats drop
+            df.index.freq = df.index.inferred_freq
+        return df
+
+    def _write_disk(self, key, df):
+        if not self.disk_dir:
+            return
+        disk_path = self._disk_path(key)
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            if self.disk_format == 'parquet':
+                df.to_parquet(disk_path)
+            else:
+                out = df.reset_index()
+                if df.index.name is None:
+                    out = out.rename(columns={out.columns[0]: '__index__'})
+                out.to_feather(disk_path)
+        except Exception as e:
+            # e.g. non-string column names or mixed object columns
+            logger.debug('not caching %s on disk: %s', disk_path, e)
+
+    def get(self, key):
+        if key is None:
+            return None
+
+        df = self._frames.get(key)
+        if df is not None:
+            self._frames.move_to_end(key)
+        else:
+            df = self._read_disk(key)
+            if df is None:
+                return None
+            self._remember(key, df)
+
+        self.hits += 1
+        return share(df)
+
+    def _forget(self, key):
+        self._frames.pop(key, None)
+        self.nbytes -= self._sizes.pop(key, 0)
+
+    def _remember(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        self._forget(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.debug('not caching a %s byte frame in memory (max_bytes=%s)', size, self.max_bytes)
+            return
+        self._frames[key] = df
+        self._sizes[key] = size
+        self.nbytes += size
+        while len(self._frames) > self.max_items or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            self._forget(next(iter(self._frames)))
+
+    def put(self, key, df):
+        if key is None or df is None:
+            return
+        df = share(df)
+        self._remember(key, df)
+        self._write_disk(key, df)
+
+    def fetch(self, path, options, build):
+        """Return the cached frame for (path, options), calling build() on a miss."""
+        key = self.key(path, options)
+        df = self.get(key)
+        if df is not None:
+            logger.debug('cache hit: %s', path)
+            return df
+
+        self.misses += 1
+        logger.debug('cache miss: %s', path)
+        df = build()
+        self.put(key, df)
+        return df
+
+    def clear(self, disk=False):
+        self._frames.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(('.parquet', '.feather')):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+# Shared cache used by data_processing(cache=True)
+default_cache = data_cache()
+
+def configure_cache(max_items=16, disk_dir=None, disk_format='parquet', hash_content=False, max_bytes=DEFAULT_MAX_BYTES):
+    """Replace the shared cache, e.g. to add an on-disk tier."""
+    global default_cache
+    default_cache = data_cache(max_items=max_items, disk_dir=disk_dir, disk_format=disk_format,
+                               hash_content=hash_content, max_bytes=max_bytes)
+    return default_cache
+
+def get_default_cache():
+    return default_cache
@@ -0,0 +1,51 @@
+import logging
+import sys
+
+# All chart_builder diagnostics go through this logger. Nothing below WARNING is
+# emitted (or formatted) unless debug output is switched on with set_debug().
+logger = logging.getLogger('chart_builder')
+
+_debug_handler = None
+
+class lazy():
+    """
+    Defers an expensive log argument until a handler actually formats the message.
+
+    Usage: logger.debug('unique values: %s', lazy(lambda: df[col].unique()))
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+    def __repr__(self):
+        return repr(self.func())
+
+def set_debug(enabled=True, stream=None, fmt='%(message)s'):
+    """
+    Turn chart_builder's debug output on or off.
+
+    When enabled, every diagnostic message (including DataFrame dumps) is written
+    to `stream` (stdout by default), giving the same information the pipeline used
+    to print unconditionally.
+    """
+    global _debug_handler
+
+    if _debug_handler is not None:
+        logger.removeHandler(_debug_handler)
+        _debug_handler = None
+
+    if enabled:
+        _debug_handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        _debug_handler.setFormatter(logging.Formatter(fmt))
+        logger.addHandler(_debug_handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    else:
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+
+def set_level(level):
+    """Set the chart_builder log level (e.g. logging.INFO) without attaching a handler."""
+    logger.setLevel(level)
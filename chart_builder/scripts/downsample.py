@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+def target_points(width, points_per_px=2):
+    """How many points a series of a chart `width` px wide needs to look the same."""
+    return max(int(width * points_per_px), 4)
+
+def _resolve_method(method):
+    # downsample=True means the default method
+    if method is True:
+        return 'minmax'
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {DOWNSAMPLE_METHODS}, True or None, not {method!r}")
+    return method
+
+def _x_values(index):
+    # Numeric x for LTTB's triangle areas; anything else is treated as evenly spaced
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(float)
+    if pd.api.types.is_numeric_dtype(index):
+        return index.to_numpy(dtype=float)
+    return np.arange(len(index), dtype=float)
+
+def _buckets(values, n_buckets, fill):
+    # values padded with `fill` and reshaped to (n_buckets, size) of consecutive rows
+    size = -(-len(values) // n_buckets)
+    padded = np.full(n_buckets * size, fill, dtype=values.dtype)
+    padded[:len(values)] = values
+    return padded.reshape(n_buckets, size), size
+
+def _gap_markers(missing, n_buckets):
+    # First missing row of every bucket that has one, so gaps survive decimation
+    rows, size = _buckets(missing, n_buckets, False)
+    has_gap = rows.any(axis=1)
+    return (np.nonzero(has_gap)[0] * size + rows[has_gap].argmax(axis=1))
+
+def minmax_indices(y, n_out):
+    """Row positions of the min and max of each of n_out // 2 equal buckets of y."""
+    y = np.asarray(y, dtype=float)
+    n_buckets = max(n_out // 2, 1)
+    missing = np.isnan(y)
+
+    highs, size = _buckets(np.where(missing, -np.inf, y), n_buckets, -np.inf)
+    lows, _ = _buckets(np.where(missing, np.inf, y), n_buckets, np.inf)
+    offsets = np.arange(n_buckets) * size
+    keep = [offsets + highs.argmax(axis=1), offsets + lows.argmin(axis=1)]
+    if missing.any():
+        keep.append(_gap_markers(missing, n_buckets))
+
+    keep = np.concatenate(keep)
+    return keep[keep < len(y)]
+
+def lttb_indices(x, y, n_out):
+    """
+    Row positions picked by Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+
+    The first and last points are kept; every bucket in between keeps the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket. Missing values are skipped (their gaps are kept separately).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    missing = np.isnan(y)
+    valid = np.nonzero(~missing)[0]
+    n = len(valid)
+    if n <= n_out or n_out < 3:
+        keep = valid
+    else:
+        vx, vy = x[valid], y[valid]
+        edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+        chosen = np.empty(n_out, dtype=np.intp)
+        chosen[0], chosen[-1] = 0, n - 1
+        a = 0
+        for bucket in range(n_out - 2):
+            start, stop = edges[bucket], edges[bucket + 1]
+            following = slice(stop, edges[bucket + 2] if bucket + 2 < len(edges) else n)
+            mean_x, mean_y = vx[following].mean(), vy[following].mean()
+            area = np.abs((vx[a] - mean_x) * (vy[start:stop] - vy[a])
+                          - (vx[a] - vx[start:stop]) * (mean_y - vy[a]))
+            a = start + int(area.argmax()) if stop > start else a
+            chosen[bucket + 1] = a
+        keep = valid[chosen]
+
+    if missing.any():
+        keep = np.concatenate([keep, _gap_markers(missing, max(n_out // 2, 1))])
+    return keep
+
+def downsample_positions(index, columns, n_out, method='minmax'):
+    """
+    Sorted row positions to keep so every column still draws the same at n_out points.
+
+    The union over columns is returned, so stacked traces keep sharing their x
+    values. First and last rows and each column's global max and min are always
+    kept, so first/last/ATH annotations land on plotted points.
+    """
+    method = _resolve_method(method)
+    n = len(index)
+    keep = [np.array([0, n - 1], dtype=np.intp)]
+    x = _x_values(index) if method == 'lttb' else None
+
+    for values in columns:
+        values = np.asarray(values, dtype=float)
+        if method == 'lttb':
+            keep.append(lttb_indices(x, values, n_out))
+        else:
+            keep.append(minmax_indices(values, n_out))
+        if not np.isnan(values).all():
+            keep.append(np.array([np.nanargmax(values), np.nanargmin(values)], dtype=np.intp))
+
+    return np.unique(np.concatenate(keep))
+
+def downsample_frame(df, columns, width, method='minmax', points_per_px=2):
+    """
+    Rows of df needed to draw `columns` at `width` px, or df itself if it's small enough.
+
+    method is 'minmax' (min and max of each bucket, exact envelope) or 'lttb'.
+    """
+    n_out = target_points(width, points_per_px)
+    columns = [col for col in columns if col in df.columns]
+    if len(df) <= 2 * n_out or not columns:
+        return df
+    positions = downsample_positions(df.index, [df[col].to_numpy(dtype=float, na_value=np.nan) for col in columns],
+                                     n_out, method=method)
+    return df.iloc[positions]
@@ -0,0 +1,85 @@
+import copy
+from functools import lru_cache
+
+import plotly.graph_objects as go
+
+@lru_cache(maxsize=None)
+def _secondary_y_layout():
+    # Axis layout of make_subplots(specs=[[{"secondary_y": True}]]), without the template
+    from plotly.subplots import make_subplots
+    layout = make_subplots(specs=[[{"secondary_y": True}]]).to_plotly_json()['layout']
+    return {key: value for key, value in layout.items() if key != 'template'}
+
+def _merge(target, updates):
+    # Nested dicts merge like update_layout; None unsets, anything else replaces
+    for key, value in updates.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            current = target.get(key)
+            if not isinstance(current, dict):
+                current = target[key] = {}
+            _merge(current, value)
+        else:
+            target[key] = value
+    return target
+
+def _strip_none(props):
+    return {key: _strip_none(value) if isinstance(value, dict) else value
+            for key, value in props.items() if value is not None}
+
+class figure_builder():
+    """
+    Assembles a figure as plain dicts, then builds the go.Figure once.
+
+    Stands in for make_subplots(specs=[[{"secondary_y": True}]]) plus repeated
+    add_trace/add_annotation/update_layout calls, which run Plotly's validators on
+    every call. Traces are dicts with a 'type' key (dict(type='scatter', ...)) and
+    layout keys are literal: write xaxis=dict(title=...), not xaxis_title=....
+
+        builder = figure_builder()
+        builder.add_trace(dict(type='bar', x=x, y=y), secondary_y=False)
+        builder.update_layout(barmode='stack')
+        fig = builder.to_figure(validate=False)
+    """
+    def __init__(self, secondary_y=True):
+        self.secondary_y = secondary_y
+        self.data = []
+        self.layout = copy.deepcopy(_secondary_y_layout()) if secondary_y else {}
+
+    def add_trace(self, trace, secondary_y=None):
+        trace = _strip_none(trace)
+        if self.secondary_y and secondary_y is not None:
+            trace['xaxis'] = 'x'
+            trace['yaxis'] = 'y2' if secondary_y else 'y'
+        self.data.append(trace)
+        return self
+
+    def add_traces(self, traces, secondary_y=None):
+        for trace in traces:
+            self.add_trace(trace, secondary_y=secondary_y)
+        return self
+
+    def add_annotation(self, annotation=None, **kwargs):
+        self.layout.setdefault('annotations', []).append(_strip_none(dict(annotation or {}, **kwargs)))
+        return self
+
+    def update_layout(self, updates=None, **kwargs):
+        _merge(self.layout, dict(updates or {}, **kwargs))
+        return self
+
+    def to_dict(self):
+        """The figure as a plain dict, ready for plotly.io exports (validate=False) or go.Figure."""
+        return dict(data=self.data, layout=self.layout)
+
+    def to_figure(self, validate=True):
+        """
+        Build the go.Figure.
+
+        validate=True checks every property once, raising on invalid ones like
+        go.Figure does. validate=False trusts the dicts and skips the validators, and
+        the figure keeps skipping them on later updates.
+        """
+        if validate:
+            return go.Figure(self.to_dict())
+        return go.Figure(self.to_dict(), skip_invalid=True, _validate=False)
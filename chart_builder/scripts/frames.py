@@ -0,0 +1,22 @@
+import pandas as pd
+
+# No-copy contract: chart_builder never writes to a DataFrame it was handed. Each
+# step returns a new frame (or sorts/edits only frames it created), so the pipeline
+# doesn't need defensive copies. Under pandas copy-on-write those new frames share
+# memory with their input until one of them is written to, and a chart holds about
+# one copy of its data; without it, pandas copies on selection instead.
+
+def copy_on_write():
+    """True when pandas defers copies until a write (always on pandas 3, opt-in on pandas 2)."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+def share(df):
+    """
+    A copy of df to hand out, so writes to it don't reach df (and the other way round).
+
+    Under copy-on-write this is a shallow copy that costs nothing until one side is
+    written to; otherwise a full copy.
+    """
+    return df.copy(deep=not copy_on_write())
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from chart_builder.scripts.diagnostics import logger
+from chart_builder.scripts.ranking import ranking, get_ranking
+
+def merge_rows(df, new_rows, groupby=None):
+    """
+    Fold new_rows into a time-indexed frame, rewriting only its tail.
+
+    Rows of df from the first new timestamp on are combined with new_rows (a new
+    row replaces an existing one with the same timestamp, and the same groupby
+    value for long-format frames); everything before that is reused as is.
+    Returns (merged, old_tail, new_tail), where the tails are the replaced and
+    replacement rows.
+    """
+    new_rows = new_rows[list(df.columns)].sort_index(kind='stable')
+    if groupby is not None and isinstance(df[groupby].dtype, pd.CategoricalDtype):
+        # Keep the group codes: new series extend the categories instead of turning them to object
+        dtype = pd.CategoricalDtype(df[groupby].cat.categories.union(new_rows[groupby].dropna().unique()),
+                                    ordered=df[groupby].cat.ordered)
+        if len(dtype.categories) != len(df[groupby].cat.categories):
+            df = df.astype({groupby: dtype})
+        new_rows = new_rows.astype({groupby: dtype})
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+
+    cut = df.index.searchsorted(new_rows.index[0], side='left')
+    head, old_tail = df.iloc[:cut], df.iloc[cut:]
+
+    tail = pd.concat([old_tail, new_rows])
+    if groupby is None:
+        duplicated = tail.index.duplicated(keep='last')
+    else:
+        duplicated = pd.MultiIndex.from_arrays([tail.index, tail[groupby]]).duplicated(keep='last')
+    new_tail = tail[~duplicated].sort_index(kind='stable')
+
+    return pd.concat([head, new_tail]), old_tail, new_tail
+
+class rank_state(ranking):
+    """
+    Ranking inputs of a chart, kept up to date from the changed tail only.
+
+    Starts from the chart's own ranking of df (see ranking.get_ranking) and adds
+    freq, the index frequency. update() never modifies the shared ranking in place.
+    """
+    def __init__(self, df, groupby=None, num_col=None):
+        self.__dict__.update(get_ranking(df, groupby, num_col).__dict__)
+        self.groupby = groupby
+        self.freq = pd.infer_freq(df.index.drop_duplicates()) if isinstance(df.index, pd.DatetimeIndex) and len(df.index.unique()) > 2 else None
+
+    def update(self, merged, old_tail, new_tail):
+        if self.groupby is None:
+            self.totals = (self.totals.add(new_tail.select_dtypes(include=['number']).sum(), fill_value=0)
+                           .sub(old_tail.select_dtypes(include=['number']).sum(), fill_value=0))
+        else:
+            self.totals = (self.totals.add(new_tail.groupby(self.groupby, observed=True)[self.num_col].sum(), fill_value=0)
+                           .sub(old_tail.groupby(self.groupby, observed=True)[self.num_col].sum(), fill_value=0))
+
+        if self.freq is not None:
+            # Keep the frequency while the new stamps continue it
+            stamps = merged.index[-(len(new_tail) + 3):].drop_duplicates()
+            if len(stamps) > 2 and pd.infer_freq(stamps) != self.freq:
+                logger.debug('index frequency changed from %s', self.freq)
+                self.freq = pd.infer_freq(merged.index.drop_duplicates())
+        self._set_latest(merged)
+
+def append_values(values, tail_values, keep):
+    """values[:keep] followed by tail_values, as one array."""
+    return np.concatenate([np.asarray(values)[:keep], np.asarray(tail_values)])
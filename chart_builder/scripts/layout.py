@@ -0,0 +1,333 @@
+import hashlib
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from chart_builder.scripts.diagnostics import logger
+
+def bubble_radii(sizes, sizemin=0):
+    """Radius in px that plotly draws for sizemode='diameter', sizeref=1 markers of the given sizes."""
+    sizes = np.asarray(sizes, dtype=float)
+    return np.maximum(np.clip(sizes, 0, None) / 2, sizemin)
+
+def _place(b, a, r, x, y, c):
+    # Put circle c tangent to both a and b (same construction as d3.packSiblings)
+    dx, dy = x[b] - x[a], y[b] - y[a]
+    d2 = dx * dx + dy * dy
+    if d2:
+        a2 = (r[a] + r[c]) ** 2
+        b2 = (r[b] + r[c]) ** 2
+        if a2 > b2:
+            t = (d2 + b2 - a2) / (2 * d2)
+            h = math.sqrt(max(0.0, b2 / d2 - t * t))
+            x[c] = x[b] - t * dx - h * dy
+            y[c] = y[b] - t * dy + h * dx
+        else:
+            t = (d2 + a2 - b2) / (2 * d2)
+            h = math.sqrt(max(0.0, a2 / d2 - t * t))
+            x[c] = x[a] + t * dx - h * dy
+            y[c] = y[a] + t * dy + h * dx
+    else:
+        x[c] = x[a] + r[c]
+        y[c] = y[a]
+
+def _intersects(a, b, r, x, y):
+    dr = r[a] + r[b] - 1e-6
+    dx, dy = x[b] - x[a], y[b] - y[a]
+    return dr > 0 and dr * dr > dx * dx + dy * dy
+
+def _score(a, b, r, x, y):
+    # Squared distance from the origin to the weighted midpoint of a and b
+    ab = r[a] + r[b]
+    dx = (x[a] * r[b] + x[b] * r[a]) / ab
+    dy = (y[a] * r[b] + y[b] * r[a]) / ab
+    return dx * dx + dy * dy
+
+def pack_circles(radii, padding=0.0, seed=None):
+    """
+    Lay out circles tangent to each other without overlap, biggest in the middle.
+
+    Circles are placed in descending size order with the front-chain algorithm
+    (Wang et al., as in d3.packSiblings): each new circle goes tangent to the pair on
+    the outer chain closest to the centre, stepping along the chain past any circle
+    it would hit. Every placement only walks the outer chain, so the whole layout is
+    about O(n sqrt n) with no iterative force simulation.
+
+    padding is added to every radius. seed rotates the finished layout. Returns an
+    (n, 2) array of centres in the units of radii, in input order.
+    """
+    radii = np.asarray(radii, dtype=float)
+    n = len(radii)
+    if n == 0:
+        return np.empty((0, 2))
+
+    order = np.argsort(-radii, kind='stable')
+    r = (radii[order] + padding / 2).tolist()
+    x = [0.0] * n
+    y = [0.0] * n
+
+    if n > 1:
+        x[0] = -r[1]
+        x[1] = r[0]
+    if n > 2:
+        _place(1, 0, r, x, y, 2)
+
+        # Front chain as a doubly linked list over circle indices
+        nxt = [0] * n
+        prv = [0] * n
+        a, b, c = 0, 1, 2
+        nxt[a], prv[c] = b, b
+        nxt[b], prv[a] = c, c
+        nxt[c], prv[b] = a, a
+
+        i = 3
+        while i < n:
+            _place(a, b, r, x, y, i)
+
+            # Find the closest circle on the chain that the new one intersects, if any
+            j, k = nxt[b], prv[a]
+            sj, sk = r[b], r[a]
+            hit = False
+            while True:
+                if sj <= sk:
+                    if _intersects(j, i, r, x, y):
+                        b = j
+                        nxt[a], prv[b] = b, a
+                        hit = True
+                        break
+                    sj += r[j]
+                    j = nxt[j]
+                else:
+                    if _intersects(k, i, r, x, y):
+                        a = k
+                        nxt[a], prv[b] = b, a
+                        hit = True
+                        break
+                    sk += r[k]
+                    k = prv[k]
+                if j == nxt[k]:
+                    break
+            if hit:
+                # Retry the same circle against the tightened chain
+                continue
+
+            # Insert between a and b, then move to the chain pair closest to the centre
+            prv[i], nxt[i] = a, b
+            nxt[a] = prv[b] = i
+            b = i
+            best, best_score = a, _score(a, nxt[a], r, x, y)
+            node = nxt[i]
+            while node != b:
+                # _score inlined: this walk is the hot loop
+                following = nxt[node]
+                rn, rf = r[node], r[following]
+                ab = rn + rf
+                dx = (x[node] * rf + x[following] * rn) / ab
+                dy = (y[node] * rf + y[following] * rn) / ab
+                score = dx * dx + dy * dy
+                if score < best_score:
+                    best, best_score = node, score
+                node = following
+            a = best
+            b = nxt[a]
+            i += 1
+
+    pos = np.empty((n, 2))
+    pos[order, 0] = x
+    pos[order, 1] = y
+
+    if seed is not None:
+        angle = np.random.default_rng(seed).uniform(0, 2 * np.pi)
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        pos = pos @ rotation.T
+    return pos
+
+def rescale_layout(pos, scale=1.0):
+    """Centre positions on their mean and scale the largest coordinate to `scale`."""
+    pos = np.asarray(pos, dtype=float)
+    if len(pos) == 0:
+        return pos
+    pos = pos - pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos * (scale / extent) if extent > 0 else pos
+
+def _pair_ratios(pos, r, block=512):
+    # Yield (rows, (r_i + r_j) / distance) a block of rows at a time, with the
+    # diagonal masked, so memory stays O(block * n)
+    n = len(r)
+    for start in range(0, n, block):
+        delta = pos[start:start + block, None, :] - pos[None, :, :]
+        dist = np.hypot(delta[..., 0], delta[..., 1])
+        rows = np.arange(start, min(start + block, n))
+        dist[rows - start, rows] = np.inf
+        yield rows, (r[rows, None] + r[None, :]) / np.maximum(dist, 1e-12)
+
+def neighbour_pairs(pos, radii, slack):
+    """(i, j) index arrays, i < j, of circles closer than (r_i + r_j) * slack."""
+    found_i, found_j = [], []
+    for rows, ratio in _pair_ratios(np.asarray(pos, dtype=float), np.asarray(radii, dtype=float)):
+        i, j = np.nonzero(ratio * slack > 1)
+        i = rows[i]
+        keep = i < j
+        found_i.append(i[keep])
+        found_j.append(j[keep])
+    if not found_i:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(found_i), np.concatenate(found_j)
+
+def expand_layout(pos, radii, padding=0.0, pairs=None):
+    """
+    Scale an existing layout just enough that circles of the given radii don't overlap.
+
+    Used to warm start from a previous pack_circles layout after the radii moved a
+    little: every bubble keeps its place in the arrangement, and the layout grows or
+    shrinks uniformly until the tightest pair touches. pairs limits the check to
+    the neighbour_pairs that can decide it. Returns the new (n, 2) centres.
+    """
+    pos = np.asarray(pos, dtype=float)
+    r = np.asarray(radii, dtype=float) + padding / 2
+    if len(r) < 2:
+        return pos.copy()
+
+    if pairs is not None:
+        i, j = pairs
+        if len(i) == 0:
+            return pos.copy()
+        dist = np.hypot(*(pos[j] - pos[i]).T)
+        return pos * ((r[i] + r[j]) / np.maximum(dist, 1e-12)).max()
+
+    return pos * max(ratio.max() for _, ratio in _pair_ratios(pos, r))
+
+class layout_cache():
+    """
+    Cache of bubble layouts keyed on the group set and seed.
+
+    Each entry holds the last layout computed for one set of group keys, plus the
+    pack_circles layout it was derived from. Asking again with the same radii and
+    padding returns the same centres. With warm_start, radii within warm_tolerance
+    (relative) of the packed ones reuse that arrangement through expand_layout
+    instead of packing from scratch, so bubbles also stay where they were between
+    runs. With disk_dir set, entries are written there as .npz so later processes
+    reuse them.
+    """
+    def __init__(self, max_items=64, disk_dir=None, warm_start=True, warm_tolerance=0.1):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.warm_start = warm_start
+        self.warm_tolerance = warm_tolerance
+        self.hits = 0
+        self.warm_hits = 0
+        self.misses = 0
+        self._layouts = OrderedDict()
+
+    def key(self, groups, seed=None):
+        return (tuple(groups), seed)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f'{digest}.npz')
+
+    def get(self, key):
+        entry = self._layouts.get(key)
+        if entry is not None:
+            self._layouts.move_to_end(key)
+            return entry
+        if not self.disk_dir:
+            return None
+
+        disk_path = self._disk_path(key)
+        if not os.path.exists(disk_path):
+            return None
+        try:
+            with np.load(disk_path) as data:
+                entry = {name: data[name] for name in data.files}
+            entry['padding'] = float(entry['padding'])
+        except Exception as e:
+            logger.warning('Warning: could not read cached layout %s: %s', disk_path, e)
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        self._layouts[key] = entry
+        self._layouts.move_to_end(key)
+        while len(self._layouts) > self.max_items:
+            self._layouts.popitem(last=False)
+
+    def put(self, key, radii, padding, positions, base_radii=None, base_positions=None, pairs=None):
+        """Store a layout; base_* is the packed layout it came from (itself if omitted)."""
+        entry = dict(radii=np.array(radii, dtype=float), padding=float(padding),
+                     positions=np.array(positions, dtype=float))
+        # Padded radii, so warm starts compare like with like
+        entry['base_radii'] = entry['radii'] + padding / 2 if base_radii is None else base_radii
+        entry['base_positions'] = entry['positions'] if base_positions is None else base_positions
+        if pairs is not None:
+            entry['pair_i'], entry['pair_j'] = pairs
+        self._remember(key, entry)
+        if not self.disk_dir:
+            return
+        disk_path = self._disk_path(key)
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            np.savez(disk_path, **entry)
+        except OSError as e:
+            logger.debug('not caching layout %s on disk: %s', disk_path, e)
+
+    def pack(self, groups, radii, padding=0.0, seed=None):
+        """pack_circles(radii, padding, seed), reusing or warm starting from a cached layout."""
+        radii = np.asarray(radii, dtype=float)
+        key = self.key(groups, seed)
+        entry = self.get(key)
+
+        if entry is not None and len(entry['radii']) == len(radii):
+            if entry['padding'] == padding and np.array_equal(entry['radii'], radii):
+                self.hits += 1
+                logger.debug('layout cache hit: %s bubbles', len(radii))
+                return entry['positions'].copy()
+
+            if self.warm_start and len(radii):
+                # Measured against the packed layout, so repeated warm starts can't drift
+                base_radii = entry['base_radii']
+                change = np.abs(radii + padding / 2 - base_radii) / np.maximum(base_radii, 1e-12)
+                if change.max() <= self.warm_tolerance:
+                    self.warm_hits += 1
+                    logger.debug('layout cache warm start: %s bubbles, max radius change %.3f',
+                                 len(radii), change.max())
+                    base_positions = entry['base_positions']
+                    if 'pair_i' not in entry:
+                        # Within the tolerance the tightest pair is always one of these
+                        slack = (1 + self.warm_tolerance) / (1 - self.warm_tolerance)
+                        entry['pair_i'], entry['pair_j'] = neighbour_pairs(base_positions, base_radii, slack)
+                    positions = expand_layout(base_positions, radii, padding=padding,
+                                              pairs=(entry['pair_i'], entry['pair_j']))
+                    self.put(key, radii, padding, positions, base_radii=base_radii,
+                             base_positions=base_positions, pairs=(entry['pair_i'], entry['pair_j']))
+                    return positions.copy()
+
+        self.misses += 1
+        logger.debug('layout cache miss: %s bubbles', len(radii))
+        positions = pack_circles(radii, padding=padding, seed=seed)
+        self.put(key, radii, padding, positions)
+        return positions
+
+    def clear(self, disk=False):
+        self._layouts.clear()
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+# Shared cache used by bubble_chart(cache_layout=True)
+default_layout_cache = layout_cache()
+
+def configure_layout_cache(max_items=64, disk_dir=None, warm_start=True, warm_tolerance=0.1):
+    """Replace the shared layout cache, e.g. to keep layouts on disk between runs."""
+    global default_layout_cache
+    default_layout_cache = layout_cache(max_items=max_items, disk_dir=disk_dir, warm_start=warm_start,
+                                        warm_tolerance=warm_tolerance)
+    return default_layout_cache
+
+def get_default_layout_cache():
+    return default_layout_cache
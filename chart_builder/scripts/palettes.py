@@ -0,0 +1,133 @@
+import random
+from functools import lru_cache
+from types import MappingProxyType
+
+import plotly.colors as pc
+
+# Palettes that used to be rebuilt from matplotlib/colorcet on every colors() call,
+# stored as hex so neither library is needed to draw a chart
+
+# matplotlib tab10
+TAB10 = (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f',
+    '#bcbd22', '#17becf',
+)
+
+# matplotlib Set1
+SET1 = (
+    '#e41a1c', '#377eb8', '#4daf4a', '#984ea3', '#ff7f00', '#ffff33', '#a65628', '#f781bf',
+    '#999999',
+)
+
+# colorcet glasbey_dark
+GLASBEY_DARK = (
+    '#d60000', '#8c3bff', '#018700', '#00acc6', '#e6a500', '#ff7ed1', '#6b004f', '#573b00',
+    '#005659', '#15e18c', '#0000dd', '#a17569', '#bcb6ff', '#bf03b8', '#645472', '#790000',
+    '#0774d8', '#729a7c', '#ff7752', '#004b00', '#8e7b01', '#f2007b', '#8eba00', '#a57bb8',
+    '#5901a3', '#e2afaf', '#a03a52', '#a1c8c8', '#9e4b00', '#546744', '#bac389', '#5e7b87',
+    '#60383b', '#8287ff', '#380000', '#e252ff', '#2f5282', '#7ecaff', '#c4668e', '#008069',
+    '#919eb6', '#cc7407', '#7e2a8e', '#00bda3', '#2db152', '#4d33ff', '#00e400', '#ff00cd',
+    '#c85748', '#e49cff', '#1ca1ff', '#6e70aa', '#c89a69', '#77563b', '#03dae6', '#c1a3c3',
+    '#ff6989', '#ba00fd', '#915280', '#9e0174', '#93a14f', '#364424', '#af6dff', '#596d00',
+    '#ff3146', '#828056', '#006d2d', '#8956af', '#5949a3', '#773416', '#85c39a', '#5e1123',
+    '#d48580', '#a32818', '#0087b1', '#ca0044', '#ffa056', '#eb4d00', '#6b9700', '#528549',
+    '#755900', '#c8c33f', '#91d370', '#4b9793', '#4d230c', '#60345b', '#8300cf', '#8a0031',
+    '#9e6e31', '#ac8399', '#c63189', '#015438', '#086b83', '#87a8eb', '#6466ef', '#c35dba',
+    '#019e70', '#805059', '#826e8c', '#b3bfda', '#b89028', '#ff97b1', '#a793e1', '#698cbd',
+    '#4b4f01', '#4801cc', '#60006e', '#446966', '#9c5642', '#7bacb5', '#cd83bc', '#0054c1',
+    '#7b2f4f', '#fb7c00', '#34bf00', '#ff9c87', '#e1b669', '#526077', '#5b3a7c', '#eda5da',
+    '#ef52a3', '#5d7e69', '#c3774f', '#d14867', '#6e00eb', '#1f3400', '#c14103', '#6dd4c1',
+    '#46709e', '#a101c3', '#0a8289', '#afa501', '#a55b6b', '#fd77ff', '#8a85ae', '#c67ee8',
+    '#9aaa85', '#876bd8', '#01baf6', '#af5dd1', '#59502a', '#b5005e', '#7cb569', '#4985ff',
+    '#00c182', '#d195aa', '#a34ba8', '#e205e2', '#16a300', '#382d00', '#832f33', '#5d95aa',
+    '#590f00', '#7b4600', '#6e6e31', '#335726', '#4d60b5', '#a19564', '#623f28', '#44d457',
+    '#70aacf', '#2d6b4d', '#72af9e', '#fd1500', '#d8b391', '#79893b', '#7cc6d8', '#db9036',
+    '#eb605d', '#eb5ed4', '#e47ba7', '#a56b97', '#009744', '#ba5e21', '#bcac52', '#87d82f',
+    '#873472', '#aea8d1', '#e28c62', '#d1b1eb', '#36429e', '#3abdc1', '#669c4d', '#9e0399',
+    '#4d4d79', '#7b4b85', '#c33431', '#8c6677', '#aa002d', '#7e0175', '#01824d', '#724967',
+    '#727790', '#6e0099', '#a0ba52', '#e16e31', '#c46970', '#6d5b95', '#a33b74', '#316200',
+    '#87004f', '#335769', '#ba8c7c', '#1859ff', '#909101', '#2b8ad4', '#1626ff', '#21d3ff',
+    '#a390af', '#8a6d4f', '#5d213d', '#db03b3', '#6e56ca', '#642821', '#ac7700', '#a3bff6',
+    '#b58346', '#9738db', '#b15093', '#7242a3', '#878ed1', '#8970b1', '#6baf36', '#5979c8',
+    '#c69eff', '#56831a', '#00d6a7', '#824638', '#11421c', '#59aa75', '#905b01', '#f64470',
+    '#ff9703', '#e14231', '#ba91cf', '#34574d', '#f7807c', '#903400', '#b3cd00', '#2d9ed3',
+    '#798a9e', '#50807c', '#c136d6', '#eb0552', '#b8ac7e', '#487031', '#839564', '#d89c89',
+    '#0064a3', '#4b9077', '#8e6097', '#ff5238', '#a7423b', '#006e70', '#97833d', '#dbafc8',
+)
+
+# colorcet glasbey_light
+GLASBEY_LIGHT = (
+    '#d60000', '#018700', '#b500ff', '#05acc6', '#97ff00', '#ffa52f', '#ff8ec8', '#79525e',
+    '#00fdcf', '#afa5ff', '#93ac83', '#9a6900', '#366962', '#d3008c', '#fdf490', '#c86e66',
+    '#9ee2ff', '#00c846', '#a877ac', '#b8ba01', '#f4bfb1', '#ff28fd', '#f2cdff', '#009e7c',
+    '#ff6200', '#56642a', '#953f1f', '#90318e', '#ff3464', '#a0e491', '#8c9ab1', '#829026',
+    '#ae083f', '#77c6ba', '#bc9157', '#e48eff', '#72b8ff', '#c6a5c1', '#ff9070', '#d3c37c',
+    '#bceddb', '#6b8567', '#916e56', '#f9ff00', '#bac1df', '#ac567c', '#ffcd03', '#ff49b1',
+    '#c15603', '#5d8c90', '#c144bc', '#00753f', '#ba6efd', '#00d493', '#00ff75', '#49a150',
+    '#cc9790', '#00ebed', '#db7e01', '#f77589', '#b89500', '#c84248', '#00cff9', '#755726',
+    '#85d401', '#ebffd4', '#a77b87', '#db72c8', '#cae256', '#8abf5d', '#a1216b', '#855b89',
+    '#89bacf', '#ffbad6', '#b6cfaa', '#97414d', '#67aa00', '#fde1b1', '#ff3628', '#80793d',
+    '#d6e8ff', '#a795c6', '#7ea59a', '#d182a3', '#54823b', '#e6a872', '#9cffff', '#da5480',
+    '#05b3aa', '#ffaaf6', '#d1afef', '#da015d', '#ac1a13', '#60b385', '#d442fd', '#acaa59',
+    '#fb9ca7', '#b3723b', '#f26952', '#aed1d4', '#9affc3', '#dbb333', '#eb01c3', '#9900c4',
+    '#cfff9e', '#a55949', '#3b6d01', '#008579', '#959167', '#89dbb3', '#6d7400', '#aa5dca',
+    '#07ef00', '#804f3d', '#d88052', '#ffc862', '#b8009e', '#99acdd', '#904f00', '#8c4470',
+    '#4f6e52', '#ff8734', '#c68ecd', '#d4e29e', '#b1826d', '#9cfb75', '#56dd77', '#f90087',
+    '#a1cdff', '#13cad1', '#118e54', '#d154a5', '#00dfc3', '#a3832f', '#77975b', '#baaa80',
+    '#70a3af', '#d6fbff', '#e8013a', '#d84621', '#ff82ed', '#b63862', '#b6cd72', '#97626b',
+    '#897490', '#00a316', '#00f4a1', '#bf90f2', '#89e4d8', '#a34d95', '#6e5d00', '#8cc68e',
+    '#95aa2a', '#c672dd', '#b33b01', '#d69a36', '#dfacb6', '#009aa0', '#599000', '#97bca8',
+    '#ac8ca8', '#dad4ff', '#547c72', '#00ba69', '#ffc38e', '#b800d4', '#dfcf5b', '#629a7b',
+    '#bfedbc', '#c1bdfd', '#80d3dd', '#e2857e', '#f9eb4d', '#bf6d82', '#caff4f', '#ef72aa',
+    '#ed67ff', '#9946ae', '#6d6942', '#e25660', '#dd662d', '#9cdb5d', '#e29ccf', '#b87500',
+    '#c6002d', '#dfbcda', '#59b5df', '#ff59da', '#38c1a1', '#9e698c', '#acaac8', '#95622f',
+    '#b55662', '#2b7e60', '#b1e400', '#eda590', '#95fde2', '#ff548e', '#bd6ea1', '#aa3b36',
+    '#d8cf00', '#aa80cd', '#a08052', '#e100e8', '#c35b3d', '#b53a85', '#8c7700', '#dbbc95',
+    '#529e93', '#afbc82', '#91b5b6', '#a75423', '#ffd4ef', '#79ae6b', '#5db54b', '#80fb9a',
+    '#48ffef', '#979548', '#9387a7', '#31d400', '#6ee956', '#b6d4eb', '#705470', '#f2db8a',
+    '#aad4c1', '#7ecdf2', '#89ba00', '#64b6ba', '#ffb500', '#c38285', '#caaa5e', '#647748',
+    '#59e2ff', '#df4dcd', '#e9ff79', '#bc66b8', '#c395a5', '#64c674', '#d19570', '#70cf4f',
+    '#aa6e66', '#9c60a5', '#00b800', '#e299b3', '#bc006b', '#b3e8ef', '#cdbfe4', '#77a342',
+    '#856277', '#568e5b', '#9eafc4', '#e82fa0', '#247c2a', '#826723', '#bfbc4d', '#ddd3a5',
+)
+
+_palettes = {
+    'plotly': tuple(pc.qualitative.Plotly),
+    'dark24': tuple(pc.qualitative.Dark24),
+    'set3': tuple(pc.qualitative.Set3),
+    'tab10': TAB10,
+    'set1': SET1,
+    'glasbey_dark': GLASBEY_DARK,
+    'glasbey_light': GLASBEY_LIGHT,
+}
+# The default chart palette, in the order utils.colors() has always returned
+_palettes['combined'] = (_palettes['dark24'] + _palettes['set3'] + _palettes['plotly'][::-1]
+                         + TAB10 + SET1 + GLASBEY_DARK + GLASBEY_LIGHT)
+
+# Read-only view of the registry: name -> tuple of hex colors
+PALETTES = MappingProxyType(_palettes)
+
+def register_palette(name, colors):
+    """Add (or replace) a named palette; colors is any sequence of CSS colors."""
+    _palettes[name] = tuple(colors)
+    _shuffled.cache_clear()
+    return _palettes[name]
+
+@lru_cache(maxsize=64)
+def _shuffled(name, seed):
+    colors = list(_palettes[name])
+    random.Random(seed).shuffle(colors)
+    return tuple(colors)
+
+def get_palette(name='combined', seed=None):
+    """
+    Named palette as a tuple of hex colors.
+
+    With a seed the palette comes back in a shuffled order that is the same for
+    the same seed on every run; each (name, seed) is shuffled once and cached.
+    """
+    if name not in _palettes:
+        raise KeyError(f"Unknown palette {name!r}; available: {', '.join(sorted(_palettes))}")
+    if seed is None:
+        return _palettes[name]
+    return _shuffled(name, seed)
@@ -1,33 +1,34 @@
-import sys
-
-# sys.path.append('E:\Projects\ournetwork\chart_builder\scripts')  
 import os
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 import math
+import warnings
+
+from chart_builder.scripts.diagnostics import logger, lazy
+from chart_builder.scripts.render import write_image
+from chart_builder.scripts.downsample import downsample_frame
+from chart_builder.scripts.figure_builder import figure_builder
+from chart_builder.scripts.ticks import datetime_ticks, MAX_TICKS
+from chart_builder.scripts.layout import bubble_radii, pack_circles, get_default_layout_cache
 
 # sys.path.append(os.path.join(current_dir, 'pipeline', 'scripts'))
 
-print("Current working directory:", os.getcwd())
-print("Current directory:", current_dir)
+logger.debug('Current working directory: %s', lazy(os.getcwd))
+logger.debug('Current directory: %s', current_dir)
 
-from chart_builder.scripts.utils import dynamic_parameters, top_other_by_col_bubble, top_by_col_bubble, colors, clean_values, clean_values_dollars, ranked_cleaning, to_percentage, rank_by_col, rank_by_columns, normalize_to_percent,calculate_marker_size
+from chart_builder.scripts.utils import dynamic_parameters, top_other_by_col_bubble, top_by_col_bubble, default_colors, clean_values, clean_values_dollars, format_values, format_labels, group_positions, NO_ROWS, ranked_cleaning, to_percentage, rank_by_col, rank_by_columns, normalize_to_percent,calculate_marker_size
 
 import numpy as np
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
-import plotly.express as px
 import plotly.io as pio
 import plotly.offline as pyo
 import plotly.colors as pc
-import networkx as nx
 # import kaleido
 
 import pandas as pd
 
-combined_colors = colors()
-
 datetime_format = '%b. %d, %Y'
 
 def round_up_to_05(x):
@@ -60,7 +61,7 @@ def round_up_to_05(x):
 
 def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options=None, mode='lines', area=False, annotations=True, tickprefix=dict(y1=None,y2=None), 
                      ticksuffix=dict(y1=None,y2=None), remove_zero=False, custom_ticks=False,
-                      colors=combined_colors, font_size=18, axes_data=dict(y1=None,y2=None), 
+                      colors=None, font_size=18, axes_data=dict(y1=None,y2=None), 
                      bgcolor='rgba(0,0,0,0)', legend_orientation='h', tickangle=None, show_legend=False,
                      sort_list=True, dtick=None, max_annotation=False, tickformat=None, tick0=None,
                      traceorder='normal', legend_placement=dict(x=0.01,y=1.1), margin=dict(l=0, r=0, t=0, b=0), legend_font_size=16,text_font_size = 14,
@@ -68,12 +69,13 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
                      save=False,fill=None,connectgaps=True,descending=True,text=False,text_freq=1,font_family=None,font_color='black',axes_font_colors=None,
                      file_type='svg',directory='../img',autosize=True,
                      custom_annotation=[],ytick_num=6,auto_title=False,buffer=None,datetime_tick=True, legend_background=dict(bgcolor='white',bordercolor='black',
-                                                                                                                              borderwidth=1, itemsizing='constant')):
+                                                                                                                              borderwidth=1, itemsizing='constant'),downsample=None):
 
     "custom_annotation is an array of dates we want annotations for value"
 
-    print(f'tick0 in func: {tick0}')
-    print(F'sort_list: {sort_list}')
+    colors = default_colors() if colors is None else colors
+    logger.debug('tick0 in func: %s', tick0)
+    logger.debug('sort_list: %s', sort_list)
 
     if bgcolor == 'default':
         bgcolor = 'rgba(0,0,0,0)'
@@ -88,8 +90,8 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
         # Determine plotting order based on the latest value
         plot_order = rank_by_columns(df, cumulative=False, descending=descending)
 
-        print(f"Color order (cumulative): {color_order}")
-        print(f"Plot order (latest value): {plot_order}")
+        logger.debug('Color order (cumulative): %s', color_order)
+        logger.debug('Plot order (latest value): %s', plot_order)
 
         color_map = {col: colors[idx % len(colors)] for idx, col in enumerate(color_order)}
         columns_to_plot = plot_order
@@ -97,7 +99,7 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
     y1_lineto_show = None
     y2_lineto_show = None
 
-    print(f'axes_titles at beginning: {axes_titles}')
+    logger.debug('axes_titles at beginning: %s', axes_titles)
 
     if buffer != None:
         if datetime_tick:
@@ -115,15 +117,15 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
         x_range_start = df.index.min() 
         x_range_end = df.index.max()   
 
-    print(f'cumulative_sort: {cumulative_sort}')
+    logger.debug('cumulative_sort: %s', cumulative_sort)
   
     # Sort columns by descending or ascending
     # sort_list = rank_by_columns(df=df, cumulative=cumulative_sort, descending=descending)
     
 
     # Print for debugging
-    print(f"descending: {descending}")
-    print(f"columns to plot: {columns_to_plot}")
+    logger.debug('descending: %s', descending)
+    logger.debug('columns to plot: %s', columns_to_plot)
 
     
     if axes_font_colors == 'auto' or axes_font_colors is None:
@@ -131,20 +133,26 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
 
     traces = []
 
+    # Traces only need as many points as the chart has pixels; annotations below still read df
+    if downsample:
+        plot_df = downsample_frame(df, list(axes_data['y1'] or []) + list(axes_data['y2'] or []), dimensions['width'], method=downsample)
+    else:
+        plot_df = df
+
     y1_lineto_show = df[axes_data['y1'][0]].name if auto_title and not axes_titles['y1'] else axes_titles['y1']
     y2_lineto_show = df[axes_data['y2'][0]].name if auto_title and not axes_titles['y2'] else axes_titles['y2']
     
-    print(f'axes_font_colors: {axes_font_colors}')
+    logger.debug('axes_font_colors: %s', axes_font_colors)
 
     # Loop through the y1 columns, applying sorted order
     for idx, y1_col in enumerate(columns_to_plot):
-        print(f'idx: {idx} y1_col: {y1_col}')
+        logger.debug('idx: %s y1_col: %s', idx, y1_col)
         if y1_col not in axes_data['y1']:
             continue  # Skip if y1_col is not in the sorted columns
 
-        print(f'axes_titles: {axes_titles}')
+        logger.debug('axes_titles: %s', axes_titles)
         
-        print(f'y1_lineto_show: {y1_lineto_show}')
+        logger.debug('y1_lineto_show: %s', y1_lineto_show)
         
         # Assign colors based on position: reverse for ascending
         # print(f'colors: {colors}')
@@ -156,33 +164,29 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
         # if 'y1' not in axes_font_colors:
         #     axes_font_colors['y1'] = column_color
 
-        print(f'axes_font_colors: {axes_font_colors}')
+        logger.debug('axes_font_colors: %s', axes_font_colors)
 
-        print(f'latest val: {df[y1_col].iloc[-1]}')
+        logger.debug('latest val: %s', df[y1_col].iloc[-1])
 
         if text and text_freq:
             # Create a list to hold text values based on the text frequency
-            text_values = [
-                f'{tickprefix["y1"] if tickprefix["y1"] else ""}'  # Add tickprefix
-                f'{clean_values(df[y1_col][i], decimal_places=decimal_places, decimals=decimals)}'  # Clean the value
-                f'{ticksuffix["y1"] if ticksuffix["y1"] else ""}'  # Add ticksuffix
-                if i % text_freq == 0 else None for i in range(len(df))
-            ]
+            text_values = format_labels(plot_df[y1_col].to_numpy(), prefix=tickprefix["y1"], suffix=ticksuffix["y1"], freq=text_freq,
+                                        decimals=decimals, decimal_places=decimal_places)
               # Automatically adjust text position (inside/outside)
         else:
             text_values = ""
 
-        print(f'y1_col values:{df[y1_col]} ')
+        logger.debug('y1_col values:%s ', df[y1_col])
 
-        print(f'color_map: {color_map}')
+        logger.debug('color_map: %s', color_map)
 
         color = color_map.get(y1_col, colors[idx % len(colors)])
 
-        print(f'Processing y1 column: {y1_col} with color: {color}')  # Debugging info
+        logger.debug('Processing y1 column: %s with color: %s', y1_col, color)  # Debugging info
 
         fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df[y1_col],
+            x=plot_df.index,
+            y=plot_df[y1_col],
             mode=mode,
             text=text_values,
             name=f'{y1_col} ({tickprefix["y1"] if tickprefix["y1"] else ""}{clean_values(df[y1_col].iloc[-1], decimal_places=decimal_places, decimals=decimals)}{ticksuffix["y1"] if ticksuffix["y1"] else ""}){"            "}',
@@ -299,18 +303,18 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
 
     # Check for y2 columns, applying sorted order as well
     if axes_data['y2']:
-        print(f'axes_data y2: {axes_data["y2"]}')
-        print(f'columns_to_plot: {columns_to_plot}')
+        logger.debug('axes_data y2: %s', axes_data['y2'])
+        logger.debug('columns_to_plot: %s', columns_to_plot)
         for idx, y2_col in enumerate(columns_to_plot):
             if y2_col not in axes_data["y2"]:
-                print(f'Skipping y2 column: {y2_col} (not in columns to plot)')
+                logger.debug('Skipping y2 column: %s (not in columns to plot)', y2_col)
                 continue
             if y2_col not in columns_to_plot:
                 continue  # Skip if y2_col is not in the sorted columns
 
-            print(f'idx: {idx} y2_col: {y2_col}')
+            logger.debug('idx: %s y2_col: %s', idx, y2_col)
 
-            print(f'line to show 2: {y2_lineto_show}')
+            logger.debug('line to show 2: %s', y2_lineto_show)
 
             # Assign colors based on position: reverse for ascending
             if descending:
@@ -323,13 +327,13 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
 
             color = color_map.get(y2_col, colors[idx % len(colors)])
           
-            print(f'Processing y2 column: {y2_col} with color: {color}') 
+            logger.debug('Processing y2 column: %s with color: %s', y2_col, color) 
             
-            print(f'y2_col values:{df[y2_col]} ') # Debugging info
+            logger.debug('y2_col values:%s ', df[y2_col]) # Debugging info
 
             fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df[y2_col],
+                x=plot_df.index,
+                y=plot_df[y2_col],
                 mode=mode,
                 name=f'{y2_col} ({tickprefix["y2"] if tickprefix["y2"] else ""}{clean_values(df[y2_col].iloc[-1], decimal_places=decimal_places, decimals=decimals)}{ticksuffix["y2"] if ticksuffix["y2"] else ""}){"          "}',
                 stackgroup=None if area == False else 'one',
@@ -340,14 +344,14 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
                 fill=fill
             ), secondary_y=True)
 
-    print(f'axes_font_colors: {axes_font_colors}')
+    logger.debug('axes_font_colors: %s', axes_font_colors)
 
     if custom_ticks:
         y_min = df[axes_data["y1"]].min().min() if df[axes_data["y1"]].min().min() < 0 else 0
         y_max = df[axes_data["y1"]].max().max()
 
-        print(f'y_min: {y_min}')
-        print(f'y_max: {y_max}')
+        logger.debug('y_min: %s', y_min)
+        logger.debug('y_max: %s', y_max)
         
         ticksy = list(np.linspace(y_min, y_max, num=ytick_num, endpoint=True))
 
@@ -358,53 +362,17 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
             ticksy = [tick for tick in ticksy if tick != 0]
 
         # Format the ticks with prefixes, suffixes, and cleaner values
-        formatted_ticks = [
-            f"{tickprefix['y1'] if tickprefix['y1'] else ''}{clean_values(tick, decimal_places=0, decimals=False)}{ticksuffix['y1'] if ticksuffix['y1'] else ''}"
-            for tick in ticksy
-        ]
+        formatted_ticks = format_labels(ticksy, prefix=tickprefix['y1'], suffix=ticksuffix['y1'], decimal_places=0, decimals=False)
     else:
         ticksy = None    
     
-    print(f'ticksy: {ticksy}')
+    logger.debug('ticksy: %s', ticksy)
 
-    print(f'[x_range_start, x_range_end]: {[x_range_start, x_range_end]}')
+    logger.debug('[x_range_start, x_range_end]: %s', [x_range_start, x_range_end])
 
     if pd.api.types.is_datetime64_any_dtype(df.index):
-        # import pdb; pdb.set_trace()
         datetime_tick = True
-        if pd.infer_freq(df.index.drop_duplicates()) in ['M', 'MS']:
-            total_periods = len(df.index)
-
-            # Always include the first and last
-            start = df.index.min()
-            end = df.index.max()
-
-            # Dynamically adjust num_ticks to ensure even spacing
-            for num_ticks in range(total_periods, 1, -1):
-                step = (total_periods - 1) // (num_ticks - 1)
-                if step > 0 and (total_periods - 1) % step == 0:
-                    break
-
-            # Generate ticks
-            tick_indices = range(0, total_periods, step)
-            if total_periods - 1 not in tick_indices:
-                tick_indices = list(tick_indices) + [total_periods - 1]
-
-            x_ticks = [df.index[i] for i in tick_indices]
-            x_tick_labels = [tick.strftime('%Y-%m-%d') for tick in x_ticks]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            print("X-Tick Labels:", x_tick_labels)
-        else:
-            x_start = df.index.min().timestamp()
-            x_end = df.index.max().timestamp()
-            x_ticks_numeric = np.linspace(x_start, x_end, num=5)
-            x_ticks = [pd.to_datetime(tick, unit='s').strftime('%Y-%m-%d') for tick in x_ticks_numeric]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            # print("X-Tick Labels:", x_tick_labels)
-    else:
-        x_ticks = None
+    x_ticks = datetime_ticks(df.index, width=dimensions['width'])
 
     fig.update_layout(
         legend=dict(
@@ -468,14 +436,14 @@ def simple_line_plot(df, title, axes_titles=dict(y1=None, y2=None),color_options
     # Figure
     # pyo.iplot(fig)
     if save == True:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
     # return fig
 
 def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,sort_list=True,
-                    colors=combined_colors, font_size=18, remove_zero=False, custom_ticks=False,
+                    colors=None, font_size=18, remove_zero=False, custom_ticks=False,
                     bgcolor='rgba(0,0,0,0)', legend_orientation='h', tickangle=None, show_legend=False,
                     dtick=None, max_annotation=False, tick0=None, traceorder='normal',
                     legend_placement=dict(x=0.01, y=1.1), margin=dict(l=0, r=0, t=0, b=0), legend_font_size=16, decimals=True,
@@ -486,8 +454,9 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
                     tickprefix=dict(y1=None, y2=None), ticksuffix=dict(y1=None, y2=None), descending=True,datetime_tick=True,font_family=None,font_color='black',file_type='svg',
                     directory='../img',custom_annotation=[],buffer=None,ytick_num=6, auto_title=True,legend_background=dict(bgcolor='white',bordercolor='black',
                                                                                                                               borderwidth=1, itemsizing='constant')):
-    print(f'testing')
-    print(f'axes_data:{axes_data}')
+    colors = default_colors() if colors is None else colors
+    logger.debug('testing')
+    logger.debug('axes_data:%s', axes_data)
     if bgcolor == 'default':
         bgcolor = 'rgba(0,0,0,0)'
     
@@ -495,7 +464,7 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
 
     y1_lineto_show = None
     y2_lineto_show = None
-    print(f'sort_list: {sort_list}')
+    logger.debug('sort_list: %s', sort_list)
 
 
 
@@ -525,8 +494,8 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
         color_order = rank_by_columns(df, cumulative=cumulative_sort, descending=True)  # Rank largest to smallest for consistent colors
         plot_order = rank_by_columns(df, cumulative=cumulative_sort, descending=descending)  # Plot in user-defined order
 
-        print(f"Color order (largest first for color): {color_order}")
-        print(f"Plot order (user-defined): {plot_order}")
+        logger.debug('Color order (largest first for color): %s', color_order)
+        logger.debug('Plot order (user-defined): %s', plot_order)
 
         # Assign colors based on the ranked order (largest series gets the first color)
         color_map = {col: colors[color_order.get_loc(col) % len(colors)] for col in plot_order}
@@ -535,9 +504,9 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
         columns_to_plot = list(plot_order)
 
     # Print for debugging
-    print(f"descending: {descending}")
-    print(f"columns to plot: {columns_to_plot}")
-    print(f'tick0: {tick0}')
+    logger.debug('descending: %s', descending)
+    logger.debug('columns to plot: %s', columns_to_plot)
+    logger.debug('tick0: %s', tick0)
 
     # tick0 = df.index.min()
 
@@ -547,11 +516,11 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
     #     # Reverse the colors for the plotting order
     #     reversed_colors = [color_map[col] for col in reversed(columns_to_plot)]
     #     color_map = {col: reversed_colors[idx] for idx, col in enumerate(columns_to_plot)}
-    print(f'reversed color map: {color_map}')
+    logger.debug('reversed color map: %s', color_map)
     
     # Assign colors based on position (last-ranked gets the first color in reversed list)
     for idx, y1_col in enumerate(columns_to_plot):
-        print(f'idx: {idx}, y: {y1_col}')
+        logger.debug('idx: %s, y: %s', idx, y1_col)
         if y1_col not in axes_data["y1"]:
             continue  # Skip if the column isn't in the sorted list
 
@@ -560,28 +529,24 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
         elif auto_title == False:
             y1_lineto_show = axes_titles["y1"]
 
-        print(F'auto_title: {auto_title}')
-        print(F'y1_lineto_show: {y1_lineto_show}')
+        logger.debug('auto_title: %s', auto_title)
+        logger.debug('y1_lineto_show: %s', y1_lineto_show)
         # Assign colors based on position: reverse for ascending
             
         if text and text_freq:
             # Create a list to hold text values based on the text frequency
-            text_values = [
-                f'{tickprefix["y1"] if tickprefix["y1"] else ""}'  # Add tickprefix
-                f'{clean_values(df[y1_col].iloc[i], decimal_places=decimal_places, decimals=decimals)}'  # Use .iloc for positional indexing
-                f'{ticksuffix["y1"] if ticksuffix["y1"] else ""}'  # Add ticksuffix
-                if i % text_freq == 0 else None for i in range(len(df))
-            ]
+            text_values = format_labels(df[y1_col].to_numpy(), prefix=tickprefix["y1"], suffix=ticksuffix["y1"], freq=text_freq,
+                                        decimals=decimals, decimal_places=decimal_places)
               # Automatically adjust text position (inside/outside)
         else:
             text_values = ""
 
-        print(f'index: {df.index}')
-        print(f'vals: {df[y1_col]}')
+        logger.debug('index: %s', df.index)
+        logger.debug('vals: %s', df[y1_col])
 
         color = color_map[y1_col]
 
-        print(f'processing {y1_col} with color {color}')
+        logger.debug('processing %s with color %s', y1_col, color)
       
         # Add the trace for each y1 column with the color assignment
         fig.add_trace(go.Bar(
@@ -599,7 +564,7 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
             )
         ), secondary_y=False)
 
-        print(f'datetime_tick: {datetime_tick}')
+        logger.debug('datetime_tick: %s', datetime_tick)
 
         # if pd.api.types.is_datetime64_any_dtype(df.index):
         #     datetime_tick = True
@@ -706,7 +671,7 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
     if axes_data['y2']:
         for idx, y2_col in enumerate(columns_to_plot):
             if y2_col not in axes_data["y2"]:
-                print(f'Skipping y2 column: {y2_col} (not in columns to plot)')
+                logger.debug('Skipping y2 column: %s (not in columns to plot)', y2_col)
                 continue
 
             if auto_title == True:
@@ -717,7 +682,7 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
             # Determine color based on sorted order for y2
             sorted_index = columns_to_plot.index(y2_col)
             line_color = colors[(sorted_index + len(axes_data["y1"])) % len(colors)]
-            print(f'Processing y2 column: {y2_col} with color: {line_color}')
+            logger.debug('Processing y2 column: %s with color: %s', y2_col, line_color)
             
             fig.add_trace(go.Bar(
                 x=df.index,
@@ -735,66 +700,23 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
         # Generate tick values using np.linspace with rounded bounds
         ticksy = list(np.linspace(y_min, y_max, num=ytick_num, endpoint=True))
         ticksy = [round_up_to_05(tick) for tick in ticksy]
-        print(f'ticksy: {ticksy}')
+        logger.debug('ticksy: %s', ticksy)
         if remove_zero:
             ticksy = [tick for tick in ticksy if tick != 0]
         
-        formatted_ticks = [
-            f"{tickprefix['y1'] if tickprefix['y1'] else ''}{clean_values(tick, decimal_places=0, decimals=False)}{ticksuffix['y1'] if ticksuffix['y1'] else ''}"
-            for tick in ticksy
-        ]
-        print(f'formatted_ticks: {formatted_ticks}')
+        formatted_ticks = format_labels(ticksy, prefix=tickprefix['y1'], suffix=ticksuffix['y1'], decimal_places=0, decimals=False)
+        logger.debug('formatted_ticks: %s', formatted_ticks)
     else:
         ticksy = None
 
     if pd.api.types.is_datetime64_any_dtype(df.index):
         # import pdb; pdb.set_trace()
         datetime_tick = True
-        if pd.infer_freq(df.index.drop_duplicates()) in ['M', 'MS']:
-            total_periods = len(df.index)
-
-            # Always include the first and last
-            start = df.index.min()
-            end = df.index.max()
-
-            # Dynamically adjust num_ticks to ensure even spacing
-            for num_ticks in range(total_periods, 1, -1):
-                step = (total_periods - 1) // (num_ticks - 1)
-                if step > 0 and (total_periods - 1) % step == 0:
-                    break
-
-            # Generate ticks
-            tick_indices = range(0, total_periods, step)
-            if total_periods - 1 not in tick_indices:
-                tick_indices = list(tick_indices) + [total_periods - 1]
-
-            x_ticks = [df.index[i] for i in tick_indices]
-            x_tick_labels = [tick.strftime('%Y-%m-%d') for tick in x_ticks]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            print("X-Tick Labels:", x_tick_labels)
-        else:
-            total_periods = len(df.index)
-    
-            # Dynamically determine the number of ticks (minimum 2: start and end)
-            num_ticks = min(5, total_periods)  # Use at most 5 ticks or total periods, whichever is smaller
-
-            # Get the timestamps for start and end
-            x_start = df.index.min().timestamp()
-            x_end = df.index.max().timestamp()
-
-            # Generate evenly spaced ticks, always include the start and end
-            x_ticks_numeric = np.linspace(x_start, x_end, num=num_ticks)
-
-            # Convert numeric timestamps back to datetime
-            x_ticks = [pd.to_datetime(tick, unit='s').strftime('%Y-%m-%d') for tick in x_ticks_numeric]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            # print("X-Tick Labels:", x_tick_labels)
+        x_ticks = datetime_ticks(df.index, width=dimensions['width'], num_ticks=min(MAX_TICKS, len(df.index)))
     else:
         x_ticks = None
 
-    print(f'x_ticks: {x_ticks}')
+    logger.debug('x_ticks: %s', x_ticks)
 
     fig.update_layout(
         barmode=barmode,
@@ -862,12 +784,12 @@ def simple_bar_plot(df, title, save=False, color_options=None, annotations=True,
     )
 
     if save == True:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
 def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines', area=False, tickprefix=dict(y1=None, y2=None), ticksuffix=dict(y1=None, y2=None),
-                 colors=combined_colors, font_size=18, y2_axis=True, tickangle=None, remove_zero=False, custom_ticks=False,
+                 colors=None, font_size=18, y2_axis=True, tickangle=None, remove_zero=False, custom_ticks=False,
                  bgcolor='rgba(0,0,0,0)', legend_orientation='v', dtick=None, tick0=None,line_width=4, marker_size=10,
                  traceorder='normal', line_color='#2E2E2E', legend_placement=dict(x=0.01, y=1.1),text_font_size=14,
                  bar_color=None, fill=None, margin=dict(l=0, r=0, t=0, b=0), legend_font_size=16, decimals=True, decimal_places=1,
@@ -875,8 +797,9 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
                  tickformat=dict(x=None, y1=".2s", y2=".2s"),font_family=None,font_color='black',file_type='svg',directory='../img',custom_annotation=[],buffer=None,
                  ytick_num=6,axes_font_colors=dict(y1='black',y2='black'),show_legend=True, legend_background=dict(bgcolor='white',bordercolor='black',
                                                                                                                               borderwidth=1, itemsizing='constant'),
-                                                                                                                              autosize=True):
+                                                                                                                              autosize=True,downsample=None):
     
+    colors = default_colors() if colors is None else colors
     if bgcolor == 'default':
         bgcolor = 'rgba(0,0,0,0)'
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -892,7 +815,7 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
         x_range_start = df.index.min() 
         x_range_end = df.index.max() 
 
-    print(f'axes_font_colors param: {axes_font_colors}')
+    logger.debug('axes_font_colors param: %s', axes_font_colors)
 
     if axes_font_colors == 'auto':
         axes_font_colors = {'y1': colors[0], 'y2': line_color}
@@ -908,18 +831,25 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
     filtered_colors = [color for color in colors if color not in [line_col, 'black']]
     filtered_iter = iter(filtered_colors)
 
-    print(f'axes titles: {axes_title}')
+    logger.debug('axes titles: %s', axes_title)
     
+    # Line traces only need as many points as the chart has pixels; bars (one per
+    # period) and annotations below still read df
+    if downsample:
+        line_df = downsample_frame(df, list(line_col or []), dimensions['width'], method=downsample)
+    else:
+        line_df = df
+
     color_iter = iter(colors)  # Create an iterator for the colors
     rev_color_iter = reversed(colors[:-1])
-    print(f'reversed color iter: {rev_color_iter}')
+    logger.debug('reversed color iter: %s', rev_color_iter)
     for i, col in enumerate(line_col):
         color = line_color if i == 0 else next(rev_color_iter, "black")
-        print(f'color for line{color}')
-        print(f'line col: {df[col]}')
+        logger.debug('color for line%s', color)
+        logger.debug('line col: %s', df[col])
         fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df[col],
+            x=line_df.index,
+            y=line_df[col],
             name=f'{col} ({tickprefix["y2"] if tickprefix["y2"] else ""}{clean_values(df[col].iloc[-1], decimals=decimals, decimal_places=decimal_places)}{ticksuffix["y2"] if ticksuffix["y2"] else ""}){"            "}',
             mode=mode,
             stackgroup=None if area == False else 'one',
@@ -932,7 +862,7 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
         # Add bar traces without specifying `width` to maintain default spacing
         for col in bar_col:
             color = next(filtered_iter, colors[1])  # Get the next color, fallback to first color if exhausted
-            print(f'color for bar{color}')
+            logger.debug('color for bar%s', color)
             fig.add_trace(go.Bar(
                 x=df.index,
                 y=df[col],
@@ -984,49 +914,14 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
         ticksy = [round_up_to_05(tick) for tick in ticksy]
         if remove_zero:
             ticksy = [tick for tick in ticksy if tick != 0]
-        formatted_ticks = [
-        f"{tickprefix['y1'] if tickprefix['y1'] else ''}{clean_values(tick, decimal_places=0, decimals=False)}{ticksuffix['y1'] if ticksuffix['y1'] else ''}"
-        for tick in ticksy]
+        formatted_ticks = format_labels(ticksy, prefix=tickprefix['y1'], suffix=ticksuffix['y1'], decimal_places=0, decimals=False)
     else:
         ticksy = None  # Default to None if not using custom ticks
 
     # Convert datetime index to timestamps for linspace calculation
     if pd.api.types.is_datetime64_any_dtype(df.index):
-        # import pdb; pdb.set_trace()
         datetime_tick = True
-        if pd.infer_freq(df.index.drop_duplicates()) in ['M', 'MS']:
-            total_periods = len(df.index)
-
-            # Always include the first and last
-            start = df.index.min()
-            end = df.index.max()
-
-            # Dynamically adjust num_ticks to ensure even spacing
-            for num_ticks in range(total_periods, 1, -1):
-                step = (total_periods - 1) // (num_ticks - 1)
-                if step > 0 and (total_periods - 1) % step == 0:
-                    break
-
-            # Generate ticks
-            tick_indices = range(0, total_periods, step)
-            if total_periods - 1 not in tick_indices:
-                tick_indices = list(tick_indices) + [total_periods - 1]
-
-            x_ticks = [df.index[i] for i in tick_indices]
-            x_tick_labels = [tick.strftime('%Y-%m-%d') for tick in x_ticks]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            print("X-Tick Labels:", x_tick_labels)
-        else:
-            x_start = df.index.min().timestamp()
-            x_end = df.index.max().timestamp()
-            x_ticks_numeric = np.linspace(x_start, x_end, num=5)
-            x_ticks = [pd.to_datetime(tick, unit='s').strftime('%Y-%m-%d') for tick in x_ticks_numeric]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            # print("X-Tick Labels:", x_tick_labels)
-    else:
-        x_ticks = None
+    x_ticks = datetime_ticks(df.index, width=dimensions['width'])
 
     fig.update_layout(
         barmode=barmode,
@@ -1064,8 +959,8 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
         tick0=tick0
     )
 
-    print(f'axes_title["y1"]: {axes_title["y1"]}')
-    print(f'axes_font_colors["y1"]: {axes_font_colors["y1"]}')
+    logger.debug('axes_title["y1"]: %s', axes_title['y1'])
+    logger.debug('axes_font_colors["y1"]: %s', axes_font_colors['y1'])
     
     fig.update_yaxes(
         title_text=axes_title["y1"],
@@ -1089,11 +984,11 @@ def line_and_bar(df, title, save=False, bar_col=None, line_col=None, mode='lines
     )
 
     if save:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
-def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines', col=None, sort_col=None,
+def sorted_multi_line(df, title, save=False, colors=None, mode='lines', col=None, sort_col=None,
                       sort_list=True, area=False, tickprefix=None, ticksuffix=None, font_size=18,
                       bgcolor='rgba(0,0,0,0)', legend_orientation='h', tickangle=None,
                       traceorder='normal', legend_placement=dict(x=0.01, y=1.1), margin=dict(l=0, r=0, t=0, b=0),
@@ -1103,13 +998,17 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
                       ,directory='../img',custom_annotation=[],cumulative_sort=False,line_width=4,marker_size=10,
                       annotations=False,max_annotation=False,text_font_size=14,legend_background=dict(bgcolor='white',bordercolor='black',
                                                                                                                               borderwidth=1, itemsizing='constant'),
-                                                                                                                              autosize=True):
+                                                                                                                              autosize=True,downsample=None,validate=True):
     
+    colors = default_colors() if colors is None else colors
     combined_colors = colors
+    # Plotted in date order, from a sorted frame rather than by sorting the caller's
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
 
-    print(f'tick0: {tick0}')
+    logger.debug('tick0: %s', tick0)
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig = figure_builder()
     traces = []
 
     x_buffer = pd.Timedelta(days=15)
@@ -1121,18 +1020,34 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
         cumulative_sort=cumulative_sort, colors=colors
     )
 
-    print(f'sort_list: {sort_list}')
-    print(f'color_map: {color_map}')
+    logger.debug('sort_list: %s', sort_list)
+    logger.debug('color_map: %s', color_map)
+
+    positions = group_positions(df, sort_col)
+
+    if downsample and area:
+        # Stacked traces have to share x values, so keep the union of every group's points
+        kept_x = [downsample_frame(df.iloc[rows], [col], dimensions['width'], method=downsample).index
+                  for rows in positions.values()]
+        kept_x = kept_x[0].append(kept_x[1:]).unique() if kept_x else df.index[:0]
 
     # Plot using latest value sort and cumulative color mapping
     for idx, i in enumerate(sort_list):
-        i_df = df[df[sort_col] == i]
+        i_df = df.iloc[positions.get(i, NO_ROWS)]
         # Use the cumulative color map if available; otherwise, fallback to index-based colors
         color = color_map.get(i, colors[idx % len(colors)])
 
-        traces.append(go.Scatter(
-            x=i_df.index,
-            y=i_df[col],
+        if not downsample:
+            plot_df = i_df
+        elif area:
+            plot_df = i_df[i_df.index.isin(kept_x)]
+        else:
+            plot_df = downsample_frame(i_df, [col], dimensions['width'], method=downsample)
+
+        traces.append(dict(
+            type='scatter',
+            x=plot_df.index,
+            y=plot_df[col],
             name=f'{i} ({tickprefix if tickprefix else ""}{clean_values(i_df[col].iloc[-1], decimals=decimals, decimal_places=decimal_places) if i_df.index.max() == df.index.max() else 0}{ticksuffix if ticksuffix else ""}){"                  "}',
             line=dict(color=color, width=line_width),
             marker=dict(color=color, size=marker_size), 
@@ -1142,17 +1057,17 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
             showlegend=show_legend
         ))
 
-        print(f'idx: {idx}')
-        print(f'custom_annotation: {custom_annotation}')
+        logger.debug('idx: %s', idx)
+        logger.debug('custom_annotation: %s', custom_annotation)
 
         if idx == 0:
             if custom_annotation:
                 for date in custom_annotation:
-                    print(f'i_df index: {i_df}')
-                    print(f'custom_annotation: {date}')
+                    logger.debug('i_df index: %s', i_df)
+                    logger.debug('custom_annotation: %s', date)
                     if date in i_df.index:
                         y_value = i_df.loc[date, col]
-                        print(f'y_value: {y_value}')
+                        logger.debug('y_value: %s', y_value)
                         annotation_text = f'{date}: {tickprefix if tickprefix else ""}{clean_values(y_value, decimal_places=decimal_places, decimals=decimals)}{ticksuffix if ticksuffix else ""}'
 
                         fig.add_annotation(dict(
@@ -1187,41 +1102,8 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
 
     # Continue with x-axis ticks as before
     if pd.api.types.is_datetime64_any_dtype(df.index):
-        # import pdb; pdb.set_trace()
         datetime_tick = True
-        if pd.infer_freq(df.index.drop_duplicates()) in ['M', 'MS']:
-            total_periods = len(df.index)
-
-            # Always include the first and last
-            start = df.index.min()
-            end = df.index.max()
-
-            # Dynamically adjust num_ticks to ensure even spacing
-            for num_ticks in range(total_periods, 1, -1):
-                step = (total_periods - 1) // (num_ticks - 1)
-                if step > 0 and (total_periods - 1) % step == 0:
-                    break
-
-            # Generate ticks
-            tick_indices = range(0, total_periods, step)
-            if total_periods - 1 not in tick_indices:
-                tick_indices = list(tick_indices) + [total_periods - 1]
-
-            x_ticks = [df.index[i] for i in tick_indices]
-            x_tick_labels = [tick.strftime('%Y-%m-%d') for tick in x_ticks]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            print("X-Tick Labels:", x_tick_labels)
-        else:
-            x_start = df.index.min().timestamp()
-            x_end = df.index.max().timestamp()
-            x_ticks_numeric = np.linspace(x_start, x_end, num=5)
-            x_ticks = [pd.to_datetime(tick, unit='s').strftime('%Y-%m-%d') for tick in x_ticks_numeric]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            # print("X-Tick Labels:", x_tick_labels)
-    else:
-        x_ticks = None
+    x_ticks = datetime_ticks(df.index, width=dimensions['width'])
         
     if custom_ticks:
         figy = df[col] 
@@ -1235,10 +1117,7 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
         if remove_zero:
             ticksy = [tick for tick in ticksy if tick != 0]
         
-        formatted_ticks = [
-        f"{tickprefix if tickprefix else ''}{clean_values(tick, decimal_places=0, decimals=False)}{ticksuffix if ticksuffix else ''}"
-        for tick in ticksy
-    ]
+        formatted_ticks = format_labels(ticksy, prefix=tickprefix, suffix=ticksuffix, decimal_places=0, decimals=False)
         
     else:
         ticksy = None  # Default to None if not using custom ticks
@@ -1293,71 +1172,75 @@ def sorted_multi_line(df, title, save=False, colors=combined_colors, mode='lines
         )
     )
 
+    fig = fig.to_figure(validate=validate)
+
     if save:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
-def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='stack', col=None, sort_col=None,
+def ranked_bar_chart(df, title, save=False, colors=None, barmode='stack', col=None, sort_col=None,
                      tickprefix=None, ticksuffix=None, font_size=18,
                      bgcolor='rgba(0,0,0,0)', legend_orientation='h', tickangle=None, textposition="outside", orientation="h",
                      legend_placement=dict(x=0.01, y=1.1), minsize=16, legend_font_size=16, margin=dict(l=0, r=0, t=0, b=0),
                      showlegend=False, decimals=True, traceorder='normal', decimal_places=1, to_reverse=False,
                      tickformat=',.0f', itemsizing='constant', trace_text=14, dimensions=dict(width=730, height=400), descending=True,
                      use_sort_list=True,show_text=True,font_family=None,font_color='black',file_type='svg',directory='../img',
-                     use_single_color=False):
+                     use_single_color=False,validate=True):
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    colors = default_colors() if colors is None else colors
+    fig = figure_builder()
 
     combined_colors = colors
 
     primary_color = colors[0] if use_single_color else None
 
-    print(f'combined_colors: {combined_colors}')
-    print(f'primary_color: {primary_color}')
+    logger.debug('combined_colors: %s', combined_colors)
+    logger.debug('primary_color: %s', primary_color)
 
     traces = []
-    print(f'df sort order before ranked cleaning: {df[sort_col].unique()}')
+    logger.debug('df sort order before ranked cleaning: %s', lazy(lambda: df[sort_col].unique()))
 
     df, sort_list = ranked_cleaning(df, col, sort_col, descending=descending,use_sort_list=use_sort_list)
-    print(f'df: {df}')
+    logger.debug('df: %s', df)
 
-    print(f'Decimal Places: {decimal_places}')
+    logger.debug('Decimal Places: %s', decimal_places)
 
     # if use_sort_list:
     #     sort_list = sort_list
     # else:
     #     sort_list = df.columns
 
-    print(f'sort_list: {sort_list}')
+    logger.debug('sort_list: %s', sort_list)
 
     if to_reverse:
         sort_list = reversed(sort_list)
 
-    print(f'sort list: {sort_list}')
+    logger.debug('sort list: %s', sort_list)
+    positions = group_positions(df, sort_col)
     for idx, i in enumerate(sort_list):
+        i_values = df[col].iloc[positions.get(i, NO_ROWS)]
         if showlegend:
-            print(f'i: {i} \nidx: {idx} \nprefix: {ticksuffix}')
-            name = f'{i} ({tickprefix if tickprefix else ""}{clean_values(df[df[sort_col] == i][col].iloc[-1], decimal_places=decimal_places, decimals=decimals)}{ticksuffix if ticksuffix else ""})' 
+            logger.debug('i: %s \nidx: %s \nprefix: %s', i, idx, ticksuffix)
+            name = f'{i} ({tickprefix if tickprefix else ""}{clean_values(i_values.iloc[-1], decimal_places=decimal_places, decimals=decimals)}{ticksuffix if ticksuffix else ""})' 
             text = None
             y = idx
         else:
             if show_text:
-                print(f'i: {i} \nidx: {idx} \nprefix: {ticksuffix}')
+                logger.debug('i: %s \nidx: %s \nprefix: %s', i, idx, ticksuffix)
                 name = None
                 # Add buffer (spaces) at the end of each formatted text value
-                text = df[df[sort_col] == i][col].apply(
-                    lambda x: f'{tickprefix if tickprefix else ""}{clean_values(x, decimals=decimals, decimal_places=decimal_places)}{ticksuffix if ticksuffix else ""}'
-                )
+                text = format_labels(i_values.to_numpy(), prefix=tickprefix, suffix=ticksuffix,
+                                     decimals=decimals, decimal_places=decimal_places)
                 y = i
             else:
-                print(f'i: {i} \nidx: {idx} \nprefix: {ticksuffix}')
+                logger.debug('i: %s \nidx: %s \nprefix: %s', i, idx, ticksuffix)
                 name = None
                 text = None
                 y = i
 
 
-        print(f'idx: {idx} i: {i}')
+        logger.debug('idx: %s i: %s', idx, i)
 
         # Determine the color based on descending order
         if use_single_color:
@@ -1367,17 +1250,18 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
         else:
             color = combined_colors[len(sort_list) - idx - 1]  # Reverse order for ascending
 
-        print(f'use_single_color:{use_single_color}')
-        print(f'color: {color}')
+        logger.debug('use_single_color:%s', use_single_color)
+        logger.debug('color: %s', color)
 
         if orientation == 'v':  # Vertical orientation
             x = [i]  # Categorical value on the x-axis
-            y = df[df[sort_col] == i][col]  # Numeric value on the y-axis
+            y = i_values  # Numeric value on the y-axis
         else:  # Horizontal orientation
-            x = df[df[sort_col] == i][col]
+            x = i_values
             y = [i]  # Categorical value on the y-axis
 
-        traces.append(go.Bar(
+        traces.append(dict(
+            type='bar',
             y=y,
             x=x,
             orientation=orientation,
@@ -1421,7 +1305,7 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
 
     index_length = len(df.index)
 
-    print(f'text: {show_text}')
+    logger.debug('text: %s', show_text)
 
     if orientation == 'v':
         if not showlegend:
@@ -1450,7 +1334,7 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
 
     else:  # Horizontal orientation
         if not showlegend:
-            print(f'no legend, horizontal')
+            logger.debug('no legend, horizontal')
             ytickprefix = None
             yticksuffix = None
             tickvals = None  # No specific tick values for y-axis
@@ -1466,7 +1350,7 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
                 xticktext = None
 
         else:
-            print(f'legend, horizontal')
+            logger.debug('legend, horizontal')
             ytickprefix = None
             yticksuffix = None
             tickvals = list(range(index_length))  # No specific tick values for y-axis
@@ -1482,10 +1366,8 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
     # print(f'xticktext: {xticktext if xtickvals else ""}')
 
     fig.update_layout(
-        xaxis_title=dict(
-            font=dict(size=font_size, family=font_family, color=font_color),
-        ),
-        xaxis=dict(tickangle=tickangle,
+        xaxis=dict(title=dict(font=dict(size=font_size, family=font_family, color=font_color)),
+                   tickangle=tickangle,
                    tickfont=dict(size=font_size, family=font_family, color=font_color),
                    tickprefix=xtickprefix,
                    ticksuffix=xticksuffix,
@@ -1505,12 +1387,14 @@ def ranked_bar_chart(df, title, save=False, colors=combined_colors, barmode='sta
     )
 
     # Figure
+    fig = fig.to_figure(validate=validate)
+
     if save:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
-def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, sort_col=None, sort_list=True,
+def sorted_bar_chart(df, title, save=False, colors=None, col=None, sort_col=None, sort_list=True,
                       tickprefix=None, ticksuffix=None, font_size=18, remove_zero=False, custom_ticks=False,
                       bgcolor='rgba(0,0,0,0)', legend_orientation='h', bar_orientation='v', tickangle=None,
                       dtick=None, margin=dict(l=0, r=0, t=0, b=0), decimals=True, traceorder='normal',
@@ -1521,12 +1405,16 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
                     text_freq=1,text_position='outside',text_font_size=14, legend_background=dict(bgcolor='white',bordercolor='black',
                                                                                                     borderwidth=1, itemsizing='constant',
                                                                                                     yanchor="top",xanchor="center"),
-                                                                                                                              autosize=True):
-    print(f'cumulative_sort: {cumulative_sort}')
+                                                                                                                              autosize=True,validate=True):
+    colors = default_colors() if colors is None else colors
+    # Plotted in date order, from a sorted frame rather than by sorting the caller's
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    logger.debug('cumulative_sort: %s', cumulative_sort)
     
-    print(f'sorted_bar_legend_orientation: {legend_orientation}')
+    logger.debug('sorted_bar_legend_orientation: %s', legend_orientation)
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig = figure_builder()
 
     combined_colors = colors
 
@@ -1540,7 +1428,7 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
         x_range_start = df.index.min() 
         x_range_end = df.index.max() 
 
-    print(f'x_range_start:{x_range_start}')
+    logger.debug('x_range_start:%s', x_range_start)
 
     traces = []
 
@@ -1549,29 +1437,27 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
         cumulative_sort=cumulative_sort, colors=colors
     )
 
-    print(f'df columns: {df.columns}')
+    logger.debug('df columns: %s', df.columns)
 
-    print(f"sort_col: {sort_col}")
-    print(f"sort_list: {sort_list}")
-    print(f"df[sort_col]:\n{df[sort_col].unique()}")
+    logger.debug('sort_col: %s', sort_col)
+    logger.debug('sort_list: %s', sort_list)
+    logger.debug('df[sort_col]:\n%s', lazy(lambda: df[sort_col].unique()))
 
     missing_values = set(sort_list) - set(df[sort_col].unique())
-    print(f"Missing values in sort_list: {missing_values}")
+    logger.debug('Missing values in sort_list: %s', missing_values)
+
+    positions = group_positions(df, sort_col)
 
     # Iterate over sorted columns and assign colors accordingly
     for idx, i in enumerate(sort_list):
-        i_df = df[df[sort_col] == i]
+        i_df = df.iloc[positions.get(i, NO_ROWS)]
 
         color = color_map.get(i, colors[idx % len(colors)])
 
         if text and text_freq:
             # Create a list to hold text values based on the text frequency
-            text_values = [
-                f'{tickprefix if tickprefix else ""}'  # Add tickprefix
-                f'{clean_values(i_df[col].iloc[i], decimal_places=decimal_places, decimals=decimals)}'  # Use .iloc for positional indexing
-                f'{ticksuffix if ticksuffix else ""}'  # Add ticksuffix
-                if i % text_freq == 0 else None for i in range(len(i_df))
-            ]
+            text_values = format_labels(i_df[col].to_numpy(), prefix=tickprefix, suffix=ticksuffix, freq=text_freq,
+                                        decimals=decimals, decimal_places=decimal_places)
               # Automatically adjust text position (inside/outside)
         else:
             text_values = ""
@@ -1582,10 +1468,11 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
         # else:
         #     column_color = combined_colors[len(sort_list) - idx - 1]  # Reverse order for ascending
 
-        print(f'i_df:{i_df}')
-        print(f'col:{col}')
-        print(f'text font size: {text_font_size}')
-        traces.append(go.Bar(
+        logger.debug('i_df:%s', i_df)
+        logger.debug('col:%s', col)
+        logger.debug('text font size: %s', text_font_size)
+        traces.append(dict(
+            type='bar',
             x=i_df.index if bar_orientation == 'v' else i_df[col],
             y=i_df[col] if bar_orientation == 'v' else i_df.index,
             orientation=bar_orientation,
@@ -1643,43 +1530,10 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
 
     # Convert datetime index to timestamps for linspace calculation
     if pd.api.types.is_datetime64_any_dtype(df.index):
-        # import pdb; pdb.set_trace()
         datetime_tick = True
-        if pd.infer_freq(df.index.drop_duplicates()) in ['M', 'MS']:
-            total_periods = len(df.index)
-
-            # Always include the first and last
-            start = df.index.min()
-            end = df.index.max()
+    x_ticks = datetime_ticks(df.index, width=dimensions['width'])
 
-            # Dynamically adjust num_ticks to ensure even spacing
-            for num_ticks in range(total_periods, 1, -1):
-                step = (total_periods - 1) // (num_ticks - 1)
-                if step > 0 and (total_periods - 1) % step == 0:
-                    break
-
-            # Generate ticks
-            tick_indices = range(0, total_periods, step)
-            if total_periods - 1 not in tick_indices:
-                tick_indices = list(tick_indices) + [total_periods - 1]
-
-            x_ticks = [df.index[i] for i in tick_indices]
-            x_tick_labels = [tick.strftime('%Y-%m-%d') for tick in x_ticks]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            print("X-Tick Labels:", x_tick_labels)
-        else:
-            x_start = df.index.min().timestamp()
-            x_end = df.index.max().timestamp()
-            x_ticks_numeric = np.linspace(x_start, x_end, num=5)
-            x_ticks = [pd.to_datetime(tick, unit='s').strftime('%Y-%m-%d') for tick in x_ticks_numeric]
-
-            print("X-Ticks (Datetime):", x_ticks)
-            # print("X-Tick Labels:", x_tick_labels)
-    else:
-        x_ticks = None
-
-    print(f'x_ticks:{x_ticks}')
+    logger.debug('x_ticks:%s', x_ticks)
 
     fig.update_layout(
         barmode=barmode,
@@ -1707,10 +1561,8 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
     )
 
     fig.update_layout(
-        xaxis_title=dict(
-            font=dict(size=font_size, family=font_family, color=font_color)
-        ),
         xaxis=dict(
+            title=dict(font=dict(size=font_size, family=font_family, color=font_color)),
             range=[x_range_start, x_range_end],
             tickvals=x_ticks,
             tickangle=tickangle,
@@ -1728,18 +1580,21 @@ def sorted_bar_chart(df, title, save=False, colors=combined_colors, col=None, so
         ),
     )
 
+    fig = fig.to_figure(validate=validate)
+
     if save:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
 
-def pie_chart(df, sum_col, index_col, title, save=False,colors=combined_colors,bgcolor='rgba(0,0,0,0)',annotation_prefix=None, annotation_suffix = None, annotation_font_size=25,
+def pie_chart(df, sum_col, index_col, title, save=False,colors=None,bgcolor='rgba(0,0,0,0)',annotation_prefix=None, annotation_suffix = None, annotation_font_size=25,
               decimals=True,legend_font_size=16,font_size=18, legend_placement=dict(x=0.01,y=1.1),margin=dict(l=0, r=0, t=0, b=0),hole_size=.6,line_width=0,
               legend_orientation='v',decimal_places=1,itemsizing='constant',dimensions=dict(width=730,height=400),font_family=None,font_color='black',file_type='svg',directory='../img',textinfo='none',
               show_legend=False,text_font_size=12,text_font_color='black',texttemplate=None,annotation=True):
     
+    colors = default_colors() if colors is None else colors
     original_labels = df[index_col].unique()
-    print(f'original_labels: {original_labels}')
+    logger.debug('original_labels: %s', original_labels)
 
     if textinfo == 'percent+label':
         percent=False
@@ -1754,9 +1609,9 @@ def pie_chart(df, sum_col, index_col, title, save=False,colors=combined_colors,b
     #     print(f'{textinfo}, {labels}')
     # else:
     labels = padded_labels
-    print(f'{textinfo}, {labels}')
+    logger.debug('%s, %s', textinfo, labels)
 
-    print(f'textinfo: {textinfo}')
+    logger.debug('textinfo: %s', textinfo)
 
     fig = go.Figure(data=[go.Pie(
         labels=labels,
@@ -1820,25 +1675,30 @@ def pie_chart(df, sum_col, index_col, title, save=False,colors=combined_colors,b
     )
 
     if save == True:
-        pio.write_image(fig, f'{directory}/{title}.{file_type}', engine="kaleido")
+        write_image(fig, f'{directory}/{title}.{file_type}')
 
     return fig
     
 def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, title='l1_fdv_cluster',
                  scaling=dict(marker_scale=2e10), seed=42, use_physics=True,
                  show_legend=False, marker=dict(sizemin=10, mode="markers+text", opacity=1),
-                 text=dict(general=18, annotation=18), annotation_dict=dict(yshift=-20), groupby_color=None, scale_y=False,x_num_col=None,rescale=False,
+                 text=dict(general=18, annotation=18), annotation_dict=None, groupby_color=None, scale_y=False,x_num_col=None,rescale=False,
                     tickprefix=None,ticksuffix=None,exclude_largest=False,save=False,dimensions=dict(w=730,h=351),
-                    margin_modifier = 25,colors=combined_colors,flat_line=False):
+                    margin_modifier = 25,colors=None,flat_line=False,cache_layout=True):
     
+    colors = default_colors() if colors is None else colors
     combined_colors = colors
+
+    if annotation_dict is not None:
+        warnings.warn("bubble_chart's annotation_dict is deprecated and ignored: labels are drawn as "
+                      "text centred in each bubble", DeprecationWarning, stacklevel=2)
     
     x_tickprefix, x_ticksuffix = None, None
     y_tickprefix, y_ticksuffix = None, None
 
-    print(f'num_col at start: {num_col}')
+    logger.debug('num_col at start: %s', num_col)
 
-    print(f'marker: {marker}')
+    logger.debug('marker: %s', marker)
     
     if num_col == 'market_cap':
         y_tickprefix = '$'
@@ -1863,14 +1723,12 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
     # else:
     #     x_values = range(len(df))
     
-    print("\n=== Initial DataFrame ===")
-    print(df)
-
-    original_df = df.copy()
+    logger.debug('=== Initial DataFrame ===')
+    logger.debug('%s', df)
 
-    print(f'num_col: {num_col}')
+    logger.debug('num_col: %s', num_col)
 
-    print(f'other: {keep_topn}')
+    logger.debug('other: %s', keep_topn)
 
     # Handle top N filtering if specified
     if keep_topn:
@@ -1878,14 +1736,13 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
             df = top_other_by_col_bubble(df=df, sort_col=groupby, sum_col=num_col, num=topn, groupby_color=groupby_color)
         else:
             df = top_by_col_bubble(df=df, sort_col=groupby, sum_col=num_col, num=topn, groupby_color=groupby_color)
-        print("\n=== DataFrame After Top N Filtering ===")
-        print(f'df bf if groupby_color: {df[groupby].unique()}')
-        print(df)
-    print(f'num_col: {num_col}')
+        logger.debug('=== DataFrame After Top N Filtering ===')
+        logger.debug('df bf if groupby_color: %s', lazy(lambda: df[groupby].unique()))
+        logger.debug('%s', df)
+    logger.debug('num_col: %s', num_col)
 
     num_points = len(df[groupby].unique())
-    dynamic_k = 1 / (num_points ** 0.5)  # Adjust the exponent to control spread
-    dynamic_iterations = min(max(num_points * 10, 200), 2000)  # Between 200 and 2000
+    dynamic_k = 1 / (num_points ** 0.5)  # Gap between packed bubbles, as a share of the mean radius
 
     # Drop NaN values for groupby and num_col
     df = df.dropna(subset=[groupby, num_col])
@@ -1893,8 +1750,8 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
     if exclude_largest:
         max_index = df[num_col].idxmax()
         df = df.drop(max_index)
-        print("\n=== DataFrame After Excluding Largest Datapoint ===")
-        print(df)
+        logger.debug('=== DataFrame After Excluding Largest Datapoint ===')
+        logger.debug('%s', df)
 
     if rescale:
     
@@ -1932,12 +1789,13 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
     if x_num_col:
         agg_dict[x_num_col] = 'mean'  # Use 'mean' or any other appropriate aggregation function
 
-    df = df.groupby(group_cols).agg(agg_dict).reset_index()
+    df = df.groupby(group_cols, observed=True).agg(agg_dict).reset_index()
 
-    df.fillna(0,inplace=True)
+    # Only the aggregated values: 0 isn't a category of the (categorical) group columns
+    df[list(agg_dict)] = df[list(agg_dict)].fillna(0)
 
-    print("\n=== DataFrame After Dropping NaNs ===")
-    print(df)
+    logger.debug('=== DataFrame After Dropping NaNs ===')
+    logger.debug('%s', df)
 
     if x_num_col is None:
         x_values = range(len(df))
@@ -1946,32 +1804,39 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
 
     # Create positions DataFrame
     if use_physics:
-    # Create a graph and add nodes with attributes (size based on num_col)
-        G = nx.Graph()
-        for _, row in df.iterrows():
-            G.add_node(tuple(row[group_cols]), size=row[num_col])
-    
-        print("\n=== Nodes in Graph ===")
-        print(G.nodes)
-    
-        # Add arbitrary edges to simulate clustering
-        for i in range(len(df)):
-            for j in range(i + 1, len(df)):
-                G.add_edge(tuple(df.iloc[i][group_cols]), tuple(df.iloc[j][group_cols]))
-    
-        # Compute positions using a force-directed layout
-        positions = nx.spring_layout(G, seed=seed, k=dynamic_k, iterations=dynamic_iterations)
-    
-        print("\n=== Positions Computed ===")
-        print(positions)
-    
-        # Extract positions into a DataFrame
-        pos_df = pd.DataFrame({
-            **{col: [key[i] for key in positions.keys()] for i, col in enumerate(group_cols)},
-            "x": [p[0] for p in positions.values()],
-            "y": [p[1] for p in positions.values()],
-            num_col: [G.nodes[n]["size"] for n in positions.keys()],
-        })
+        # Pack the bubbles at the size they are drawn, biggest in the middle
+        sizes = calculate_marker_size(df[num_col].to_numpy(dtype=float), scaling['marker_scale'])
+        sizes = np.where(sizes <= 0, marker['sizemin'] * 5, sizes)
+        radii = bubble_radii(sizes, marker['sizemin'])
+        padding = dynamic_k * radii.mean()
+        if cache_layout:
+            # Same coins and sizes as a previous run reuse (or nudge) that layout
+            groups = df[group_cols].itertuples(index=False, name=None)
+            positions = get_default_layout_cache().pack(groups, radii, padding=padding, seed=seed)
+        else:
+            positions = pack_circles(radii, padding=padding, seed=seed)
+
+        # Bubbles are drawn in px, so the axes map one data unit to one pixel (ranges set
+        # below). A packing bigger than the plot is shrunk together with its bubbles
+        plot_w, plot_h = dimensions['w'], dimensions['h'] - (margin_modifier if show_legend else 0)
+        low = (positions - radii[:, None]).min(axis=0)
+        high = (positions + radii[:, None]).max(axis=0)
+        fit = min(1.0, plot_w / (high[0] - low[0]), plot_h / (high[1] - low[1]))
+        if fit < 1:
+            logger.debug('shrinking the bubble layout by %.3f to fit the plot', fit)
+        positions = positions * fit
+        centre = (low + high) / 2 * fit
+        physics_ranges = ([centre[0] - plot_w / 2, centre[0] + plot_w / 2],
+                          [centre[1] - plot_h / 2, centre[1] + plot_h / 2])
+        physics_sizes = 2 * radii * fit
+
+        logger.debug('=== Positions Computed ===')
+        logger.debug('%s', positions)
+
+        pos_df = df[group_cols].copy()
+        pos_df["x"] = positions[:, 0]
+        pos_df["y"] = positions[:, 1]
+        pos_df[num_col] = df[num_col]
     elif flat_line:
         df = df.sort_values(by=num_col, ascending=False).reset_index(drop=True)
 
@@ -1995,36 +1860,30 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
         groupby_color = groupby
 
      # Calculate summed values for legend
-    legend_sums = df.groupby(groupby_color)[num_col].sum().reset_index().sort_values(by=num_col, ascending=False)
-    print(f'legend_sums: {legend_sums}')
-    print(f'num_col: {num_col}')
-    legend_sums[num_col] = legend_sums[num_col].apply(clean_values)
+    legend_sums = df.groupby(groupby_color, observed=True)[num_col].sum().reset_index().sort_values(by=num_col, ascending=False)
+    logger.debug('legend_sums: %s', legend_sums)
+    logger.debug('num_col: %s', num_col)
+    legend_sums[num_col] = clean_values(legend_sums[num_col])
 
     # Create a color map for groupby_color
-    unique_categories = pos_df[groupby_color].unique()
-
-    group_sums = pos_df.groupby(groupby_color)[num_col].sum()
+    group_sums = pos_df.groupby(groupby_color, observed=True)[num_col].sum()
     sorted_groups = group_sums.sort_values(ascending=False).index
 
     category_color_map = {
         category: combined_colors[0] if idx == 0 else combined_colors[(idx + 1) % len(combined_colors)]
         for idx, category in enumerate(sorted_groups)
     }
-    print(f'category_color_map: {category_color_map}')
+    logger.debug('category_color_map: %s', category_color_map)
 
-    largest_y_per_category = pos_df.groupby(groupby_color)[num_col].idxmax()
-
-    categories_in_legend = set()
-
-    print("\n=== Positions DataFrame ===")
-    print(pos_df)
+    logger.debug('=== Positions DataFrame ===')
+    logger.debug('%s', pos_df)
 
     # Create the Plotly figure
     fig = go.Figure()
 
     if groupby_color:
         # Calculate the total sum for each category and sort by descending order
-        group_sums = pos_df.groupby(groupby_color)[num_col].sum()
+        group_sums = pos_df.groupby(groupby_color, observed=True)[num_col].sum()
         sorted_categories = group_sums.sort_values(ascending=False).index
 
         # Create the category color map based on the sorted categories
@@ -2033,88 +1892,69 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
             for idx, category in enumerate(sorted_categories)
         }
 
-        print(f'category_color_map: {category_color_map}')
-
-    # Track which categories have already been added to the legend
-    categories_in_legend = set()
-
-    print(f'pos_df: {pos_df}')
-
-    # Add each node as a scatter point and assign colors
-    for idx, (_, row) in enumerate(pos_df.iterrows()):
-        # Determine the color based on the category
-        print(F'groupby_color, groupby, color: {row[groupby_color], row[groupby]}, {category_color_map[row[groupby_color]]}')
-        color = category_color_map.get(row[groupby_color], combined_colors[idx % len(combined_colors)]) if groupby_color else combined_colors[idx % len(combined_colors)]
-        legend_sum = group_sums.get(row[groupby_color], 0)
-        print(f'at color after legend_sum: {color}')
-        trace_name = f"{row[groupby_color]} ({tickprefix if tickprefix else ''}{legend_sum}{ticksuffix if ticksuffix else ''})"
-
-        show_legend_entry = idx in largest_y_per_category.values and row[groupby_color] not in categories_in_legend
-        # print(f'largest_y_per_category[idx]:{largest_y_per_category[idx]}')
-        print(f'show_legend_entry:{show_legend_entry}')
-        print(f'categories_in_legend:{categories_in_legend}')
-        if show_legend_entry:
-            categories_in_legend.add(row[groupby_color])
-
-        print(f'pos_df: {pos_df.columns}')
-
-
-        # Create hyperlink text if 'id' is in the DataFrame columns
-        if 'id' in pos_df.columns:
-            if 'symbol' in pos_df.columns:
-                text_wording = (
-                    f'<a href="https://www.coingecko.com/en/coins/{row["id"]}" target="_blank">{row["symbol"]}</a>'
-                    f'<br>${clean_values(row[num_col], decimals=True, decimal_places=1)}'
-                )
-            else:
-                text_wording = (
-                    f'<a href="https://www.coingecko.com/en/coins/{row["id"]}" target="_blank">{row["symbol"]}</a>'
-                    f'<br>${clean_values(row[num_col], decimals=True, decimal_places=1)}'
-                )
-
-        else:
-            text_wording = None
+        logger.debug('category_color_map: %s', category_color_map)
 
-        # Show legend only once per category
-        if groupby_color and row[groupby_color] not in categories_in_legend:
-            categories_in_legend.add(row[groupby_color])
+    logger.debug('pos_df: %s', pos_df)
 
-        size = calculate_marker_size(row[num_col], scaling['marker_scale'])
-        if size <= 0:
-            size = marker['sizemin']*5  # Use the minimum marker size as a fallback
-
-        print(f' at trace color for {row[groupby_color]}, {row[groupby]}: {color}')
-        print(f'sizemin: {marker["sizemin"]}')
+    # Marker sizes for every bubble at once
+    sizemin = marker['sizemin']
+    if use_physics:
+        # As packed (pos_df is in df's order)
+        sizes = physics_sizes
+        if fit < 1:
+            sizemin = sizemin * fit
+    else:
+        sizes = calculate_marker_size(pos_df[num_col].to_numpy(dtype=float), scaling['marker_scale'])
+        sizes = np.where(sizes <= 0, marker['sizemin'] * 5, sizes)  # Use the minimum marker size as a fallback
+    values = format_values(pos_df[num_col].to_numpy(), decimals=True, decimal_places=1)
+
+    if 'id' in pos_df.columns:
+        # Hyperlinked symbol (or id) with the value underneath
+        labels = pos_df['symbol'] if 'symbol' in pos_df.columns else pos_df['id']
+        point_text = [f'<a href="https://www.coingecko.com/en/coins/{coin}" target="_blank">{label}</a><br>${value}'
+                      for coin, label, value in zip(pos_df['id'], labels, values)]
+        textposition = 'middle center'
+        textfont = None
+        mode = marker['mode']
+    else:
+        # Name and value as trace text centred in the bubble, rather than one layout
+        # annotation per bubble; shown whatever marker['mode'] says, as annotations were
+        point_text = [f"{name}<br>${value}" for name, value in zip(pos_df[groupby], values)]
+        textposition = 'middle center'
+        textfont = dict(size=text['annotation'], color='black')
+        mode = marker['mode'] if 'text' in marker['mode'] else marker['mode'] + '+text'
+    point_text = np.array(point_text, dtype=object)
+
+    # One trace per colour category, largest category first (drawn underneath)
+    category_rows = group_positions(pos_df, groupby_color)
+    for category in sorted_categories:
+        rows = category_rows[category]
+        color = category_color_map[category]
+        legend_sum = group_sums.get(category, 0)
+        trace_name = f"{category} ({tickprefix if tickprefix else ''}{legend_sum}{ticksuffix if ticksuffix else ''})"
+        logger.debug(' at trace color for %s: %s', category, color)
 
         fig.add_trace(
             go.Scatter(
-                x=[row["x"]],
-                y=[row["y"]],
-                mode=marker['mode'],
+                x=pos_df["x"].to_numpy()[rows],
+                y=pos_df["y"].to_numpy()[rows],
+                mode=mode,
                 marker=dict(
-                    size=size,
-                    sizemode="area",
-                    sizemin=marker['sizemin'],
+                    # Diameters in px, drawn like the scalar sizes of one trace per bubble
+                    size=sizes[rows],
+                    sizemode="diameter",
+                    sizeref=1,
+                    sizemin=sizemin,
                     opacity=marker['opacity'],
                     color=color,
                 ),
-                text=text_wording,
+                text=point_text[rows],
+                textposition=textposition,
+                textfont=textfont,
                 name=trace_name,
                 showlegend = False
             )
         )
-
-        if 'id' not in pos_df.columns:
-
-            # Add annotation for the FDV value above the data point
-            fig.add_annotation(
-                x=row["x"],
-                y=row["y"],
-                text=f"{row[groupby]}<br>${clean_values(row[num_col], decimals=True, decimal_places=1)}",
-                showarrow=False,
-                font=dict(size=text['annotation'], color='black'),
-                yshift=annotation_dict['yshift']
-            )
     if show_legend:
 
         legend_marker_size = 20  # Fixed size for legend markers
@@ -2149,19 +1989,23 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
         x_ticktext = [""] * index_length
 
     if use_physics:
-        # Axes configuration for physics-based layout
+        # Axes configuration for physics-based layout: one data unit per pixel on both axes
         fig.update_layout(
             xaxis=dict(
                 showgrid=False, 
                 zeroline=False, 
                 tickvals=list(range(index_length)), 
-                ticktext=[""] * index_length
+                ticktext=[""] * index_length,
+                range=physics_ranges[0]
             ),
             yaxis=dict(
                 showgrid=False, 
                 zeroline=False, 
                 tickvals=list(range(index_length)), 
-                ticktext=[""] * index_length
+                ticktext=[""] * index_length,
+                range=physics_ranges[1],
+                scaleanchor='x',
+                scaleratio=1
             )
         )
     elif flat_line:
@@ -2223,7 +2067,7 @@ def bubble_chart(df, groupby, num_col, keep_topn=False, other=False, topn=10, ti
     )
 
     if save:
-        pio.write_image(fig, f'{title}.svg')
+        write_image(fig, f'{title}.svg')
 
     # Display the figure
     return fig
\ No newline at end of file
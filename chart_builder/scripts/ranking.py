@@ -0,0 +1,123 @@
+import weakref
+from contextlib import contextmanager
+
+import pandas as pd
+
+from chart_builder.scripts.diagnostics import logger
+
+def _is_number(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+class ranking():
+    """
+    Cumulative and latest-value rankings of a chart's series, from one grouped pass.
+
+    Wide frames (sort_col=None) rank their columns, long frames the values of
+    sort_col by num_col. totals is the cumulative sum per series, latest the value
+    each series has on the last timestamp (0 for series without a row there),
+    present the series that do have one (None for wide frames) and last the latest
+    timestamp.
+    """
+    def __init__(self, df, sort_col=None, num_col=None):
+        self.sort_col = sort_col
+        self.num_col = num_col
+        if sort_col is None:
+            # select_dtypes copies the frame (without copy-on-write); skip it when there's nothing to drop
+            numeric = df if all(map(_is_number, df.dtypes)) else df.select_dtypes(include=['number'])
+            self.totals = numeric.sum()
+        else:
+            self.totals = df.groupby(sort_col, observed=True)[num_col].sum()
+        self._set_latest(df)
+
+    def _set_latest(self, df):
+        self.last = df.index.max() if self.sort_col is not None else df.index[-1]
+        if self.sort_col is None:
+            self.latest = df.iloc[-1]
+            self.present = None
+            return
+
+        if df.index.is_monotonic_increasing:
+            # Rows on the last timestamp sit at the end of a sorted frame
+            last_rows = df.iloc[df.index.searchsorted(self.last, side='left'):]
+        else:
+            last_rows = df[df.index == self.last]
+        # In row order, like the rows the legend values come from
+        latest = last_rows.groupby(self.sort_col, observed=True).tail(1).set_index(self.sort_col)[self.num_col]
+        self.present = set(latest.index)
+
+        # Series without a row on the last timestamp rank (and show) as 0
+        missing = self.totals.index[~self.totals.index.isin(latest.index)]
+        if len(missing):
+            latest = pd.concat([latest, pd.Series(0, index=missing)])
+        self.latest = latest
+
+    def order(self, cumulative=False, descending=True):
+        """Series names by cumulative total or by latest value, as a pd.Index."""
+        values = self.totals if cumulative else self.latest
+        return values.sort_values(ascending=not descending).index
+
+    def cumulative_order(self, descending=True):
+        return self.order(cumulative=True, descending=descending).tolist()
+
+    def latest_order(self, descending=True):
+        return self.order(cumulative=False, descending=descending).tolist()
+
+    def color_map(self, colors, cumulative=False, descending=True):
+        """Colors by rank: the first color goes to the top series (the last one when ascending)."""
+        order = self.order(cumulative=cumulative, descending=descending)
+        if not descending:
+            order = order[::-1]
+        return {val: colors[idx % len(colors)] for idx, val in enumerate(order)}
+
+# (id(df), sort_col, num_col) -> (weakref to df, fingerprint, ranking) for the chart
+# being built (see ranking_scope), None outside a build
+_rankings = None
+
+@contextmanager
+def ranking_scope():
+    """
+    Share rankings between the helpers building one chart.
+
+    Inside the block get_ranking computes each frame's ranking once; the memo is
+    dropped when the outermost scope exits. visualization_pipeline.create_fig opens
+    one per build.
+    """
+    global _rankings
+    outer = _rankings
+    if outer is None:
+        _rankings = {}
+    try:
+        yield
+    finally:
+        _rankings = outer
+
+def _fingerprint(df):
+    # Cheap check that a frame wasn't resized, reordered or relabelled in place
+    ends = (df.index[0], df.index[-1]) if len(df.index) else ()
+    return df.shape, tuple(df.columns), ends
+
+def _forget(memo, key):
+    return lambda _: memo.pop(key, None)
+
+def get_ranking(df, sort_col=None, num_col=None):
+    """
+    The ranking of df.
+
+    Inside ranking_scope() results are memoized on the frame's identity (plus
+    sort_col and num_col), so every helper ranking the same frame for one chart
+    shares a single pass. Outside one, each call ranks df afresh.
+    """
+    memo = _rankings
+    if memo is None:
+        return ranking(df, sort_col=sort_col, num_col=num_col)
+
+    key = (id(df), sort_col, num_col)
+    fingerprint = _fingerprint(df)
+    cached = memo.get(key)
+    if cached is not None and cached[0]() is df and cached[1] == fingerprint:
+        return cached[2]
+
+    result = ranking(df, sort_col=sort_col, num_col=num_col)
+    memo[key] = (weakref.ref(df, _forget(memo, key)), fingerprint, result)
+    logger.debug('ranked %s series (sort_col=%s)', len(result.totals), sort_col)
+    return result
@@ -0,0 +1,208 @@
+import os
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from chart_builder.scripts.diagnostics import logger
+
+# Sessions entered with `with render_session():`, innermost last
+_active_sessions = []
+
+# Interactive output draws Scatter traces longer than this with WebGL (render_mode='auto')
+WEBGL_THRESHOLD = 10_000
+RENDER_MODES = ('auto', 'svg', 'webgl')
+
+def _kaleido_module():
+    try:
+        import kaleido
+    except ImportError:
+        return None
+    return kaleido
+
+def active_session():
+    """Return the innermost open render_session, or None."""
+    return _active_sessions[-1] if _active_sessions else None
+
+class render_session():
+    """
+    Keeps one kaleido/Chromium renderer warm while many figures are exported.
+
+    Every image export made inside the `with` block (the save=True paths in plots.py,
+    visualization_pipeline.save_fig and the methods below) reuses the same renderer
+    instead of starting a new one per figure. `directory` only applies to relative
+    paths given to write/write_many; the charts' own save paths are used as they are.
+
+        with render_session(format='svg', directory='../img') as session:
+            session.write(fig, 'chart.svg')
+            png = session.to_bytes(fig, format='png')
+    """
+    def __init__(self, format='svg', width=None, height=None, scale=None, directory=None, validate=True):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.directory = directory
+        self.validate = validate
+        self.count = 0
+        self._started_server = False
+        self._is_open = False
+
+    def open(self):
+        if self._is_open:
+            return self
+
+        kaleido = _kaleido_module()
+        if kaleido is not None and hasattr(kaleido, 'start_sync_server'):
+            # kaleido>=1 drives Chromium; the sync server keeps one browser alive and
+            # plotly.io's exports pick it up automatically while it runs
+            server = getattr(kaleido, '_global_server', None)
+            if server is None or not server.is_running():
+                kaleido.start_sync_server(silence_warnings=True)
+                self._started_server = True
+        # kaleido<1 keeps its own subprocess alive on plotly.io.kaleido.scope once started
+
+        self._is_open = True
+        _active_sessions.append(self)
+        logger.debug('render session opened (shared server started: %s)', self._started_server)
+        return self
+
+    def close(self):
+        if not self._is_open:
+            return
+
+        if self in _active_sessions:
+            _active_sessions.remove(self)
+        self._is_open = False
+
+        kaleido = _kaleido_module()
+        if self._started_server and kaleido is not None:
+            kaleido.stop_sync_server(silence_warnings=True)
+            self._started_server = False
+        elif kaleido is not None and not hasattr(kaleido, 'start_sync_server') and not _active_sessions:
+            scope = getattr(getattr(pio, 'kaleido', None), 'scope', None)
+            if scope is not None and hasattr(scope, '_shutdown_kaleido'):
+                scope._shutdown_kaleido()
+
+        logger.debug('render session closed after %s figures', self.count)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _path(self, file):
+        if self.directory and not os.path.isabs(str(file)):
+            return os.path.join(self.directory, str(file))
+        return file
+
+    def _format(self, file=None, format=None):
+        if format is not None:
+            return format
+        if file is not None:
+            ext = os.path.splitext(str(file))[1].lstrip('.')
+            if ext:
+                return ext
+        return self.format
+
+    def to_bytes(self, fig, format=None, width=None, height=None, scale=None):
+        """Render one figure and return the image bytes."""
+        self.count += 1
+        return pio.to_image(fig, format=format or self.format,
+                            width=width or self.width, height=height or self.height,
+                            scale=scale or self.scale, validate=self.validate)
+
+    def write(self, fig, file, format=None, width=None, height=None, scale=None):
+        """Render one figure to `file` (relative paths resolve against `directory`)."""
+        return self._write(fig, self._path(file), format=format, width=width, height=height, scale=scale)
+
+    def _write(self, fig, path, format=None, width=None, height=None, scale=None):
+        image = self.to_bytes(fig, format=self._format(path, format), width=width, height=height, scale=scale)
+        with open(path, 'wb') as f:
+            f.write(image)
+        return path
+
+    def write_many(self, figs, files, format=None):
+        """
+        Stream many figures through the renderer, writing figs[i] to files[i].
+
+        With kaleido>=1 the figures are handed to plotly.io.write_images, which
+        renders them as one batch on the shared browser.
+        """
+        figs = list(figs)
+        paths = [self._path(file) for file in files]
+        if len(figs) != len(paths):
+            raise ValueError('write_many needs one file per figure')
+
+        if hasattr(pio, 'write_images') and format is None and self.width is None and self.height is None and self.scale is None:
+            pio.write_images(figs, paths, validate=self.validate)
+            self.count += len(figs)
+        else:
+            for fig, path in zip(figs, paths):
+                self._write(fig, path, format=format)
+        return paths
+
+    def iter_bytes(self, figs, format=None):
+        """Yield the image bytes of each figure in turn."""
+        for fig in figs:
+            yield self.to_bytes(fig, format=format)
+
+def write_image(fig, file, format=None, width=None, height=None, scale=None):
+    """
+    Export a figure to an image file.
+
+    Goes through the active render_session when there is one (file is used as given,
+    not joined onto the session's directory), otherwise falls back to a one-off
+    plotly.io.write_image call.
+    """
+    session = active_session()
+    if session is not None:
+        return session._write(fig, file, format=format, width=width, height=height, scale=scale)
+
+    pio.write_image(fig, file, format=format, width=width, height=height, scale=scale)
+    return file
+
+def _trace_points(trace):
+    for name in ('x', 'y'):
+        values = getattr(trace, name, None)
+        if values is not None:
+            return len(values)
+    return 0
+
+def to_webgl(fig, render_mode='auto', threshold=WEBGL_THRESHOLD):
+    """
+    Copy of `fig` with its Scatter traces drawn by WebGL, for interactive output.
+
+    render_mode='auto' converts traces with more than `threshold` points, 'webgl'
+    converts every Scatter trace and 'svg' returns the figure as it is. Line,
+    marker, fill and text styling carry over where Scattergl supports it (a
+    'spline' line falls back to straight segments). Stacked area traces stay SVG:
+    Scattergl can't stack.
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"render_mode must be one of {RENDER_MODES}, not {render_mode!r}")
+    if render_mode == 'svg':
+        return fig
+
+    data = []
+    converted = 0
+    for trace in fig.data:
+        if (trace.type == 'scatter' and trace.stackgroup is None
+                and (render_mode == 'webgl' or _trace_points(trace) > threshold)):
+            props = trace.to_plotly_json()
+            props.pop('type', None)
+            # Drop what WebGL can't draw instead of failing the whole figure
+            trace = go.Scattergl(props, skip_invalid=True)
+            converted += 1
+        data.append(trace)
+
+    if not converted:
+        return fig
+    logger.debug('drawing %s of %s traces with WebGL', converted, len(fig.data))
+    return go.Figure(data=data, layout=fig.layout)
+
+def write_html(fig, file, render_mode='auto', threshold=WEBGL_THRESHOLD, **kwargs):
+    """Write an interactive HTML file, switching large Scatter traces to WebGL (see to_webgl)."""
+    to_webgl(fig, render_mode=render_mode, threshold=threshold).write_html(file, **kwargs)
+    return file
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+def share_of(values, totals, scale=100):
+    """
+    values / totals * scale as a float array, broadcasting like numpy.
+
+    Zero totals give a share of 0 instead of inf or NaN (a date where every series
+    is 0 draws as 0%, not as a gap or a spike). Missing values stay missing, even
+    where the total is 0.
+    """
+    values = np.asarray(values, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    shares = np.zeros(np.broadcast_shapes(values.shape, totals.shape))
+    np.copyto(shares, np.nan, where=np.isnan(values))
+    np.divide(values, totals, out=shares, where=totals != 0)
+    shares *= scale
+    return shares
+
+def row_shares(df, columns=None, totals=None, scale=100):
+    """
+    Each value of df's `columns` (default: all) as a share of its row total.
+
+    totals defaults to df.sum(axis=1). As in share_of, zero totals give 0 and
+    missing values stay missing. Shares are written column by column into one
+    preallocated block, so the result is the only copy made, with no per-column
+    temporaries or inserts.
+    """
+    columns = df.columns if columns is None else pd.Index(columns)
+    totals = (df.sum(axis=1) if totals is None else totals).to_numpy(dtype=float)
+    zero = totals == 0
+    divisors = np.where(zero, 1.0, totals)
+
+    block = np.empty((len(df), len(columns)), order='F')
+    for i, col in enumerate(columns):
+        # Scaled while the column is still in cache, not in a second pass over the block
+        shares = block[:, i]
+        np.divide(df[col].to_numpy(dtype=float), divisors, out=shares)
+        shares *= scale
+    if zero.any():
+        # Rows with a zero total hold value / 1 here; keep their NaNs
+        rows = block[zero]
+        rows[~np.isnan(rows)] = 0
+        block[zero] = rows
+    return pd.DataFrame(block, index=df.index, columns=columns, copy=False)
+
+def group_shares(values, by=None, scale=100):
+    """
+    Each value of the Series `values` as a share of its group's total, in values' order.
+
+    Groups are `by` (anything groupby takes), or the index (one total per date) when
+    None. Totals come from one groupby transform('sum'), with no merge back; rows
+    without a group get NaN.
+    """
+    grouped = values.groupby(level=0) if by is None else values.groupby(by, observed=True)
+    return pd.Series(share_of(values, grouped.transform('sum')), index=values.index, name=values.name)
+
+# Columns hashed per round by duplicated_rows
+HASH_BATCH = 8
+
+def _column_hash(values):
+    values = values.astype(float) + 0.0  # folds -0.0 into 0.0
+    values[np.isnan(values)] = np.nan  # one NaN bit pattern
+    return pd.util.hash_array(values)
+
+def duplicated_rows(df):
+    """
+    df.duplicated() (keep='first') for a frame of float columns.
+
+    Rows are hashed a few columns at a time, and each round only rehashes the rows
+    whose hash still repeats (equal rows agree on every column). The remaining
+    candidates are compared with pandas, so wide frames with few repeated rows skip
+    the full multi-column factorize.
+    """
+    candidates = np.arange(len(df))
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for start in range(0, len(df.columns), HASH_BATCH):
+        for col in range(start, min(start + HASH_BATCH, len(df.columns))):
+            values = df.iloc[:, col].to_numpy()[candidates]
+            hashes = (hashes ^ _column_hash(values)) * np.uint64(1099511628211)
+        repeated = pd.Series(hashes).duplicated(keep=False).to_numpy()
+        candidates, hashes = candidates[repeated], hashes[repeated]
+        if not len(candidates):
+            break
+
+    duplicated = np.zeros(len(df), dtype=bool)
+    if len(candidates):
+        duplicated[candidates] = df.iloc[candidates].duplicated().to_numpy()
+    return duplicated
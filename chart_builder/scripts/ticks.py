@@ -0,0 +1,63 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chart_builder.scripts.diagnostics import logger
+
+# Frequencies that get a tick on every period instead of evenly spaced dates
+MONTHLY_FREQS = ('M', 'MS')
+MAX_TICKS = 5
+# Room one date label needs; charts narrower than MAX_TICKS labels get fewer ticks
+TICK_SPACING_PX = 140
+
+def index_freq(index):
+    """
+    Frequency string of a datetime index, or None.
+
+    Uses the index's own freq when it has one (resampled frames carry it, and the
+    data cache restores it), so pd.infer_freq only runs on indexes without one.
+    """
+    if index.freq is not None:
+        return index.freqstr
+    unique = index if index.is_unique else index.drop_duplicates()
+    if len(unique) < 3:
+        return None
+    return pd.infer_freq(unique)
+
+def tick_count(width=None, num_ticks=MAX_TICKS):
+    """How many evenly spaced ticks fit a chart `width` px wide, at most num_ticks."""
+    if width:
+        num_ticks = min(num_ticks, max(int(width // TICK_SPACING_PX), 2))
+    return num_ticks
+
+@lru_cache(maxsize=256)
+def _plan(start, end, freq, width, num_ticks):
+    if freq in MONTHLY_FREQS:
+        # One tick per period, first and last included
+        return tuple(pd.date_range(start, end, freq=freq))
+    seconds = np.linspace(start.timestamp(), end.timestamp(), num=tick_count(width, num_ticks))
+    return tuple(pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d'))
+
+def datetime_ticks(index, freq=None, width=None, num_ticks=MAX_TICKS):
+    """
+    x tick values the time-series charts put on a datetime index (None for other indexes).
+
+    Monthly indexes get a tick per month; anything else gets num_ticks evenly
+    spaced dates (fewer on narrow charts). Plans depend only on the index span,
+    freq and width and are memoized on them. freq is the index frequency when the
+    caller already knows it.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(index):
+        return None
+
+    if freq is None:
+        freq = index_freq(index)
+    if index.is_monotonic_increasing:
+        start, end = index[0], index[-1]
+    else:
+        start, end = index.min(), index.max()
+
+    x_ticks = list(_plan(start, end, freq, width, num_ticks))
+    logger.debug('X-Ticks (Datetime): %s', x_ticks)
+    return x_ticks
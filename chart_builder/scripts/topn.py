@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+def top_positions(scores, n):
+    """
+    Positions of the n largest scores, largest first.
+
+    Found with argpartition, so only the n winners get sorted. NaN scores count as
+    the smallest, and ties at the cutoff go to the earlier positions.
+    """
+    scores = np.asarray(scores, dtype=float)
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    if n < len(scores):
+        cutoff = scores[np.argpartition(-scores, n - 1)[:n]].min()
+        above = np.flatnonzero(scores > cutoff)
+        tied = np.flatnonzero(scores == cutoff)[:n - len(above)]
+        chosen = np.concatenate([above, tied])
+    else:
+        chosen = np.arange(len(scores))
+    return chosen[np.argsort(-scores[chosen], kind='stable')]
+
+def top_labels(scores, n):
+    """Index labels of the n largest values of the Series `scores`, largest first."""
+    return scores.index[top_positions(scores.to_numpy(dtype=float, na_value=np.nan), n)]
+
+def value_codes(values):
+    """(codes, uniques) of a column: the category codes of a Categorical, else pd.factorize."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+def label_mask(values, labels):
+    """Boolean mask of the rows of `values` found in `labels`, tested once per distinct value."""
+    codes, uniques = value_codes(values)
+    # Missing values have code -1 and land on the trailing False
+    keep = np.append(pd.Index(uniques).isin(labels), False)
+    return keep[codes]
+
+def group_mask(df, cols, value_col, n, latest=True):
+    """
+    Boolean mask of the rows of the n groups of df (by cols) with the largest value_col.
+
+    Groups are scored by their last row (latest=True, like groupby().tail(1)) or by
+    their total, from a single groupby.
+    """
+    grouped = df.groupby(cols, sort=False, observed=True)
+    # Rows with a missing key belong to no group: code -1, which lands on the trailing False
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.intp)
+
+    if latest:
+        is_last = (grouped.cumcount(ascending=False) == 0).to_numpy() & (codes >= 0)
+        scores = np.full(grouped.ngroups, np.nan)
+        scores[codes[is_last]] = df[value_col].to_numpy(dtype=float, na_value=np.nan)[is_last]
+    else:
+        scores = grouped[value_col].sum().to_numpy(dtype=float, na_value=np.nan)
+
+    keep = np.zeros(grouped.ngroups + 1, dtype=bool)
+    keep[top_positions(scores, n)] = True
+    return keep[codes]
+
+def label_dtype(values, label):
+    """
+    Dtype holding the values of `values` plus a new `label` (like 'Other'), or None
+    to let pandas infer one.
+
+    Categoricals get the label added to their categories, so folded frames keep
+    their codes.
+    """
+    dtype = values.dtype
+    if not isinstance(dtype, pd.CategoricalDtype):
+        return None
+    if label in dtype.categories:
+        return dtype
+    categories = dtype.categories.append(pd.Index([label], dtype=dtype.categories.dtype))
+    return pd.CategoricalDtype(categories.sort_values(), ordered=dtype.ordered)
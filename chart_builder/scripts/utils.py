@@ -2,13 +2,23 @@ import pandas as pd
 import datetime as dt 
 import plotly.colors as pc
 import random
-from IPython.display import Image, display
 import os
-import matplotlib.cm as cm
-from matplotlib.colors import to_hex
-import colorcet as cc
 import json
 import numpy as np
+from functools import lru_cache
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from chart_builder.scripts.diagnostics import logger, lazy
+from chart_builder.scripts.cache import get_default_cache
+from chart_builder.scripts.frames import share
+from chart_builder.scripts.shares import share_of, row_shares, group_shares, duplicated_rows
+from chart_builder.scripts.palettes import get_palette
+from chart_builder.scripts.ranking import get_ranking
+from chart_builder.scripts.topn import top_labels, label_mask, group_mask, label_dtype
 
 
 def dynamic_parameters(df, num_col='market_cap', scale=100, use_log_scale=False):
@@ -17,9 +27,9 @@ def dynamic_parameters(df, num_col='market_cap', scale=100, use_log_scale=False)
 
     # Apply logarithmic scaling if enabled
     if use_log_scale:
-        df[num_col] = df[num_col].apply(lambda x: np.log1p(x))  # log1p to handle zeros safely
-        max_value = df[num_col].max()
-        min_value = df[num_col].min()
+        values = np.log1p(df[num_col])  # log1p to handle zeros safely
+        max_value = values.max()
+        min_value = values.min()
 
     # Compute dynamic marker_scale
     dynamic_marker_scale = max_value / scale  # Adjust divisor as needed
@@ -29,13 +39,13 @@ def dynamic_parameters(df, num_col='market_cap', scale=100, use_log_scale=False)
     }
 
 def calculate_marker_size(value, scaling_factor, max_size=210, min_size=8):
-    size = min(value / scaling_factor, max_size)  # Cap the size
-    size = max(size, min_size)  # Ensure a minimum size
-    return size
+    # Works on scalars and arrays alike
+    size = np.clip(np.asarray(value, dtype=float) / scaling_factor, min_size, max_size)
+    return size.item() if size.ndim == 0 else size
 
 def top_other_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_color=None):
-    print("\n=== Initial DataFrame ===")
-    print(df)
+    logger.debug('=== Initial DataFrame ===')
+    logger.debug('%s', df)
 
     # Determine the columns to group by
     group_cols = [sort_col]
@@ -49,61 +59,43 @@ def top_other_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_
     # Ensure group_cols contains unique values while preserving order
     group_cols = list(dict.fromkeys(group_cols))
 
-    print("\n=== Grouping Columns ===")
-    print(group_cols)
+    logger.debug('=== Grouping Columns ===')
+    logger.debug('%s', group_cols)
 
     # Aggregate the sum by sort_col for the entire DataFrame
-    total_sum_by_group = df.groupby(sort_col)[sum_col].sum()
-    print("\n=== Total Sum by Group ===")
-    print(total_sum_by_group)
-
-    # Handle top N filtering with 'latest' option
-    if latest:
-        recent = (
-            df.groupby(group_cols)
-            .tail(1)
-            .sort_values(by=sum_col, ascending=False)
-            .head(num)
-        )
-        recent_keys = recent[group_cols].drop_duplicates()
-        print("\n=== Recent Top N (Latest) Keys ===")
-        print(recent_keys)
-
-        filtered_df = df.merge(recent_keys, on=group_cols)
-    else:
-        top = df.groupby(group_cols)[sum_col].sum()
-        top_n = top.nlargest(num).reset_index()[group_cols]
-        print("\n=== Top N (Non-Latest) Keys ===")
-        print(top_n)
+    total_sum_by_group = df.groupby(sort_col, observed=True)[sum_col].sum()
+    logger.debug('=== Total Sum by Group ===')
+    logger.debug('%s', total_sum_by_group)
 
-        filtered_df = df.merge(top_n, on=group_cols)
+    # Top N groups by their latest row (latest=True) or by their total
+    filtered_df = df[group_mask(df, group_cols, sum_col, num, latest=latest)].reset_index(drop=True)
 
-    print("\n=== Filtered Top N DataFrame ===")
-    print(filtered_df)
+    logger.debug('=== Filtered Top N DataFrame ===')
+    logger.debug('%s', filtered_df)
 
     # Sum the values for the top N entries
-    top_sum_by_group = filtered_df.groupby(sort_col)[sum_col].sum()
-    print("\n=== Top N Sum by Group ===")
-    print(top_sum_by_group)
+    top_sum_by_group = filtered_df.groupby(sort_col, observed=True)[sum_col].sum()
+    logger.debug('=== Top N Sum by Group ===')
+    logger.debug('%s', top_sum_by_group)
 
-    print(f'total sum: {total_sum_by_group}')
+    logger.debug('total sum: %s', total_sum_by_group)
 
     # Calculate the 'Other' value by subtracting top_sum_by_group from total_sum_by_group
     other_value = (total_sum_by_group.sum() - top_sum_by_group.sum())
-    print(f'other_value: {other_value}')
+    logger.debug('other_value: %s', other_value)
     other_sum_by_group = pd.DataFrame({
         sort_col: ['Other'],
         sum_col: [other_value]
     })
 
-    print(f'other_sum_by_group: {other_sum_by_group}')
+    logger.debug('other_sum_by_group: %s', other_sum_by_group)
 
     # Rename sum_col to match the aggregated column name
     # other_sum_by_group.rename(columns={sum_col: 'other_sum'}, inplace=True)
     # other_sum_by_group = other_sum_by_group.rename(columns={'other_sum': sum_col})
-    print("\n=== Other Values Grouped DataFrame ===")
+    logger.debug('=== Other Values Grouped DataFrame ===')
     other_sum_by_group = other_sum_by_group.groupby(sort_col)[[sum_col]].sum()
-    print(other_sum_by_group)
+    logger.debug('%s', other_sum_by_group)
 
     # Create 'Other' DataFrame
     other_df = other_sum_by_group.copy()
@@ -120,8 +112,8 @@ def top_other_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_
     
     # other_df = other_df.reset_index()
 
-    print("\n=== Other DataFrame ===")
-    print(other_df)
+    logger.debug('=== Other DataFrame ===')
+    logger.debug('%s', other_df)
 
     if other_value > 0:
     # Combine filtered_df and other_df
@@ -130,16 +122,16 @@ def top_other_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_
         combined = filtered_df.copy()
     combined.sort_index(inplace=True)
 
-    print("\n=== Combined DataFrame ===")
-    print(combined)
+    logger.debug('=== Combined DataFrame ===')
+    logger.debug('%s', combined)
 
     return combined
 
 
 
 def top_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_color=None):
-    print("\n=== Initial DataFrame ===")
-    print(df)
+    logger.debug('=== Initial DataFrame ===')
+    logger.debug('%s', df)
 
     # Determine the columns to group by
     group_cols = [sort_col]
@@ -148,93 +140,113 @@ def top_by_col_bubble(df, sort_col, sum_col, num=10, latest=True, groupby_color=
     if groupby_color:
         group_cols.append(groupby_color)
 
-    print("\n=== Grouping Columns ===")
+    logger.debug('=== Grouping Columns ===')
     # Ensure group_cols contains unique values while preserving order
     group_cols = list(dict.fromkeys(group_cols))
 
-    print(group_cols)
+    logger.debug('%s', group_cols)
 
-    # Handle top N filtering with 'latest' option
-    if latest:
-        recent = (
-            df.groupby(group_cols)
-            .tail(1)
-            .sort_values(by=sum_col, ascending=False)
-            .head(num)
-        )
-        recent_keys = recent[group_cols].drop_duplicates()
-        print("\n=== Recent Top N (Latest) Keys ===")
-        print(recent_keys)
-
-        filtered_df = df.merge(recent_keys, on=group_cols)
-    else:
-        top = df.groupby(group_cols)[sum_col].sum()
-        top_n = top.nlargest(num).reset_index()[group_cols]
-        print("\n=== Top N (Non-Latest) Keys ===")
-        print(top_n)
+    # Top N groups by their latest row (latest=True) or by their total
+    filtered_df = df[group_mask(df, group_cols, sum_col, num, latest=latest)].reset_index(drop=True)
 
-        filtered_df = df.merge(top_n, on=group_cols)
-
-    print("\n=== Filtered Top N DataFrame ===")
-    print(filtered_df)
+    logger.debug('=== Filtered Top N DataFrame ===')
+    logger.debug('%s', filtered_df)
 
     filtered_df.sort_index(inplace=True)
 
-    print("\n=== filtered_df DataFrame ===")
-    print(filtered_df)
+    logger.debug('=== filtered_df DataFrame ===')
+    logger.debug('%s', filtered_df)
 
     return filtered_df
 
+# Magnitude tiers shared by the batch formatters, largest first
+_value_scales = ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K'))
+_dollar_scales = ((1e9, 'B', ',.1f'), (1e6, 'M', ',.1f'), (1e3, 'K', ',.0f'), (1e2, '', ',.0f'), (1, '', ',.2f'))
+
+def _format_tier(values, mask, spec, divisor=1, prefix='', suffix=''):
+    # Format every value selected by mask with one format spec
+    scaled = values[mask] / divisor if divisor != 1 else values[mask]
+    fmt = f'{prefix}{{:{spec}}}{suffix}'
+    return list(map(fmt.format, scaled.tolist()))
+
+def format_values(values, decimals=True, decimal_places=1):
+    """
+    Format an array of numbers into K/M/B/T strings in one pass.
+
+    Produces exactly the same strings as formatting each value with clean_values.
+    Returns an object ndarray with the same shape as the input.
+    """
+    arr = np.asarray(values, dtype=float)
+    flat = arr.ravel()
+    magnitude = np.abs(flat)
+    places = decimal_places if decimals else 0
+    out = np.empty(flat.shape, dtype=object)
+
+    # NaN fails every comparison, so it falls through to the plain tier like the scalar version
+    remaining = np.ones(flat.shape, dtype=bool)
+    zero = flat == 0
+    out[zero] = '0'
+    remaining &= ~zero
+
+    small = remaining & (magnitude < 1)  # Numbers between -1 and 1 keep two decimal points
+    out[small] = _format_tier(flat, small, '.2f')
+    remaining &= ~small
+
+    for scale, suffix in _value_scales:
+        tier = remaining & (magnitude >= scale)
+        if tier.any():
+            out[tier] = _format_tier(flat, tier, f'.{places}f', divisor=scale, suffix=suffix)
+        remaining &= ~tier
+
+    out[remaining] = _format_tier(flat, remaining, f'.{places}f')
+
+    return out.reshape(arr.shape)
+
+def format_dollars(values):
+    """
+    Format an array of numbers into $K/$M/$B strings in one pass.
+
+    Produces exactly the same strings as formatting each value with clean_values_dollars.
+    """
+    arr = np.asarray(values, dtype=float)
+    flat = arr.ravel()
+    magnitude = np.abs(flat)
+    negative = flat < 0
+    # Negative values are formatted by magnitude behind a leading minus sign
+    signed = np.where(negative, magnitude, flat)
+    out = np.empty(flat.shape, dtype=object)
+
+    remaining = np.ones(flat.shape, dtype=bool)
+    for scale, suffix, spec in _dollar_scales:
+        tier = remaining & (magnitude >= scale)
+        for sign_mask, prefix in ((tier & negative, '-$'), (tier & ~negative, '$')):
+            if sign_mask.any():
+                out[sign_mask] = _format_tier(signed, sign_mask, spec, divisor=scale if suffix else 1, prefix=prefix, suffix=suffix)
+        remaining &= ~tier
+
+    # Scientific notation for small numbers
+    for sign_mask, prefix in ((remaining & negative, '-$'), (remaining & ~negative, '$')):
+        out[sign_mask] = _format_tier(signed, sign_mask, ',.2g', prefix=prefix)
+
+    return out.reshape(arr.shape)
+
 def clean_values(x, decimals=True, decimal_places=1):
     if isinstance(x, pd.Series):
-        return x.apply(clean_values, decimals=decimals, decimal_places=decimal_places)
-    
-    if x == 0:
-        return '0'
-
-    if decimals == True:
-        if abs(x) < 1:  # Handle numbers between -1 and 1 first
-            print(f'x < 1:{x}')
-            return f'{x:.2f}'  # Keep small values with two decimal points
-        elif x >= 1e12 or x <= -1e12:
-            print(f'x:{x}T')
-            return f'{x / 1e12:.{decimal_places}f}T'  # Trillion
-        elif x >= 1e9 or x <= -1e9:
-            print(f'x:{x}B')
-            return f'{x / 1e9:.{decimal_places}f}B'  # Billion
-        elif x >= 1e6 or x <= -1e6:
-            print(f'x:{x}M')
-            return f'{x / 1e6:.{decimal_places}f}M'  # Million
-        elif x >= 1e3 or x <= -1e3:
-            print(f'x:{x}K')
-            return f'{x / 1e3:.{decimal_places}f}K'  # Thousand
-        elif x >= 1e2 or x <= -1e2:
-            print(f'x:{x}')
-            return f'{x:.{decimal_places}f}'  # Show as is for hundreds
-        elif x >= 1 or x <= -1:
-            print(f'x:{x}')
-            return f'{x:.{decimal_places}f}'  # Show whole numbers for numbers between 1 and 100
-        else:
-            print(f'x:{x}')
-            return f'{x:.{decimal_places}f}'  # Handle smaller numbers
-    
-    else:
-        if abs(x) < 1:  # Handle numbers between -1 and 1 first
-            return f'{x:.2f}'  # Keep small values with two decimal points
-        elif x >= 1e12 or x <= -1e12:
-            return f'{x / 1e12:.0f}T'  # Trillion
-        elif x >= 1e9 or x <= -1e9:
-            return f'{x / 1e9:.0f}B'  # Billion
-        elif x >= 1e6 or x <= -1e6:
-            return f'{x / 1e6:.0f}M'  # Million
-        elif x >= 1e3 or x <= -1e3:
-            return f'{x / 1e3:.0f}K'  # Thousand
-        elif x >= 1e2 or x <= -1e2:
-            return f'{x:.0f}'  # Show as is for hundreds
-        elif x >= 1 or x <= -1:
-            return f'{x:.0f}'  # Show as is for numbers between 1 and 100
-        else:
-            return f'{x:.0f}'  # Handle smaller numbers
+        return pd.Series(format_values(x.to_numpy(), decimals=decimals, decimal_places=decimal_places), index=x.index, name=x.name)
+    if isinstance(x, (np.ndarray, list, tuple)):
+        return format_values(x, decimals=decimals, decimal_places=decimal_places)
+
+    return format_values([x], decimals=decimals, decimal_places=decimal_places)[0]
+
+def format_labels(values, prefix=None, suffix=None, freq=1, decimals=True, decimal_places=1):
+    """Text labels for every `freq`-th value (prefix + cleaned value + suffix), None elsewhere."""
+    values = np.asarray(values)
+    labels = np.full(len(values), None, dtype=object)
+    prefix = prefix if prefix else ''
+    suffix = suffix if suffix else ''
+    formatted = format_values(values[::freq], decimals=decimals, decimal_places=decimal_places)
+    labels[::freq] = [f'{prefix}{value}{suffix}' for value in formatted]
+    return labels.tolist()
 
 def create_df(columns, data):
     df = pd.DataFrame(data, columns=columns)
@@ -242,111 +254,407 @@ def create_df(columns, data):
 
 def clean_values_dollars(x):
     if isinstance(x, pd.Series):
-        return x.apply(clean_values)
-
-    if x >= 1e9 or x <= -1e9:
-        return f'-${abs(x / 1e9):,.1f}B' if x < 0 else f'${x / 1e9:,.1f}B'  # Billion
-    elif x >= 1e6 or x <= -1e6:
-        return f'-${abs(x / 1e6):,.1f}M' if x < 0 else f'${x / 1e6:,.1f}M'  # Million
-    elif x >= 1e3 or x <= -1e3:
-        return f'-${abs(x / 1e3):,.0f}K' if x < 0 else f'${x / 1e3:,.0f}K'  # Thousand
-    elif x >= 1e2 or x <= -1e2:
-        return f'-${abs(x):,.0f}' if x < 0 else f'${x:,.0f}'  # Show as is for hundreds
-    elif x >= 1 or x <= -1:
-        return f'-${abs(x):,.2f}' if x < 0 else f'${x:,.2f}'  # Show two decimals for numbers between 1 and 100
-    else:
-        return f'-${abs(x):,.2g}' if x < 0 else f'${x:,.2g}'  # Scientific notation for small numbers or handle negatives appropriately
+        return clean_values(x)
+    if isinstance(x, (np.ndarray, list, tuple)):
+        return format_dollars(x)
+
+    return format_dollars([x])[0]
 
     
-def to_df(file, delimiter=','):
+# Column names to_time recognises as time columns (compared lowercased)
+TIME_COLS = ['date', 'dt', 'hour', 'time', 'day', 'month', 'year', 
+             'week', 'timestamp', 'date(utc)', 'block_timestamp', 
+             'ds', 'period', 'date_time', 'trunc_date', 'quarter', 'block_time',
+             'block_date']
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.feather', '.arrow', '.ipc', '.arrows')
+
+def project_columns(available, columns, time_col=None):
+    """
+    Columns of `available` to read for a chart plotting `columns`: the requested ones
+    plus any time column to_time would pick up, in file order. None means read everything.
+    Raises KeyError if a requested column isn't in `available`.
+    """
+    if columns is None or isinstance(columns, str):
+        return None
+    wanted = set(columns)
+    missing = wanted.difference(available)
+    if missing:
+        raise KeyError(f'{sorted(missing, key=str)} not in columns')
+    time_names = _time_names(time_col)
+    return [col for col in available if col in wanted or str(col).lower() in time_names]
+
+def _read_parquet(df_path, columns=None, time_col=None):
+    import pyarrow.parquet as pq
+
+    if columns is not None:
+        columns = project_columns(pq.read_schema(df_path).names, columns, time_col)
+        logger.debug('reading columns %s from %s', columns, df_path)
+    return pd.read_parquet(df_path, columns=columns, memory_map=True)
+
+def _read_arrow(df_path, columns=None, time_col=None):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # Feather v2 is the Arrow IPC file format; memory-map it so only the projected
+    # columns are paged in. '.arrows' files use the IPC stream format instead.
+    if df_path.lower().endswith('.arrows'):
+        with pa.memory_map(df_path) as source:
+            table = pa.ipc.open_stream(source).read_all()
+        if columns is not None:
+            table = table.select(project_columns(table.column_names, columns, time_col))
+    else:
+        if columns is not None:
+            with pa.memory_map(df_path) as source:
+                names = pa.ipc.open_file(source).schema.names
+            columns = project_columns(names, columns, time_col)
+            logger.debug('reading columns %s from %s', columns, df_path)
+        table = feather.read_table(df_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+def _time_names(time_col=None):
+    time_names = set(TIME_COLS)
+    if time_col is not None:
+        time_names.add(time_col.lower())
+    return time_names
+
+def _year_first(sample, dayfirst=False):
+    sample = sample.dropna()
+    if sample.empty or not isinstance(sample.iloc[0], str):
+        return False
+    fmt = _guess_format(sample.iloc[0], dayfirst)
+    return fmt is not None and fmt.startswith('%Y')
+
+def _read_csv(df_path, delimiter=',', columns=None, time_col=None, dtypes=None, parse_time=False,
+              dayfirst=False, engine=None, chunksize=None):
+    time_names = _time_names(time_col)
+    kwargs = dict(delimiter=delimiter)
+    if dtypes:
+        kwargs['dtype'] = dtypes
+    if chunksize:
+        # The pyarrow engine can't read in chunks
+        kwargs['chunksize'] = chunksize
+        engine = None
+    if engine is not None:
+        kwargs['engine'] = engine
+
+    names = None
+    if columns is not None or parse_time:
+        # Header and a few rows, to resolve the projection and the time columns up front
+        head = pd.read_csv(df_path, delimiter=delimiter, nrows=20)
+        names = list(head.columns)
+
+    if columns is not None:
+        names = project_columns(names, columns, time_col)
+        kwargs['usecols'] = names
+        logger.debug('reading columns %s from %s', names, df_path)
+
+    if parse_time and not (engine == 'pyarrow' and dayfirst):
+        # Let the parser build datetimes while reading; 'timestamp' (epoch ms) and
+        # 'year' keep their special handling in to_time
+        # Only year-first layouts, which the reader parses quickly; others are left
+        # to to_time's parse_datetime
+        parse_dates = [col for col in names if str(col).lower() in time_names
+                       and str(col).lower() not in ('timestamp', 'year')
+                       and not (dtypes and col in dtypes)
+                       and _year_first(head[col], dayfirst)]
+        if parse_dates:
+            kwargs['parse_dates'] = parse_dates
+            if dayfirst:
+                kwargs['dayfirst'] = True
+
+    return pd.read_csv(df_path, **kwargs)
+
+# Rows per chunk when duplicates are dropped while reading a projection
+DEDUP_CHUNK_ROWS = 100_000
+
+def _row_chunks(df_path, columns, time_col=None, **csv_options):
+    # A file as (rows, values, project) chunks: the chunk's row count, its columns as
+    # Series (decoded one at a time for Parquet and Arrow) and project(keep), the kept
+    # rows of the projected columns as a DataFrame. None if the file can't be chunked
+    lower = df_path.lower()
+    if lower.endswith(PARQUET_EXTENSIONS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(df_path, memory_map=True)
+        if _stored_index(parquet_file.schema_arrow):
+            return None
+        names = parquet_file.schema_arrow.names
+        projected = project_columns(names, columns, time_col)
+
+        def row_group(i):
+            read = lambda cols: parquet_file.read_row_group(i, columns=cols)
+            return (parquet_file.metadata.row_group(i).num_rows,
+                    (read([name]).column(0).to_pandas() for name in names),
+                    lambda keep: read(projected).filter(pa.array(keep)).to_pandas())
+        return (row_group(i) for i in range(parquet_file.num_row_groups))
+
+    batches = _batch_reader(df_path, DEDUP_CHUNK_ROWS)
+    if batches is not None:
+        # Memory-mapped Arrow columns are only converted one at a time
+        return ((len(batch), (col.to_pandas() for col in batch.columns),
+                 lambda keep, batch=batch: _batch_frame(batch, columns, time_col, rows=keep))
+                for batch in batches)
+
+    chunks = _chunk_reader(df_path, time_col=time_col, chunksize=DEDUP_CHUNK_ROWS, **csv_options)
+    if chunks is None:
+        return None
+    return ((len(chunk), (col for _, col in chunk.items()),
+             lambda keep, chunk=chunk: chunk.loc[keep, project_columns(chunk.columns, columns, time_col)])
+            for chunk in chunks)
+
+def _read_deduplicated(df_path, columns, delimiter=',', time_col=None, dtypes=None, parse_time=False, dayfirst=False):
+    # Whole-row drop_duplicates while reading: rows are hashed on every column a chunk
+    # at a time against the rows seen so far, and only the projected columns of the new
+    # rows are kept. None when the format can't be read in chunks
+    chunks = _row_chunks(df_path, columns, time_col=time_col, delimiter=delimiter, dtypes=dtypes,
+                         dayfirst=dayfirst, parse_time=parse_time)
+    if chunks is None:
+        return None
+
+    seen = np.empty(0, dtype=np.uint64)
+    kept = []
+    offset = 0
+    for rows, values, project in chunks:
+        keep, seen = _unseen_rows(_combine_hashes(values, rows), seen)
+        part = project(keep)
+        part.index = offset + np.flatnonzero(keep)  # Row labels as a single read would number them
+        offset += rows
+        kept.append(part)
+    if not kept:
+        return None
+    logger.debug('kept %s of %s rows, columns %s', sum(map(len, kept)), offset, list(kept[0].columns))
+    return pd.concat(kept)
+
+def to_df(file, delimiter=',', columns=None, time_col=None, dtypes=None, parse_time=False, dayfirst=False,
+          engine=None, drop_duplicates=False):
+    """
+    Read a CSV, Excel, Parquet or Arrow file, keeping only `columns` (see project_columns) when given.
+
+    drop_duplicates drops whole-row duplicates, compared on every column of the file.
+    With a projection the file is then read in chunks, so the other columns are only
+    held a chunk at a time (CSVs use the C parser there, whatever `engine` says).
+    """
     df_path = f'{file}'
     
     try:
-        # Check if the file is an Excel file
-        if df_path.endswith('.xlsx') or df_path.endswith('.xls'):
-            df = pd.read_excel(df_path)
-        else:
-            # Assume it's a CSV file if it doesn't have an Excel extension
-            df = pd.read_csv(df_path, delimiter=delimiter)
+        df = None
+        if drop_duplicates and columns is not None:
+            df = _read_deduplicated(df_path, columns, delimiter=delimiter, time_col=time_col, dtypes=dtypes,
+                                    parse_time=parse_time, dayfirst=dayfirst)
+        if df is None:
+            read_columns = None if drop_duplicates else columns
+            # Check if the file is an Excel file
+            if df_path.endswith('.xlsx') or df_path.endswith('.xls'):
+                df = pd.read_excel(df_path)
+            elif df_path.lower().endswith(PARQUET_EXTENSIONS):
+                df = _read_parquet(df_path, columns=read_columns, time_col=time_col)
+            elif df_path.lower().endswith(ARROW_EXTENSIONS):
+                df = _read_arrow(df_path, columns=read_columns, time_col=time_col)
+            else:
+                # Assume it's a CSV file if it doesn't have an Excel extension
+                df = _read_csv(df_path, delimiter=delimiter, columns=read_columns, time_col=time_col, dtypes=dtypes,
+                               parse_time=parse_time, dayfirst=dayfirst, engine=engine)
+            if drop_duplicates:
+                df = df.drop_duplicates()
+                if columns is not None:
+                    df = df.loc[:, project_columns(df.columns, columns, time_col)]
         
-        print(df.head(), "\n", df.tail())
+        logger.debug('%s \n %s', lazy(lambda: df.head()), lazy(lambda: df.tail()))
         return df
     
     except FileNotFoundError:
-        print(f"Error: File {df_path} not found.")
+        logger.error('Error: File %s not found.', df_path)
     except pd.errors.EmptyDataError:
-        print(f"Error: File {df_path} is empty.")
+        logger.error('Error: File %s is empty.', df_path)
     except UnicodeDecodeError:
-        print(f"Error: {df_path} contains invalid encoding.")
+        logger.error('Error: %s contains invalid encoding.', df_path)
+    except ImportError as e:
+        logger.error('Error: reading %s requires pyarrow (%s).', df_path, e)
+    except KeyError:
+        # Requested columns missing from the file, as df[cols] would report
+        raise
     except Exception as e:
-        print(f"Error loading {df_path}: {e}")
+        logger.error('Error loading %s: %s', df_path, e)
 
     
-def to_time(df, time_col=None, dayfirst=False, convert_to_datetime=True, drop_mid_timefreq=True):
-    import pandas as pd
+@lru_cache(maxsize=256)
+def _guess_format(sample, dayfirst=False):
+    return guess_datetime_format(sample, dayfirst=dayfirst)
+
+_FIXED_WIDTH = {'%Y': ('year', 4), '%m': ('month', 2), '%d': ('day', 2), '%H': ('hour', 2), '%M': ('minute', 2), '%S': ('second', 2)}
+
+@lru_cache(maxsize=256)
+def _fixed_width_layout(fmt):
+    # [(unit, start, width)], literal {position: byte} and total width, or None if
+    # fmt uses anything beyond zero-padded numeric fields and literal separators
+    fields, literals, pos, i = [], {}, 0, 0
+    while i < len(fmt):
+        if fmt[i] == '%':
+            token = fmt[i:i + 2]
+            if token not in _FIXED_WIDTH:
+                return None
+            unit, width = _FIXED_WIDTH[token]
+            fields.append((unit, pos, width))
+            pos += width
+            i += 2
+        else:
+            if not fmt[i].isascii():
+                return None
+            literals[pos] = ord(fmt[i])
+            pos += 1
+            i += 1
+    return fields, literals, pos
+
+
+def _parse_fixed_width(values, fmt):
+    # Vectorised parse of fixed-width numeric date strings (e.g. '%m/%d/%Y %H:%M'):
+    # read the digits straight out of a byte matrix instead of strptime per row
+    layout = _fixed_width_layout(fmt)
+    # Year-first layouts already go through pandas' fast ISO 8601 parser
+    if layout is None or fmt.startswith('%Y') or values.isna().any():
+        return None
+    fields, literals, width = layout
 
-    time_cols = ['date', 'dt', 'hour', 'time', 'day', 'month', 'year', 
-                 'week', 'timestamp', 'date(utc)', 'block_timestamp', 
-                 'ds', 'period', 'date_time', 'trunc_date', 'quarter', 'block_time',
-                 'block_date']
-    
-    # Append the custom time column if provided
-    time_cols.append(time_col.lower() if time_col is not None else None)
+    try:
+        raw = np.asarray(values.to_numpy(), dtype=f'S{width + 1}')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    if raw.dtype.itemsize != width + 1 or len(raw) == 0:
+        return None
+
+    chars = raw.view(np.uint8).reshape(len(raw), width + 1)
+    # Every value must be exactly `width` characters long
+    if chars[:, width].any() or not chars[:, width - 1].all():
+        return None
+    for position, byte in literals.items():
+        if not (chars[:, position] == byte).all():
+            return None
+
+    parts = {}
+    for unit, start, size in fields:
+        digits = chars[:, start:start + size].astype(np.int64) - 48
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+        parts[unit] = digits @ (10 ** np.arange(size - 1, -1, -1))
+
+    if 'year' not in parts or 'month' not in parts or 'day' not in parts:
+        return None
+
+    # Assemble datetime64 values arithmetically, rejecting anything strptime would
+    year, month, day = parts['year'], parts['month'], parts['day']
+    if ((month < 1) | (month > 12)).any() or (day < 1).any():
+        return None
+    month_start = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1).astype('timedelta64[M]')
+    days_in_month = ((month_start + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    if (day > days_in_month).any():
+        return None
+
+    stamps = month_start.astype('datetime64[D]').astype('datetime64[ns]') + (day - 1).astype('timedelta64[D]')
+    for unit, limit, code in (('hour', 23, 'h'), ('minute', 59, 'm'), ('second', 59, 's')):
+        if unit in parts:
+            if (parts[unit] > limit).any():
+                return None
+            stamps = stamps + parts[unit].astype(f'timedelta64[{code}]')
+    return pd.Series(stamps, index=values.index, name=values.name)
+
+def parse_datetime(values, dayfirst=False):
+    """
+    pd.to_datetime with the format detected once from the first non-null value, so
+    pandas can take its exact-format path instead of inferring per element. Falls
+    back to plain inference if the column doesn't follow that format.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values)
+
+    notna = values.notna().to_numpy()
+    sample = values.iloc[notna.argmax()] if notna.any() else None
+    fmt = _guess_format(sample, dayfirst) if isinstance(sample, str) else None
+    if fmt is not None:
+        head = values.iloc[:1000]
+        if len(values) > 1000 and head.nunique() <= len(head) // 2:
+            # Repeated stamps (e.g. long data): parse each distinct value once
+            codes, uniques = pd.factorize(values)
+            parsed = _parse_fixed_width(pd.Series(uniques), fmt) if (codes >= 0).all() else None
+            if parsed is not None:
+                return pd.Series(parsed.to_numpy()[codes], index=values.index, name=values.name)
+        else:
+            parsed = _parse_fixed_width(values, fmt)
+            if parsed is not None:
+                return parsed
+        try:
+            return pd.to_datetime(values, format=fmt, cache=True)
+        except (ValueError, TypeError) as e:
+            logger.debug('format %s did not fit every value (%s), inferring instead', fmt, e)
+
+    if dayfirst:
+        return pd.to_datetime(values, dayfirst=True, cache=True)
+    return pd.to_datetime(values, cache=True)
+
+def to_time(df, time_col=None, dayfirst=False, convert_to_datetime=True, drop_mid_timefreq=True):
+    time_cols = _time_names(time_col)
     
-    print(f'{time_col}')
-    print(f'{time_cols}')
+    logger.debug('%s', time_col)
+    logger.debug('%s', time_cols)
 
     time_freq = 'd'  # Default time frequency
     time_col_found = False  # Flag to check if we have found a time column
 
+    # Single pass over the header: the last time column becomes the index
+    matches = []
     for col in df.columns:
-        print(f'col: {col}')
+        lower = str(col).lower()
 
         if drop_mid_timefreq:
             # Check for specific time columns to set time_freq
-            if col.lower() in ['week', 'month', 'quarter']:
-                print(f'time_freq: {col}')
-                time_freq = {'week': 'w', 'month': 'm', 'quarter': 'q'}[col.lower()]
+            if lower in ['week', 'month', 'quarter']:
+                logger.debug('time_freq: %s', col)
+                time_freq = {'week': 'w', 'month': 'm', 'quarter': 'q'}[lower]
                 time_col_found = True  # Indicate we found a time column
 
-        if col.lower() in time_cols and col.lower() != 'timestamp':
-            if col.lower() == 'year':  # Handle 'year' column explicitly
-                print(f"Converting 'year' column to datetime")
-                df[col] = pd.to_datetime(df[col].astype(str), format='%Y')  # Convert to datetime
-                df[col] = df[col].dt.year  # Keep only the year as integer
-                df = df.set_index(col)  # Set the 'year' column as the index
-            elif convert_to_datetime:
-                print(f'convert col to dt: {col}')
-                if dayfirst:
-                    df[col] = pd.to_datetime(df[col], dayfirst=True).dt.tz_localize(None)  # Remove timezone
-                else:
-                    df[col] = pd.to_datetime(df[col]).dt.tz_localize(None)  # Remove timezone
-                df = df.set_index(col)  # Set the identified column as the index
-            else:
-                print(f'Column {col} will not be converted to datetime.')
-                df = df.set_index(col)
-        
-        elif col.lower() == 'timestamp':
-            df[col] = pd.to_datetime(df[col], unit='ms').dt.tz_localize(None)  # Remove timezone
-            df = df.set_index(col)  # Set the timestamp column as the index
+        if lower in time_cols:
+            matches.append(col)
+
+    if matches:
+        col = matches[-1]
+        lower = str(col).lower()
+        values = df[col]
+
+        if lower == 'timestamp':
+            values = pd.to_datetime(values, unit='ms').dt.tz_localize(None)  # Remove timezone
+        elif lower == 'year':  # Handle 'year' column explicitly
+            logger.debug("Converting 'year' column to datetime")
+            values = pd.to_datetime(values.astype(str), format='%Y').dt.year  # Keep only the year as integer
+        elif convert_to_datetime:
+            logger.debug('convert col to dt: %s', col)
+            values = parse_datetime(values, dayfirst=dayfirst).dt.tz_localize(None)  # Remove timezone
+        else:
+            logger.debug('Column %s will not be converted to datetime.', col)
+
+        # Earlier matches would only have been set as the index and then replaced, so
+        # they are dropped along with the column that becomes the index
+        df = df.drop(columns=matches)
+        df.index = pd.Index(values, name=col)
 
     if not time_col_found:  # If no specific time column was found, default to daily
-        print('No specific time column found. Defaulting to daily frequency.')
+        logger.debug('No specific time column found. Defaulting to daily frequency.')
 
-    print(df.index)
-    print(f'time_freq: {time_freq}')
+    logger.debug('%s', df.index)
+    logger.debug('time_freq: %s', time_freq)
     return df, time_freq
             
 def clean_dates(df, time_freq):
-    print(f'time_freq:{time_freq}')
+    logger.debug('time_freq:%s', time_freq)
     # Assumes index is datetime
     today = dt.date.today()
     today = pd.to_datetime(today).tz_localize(None)  # Ensure today is timezone-naive
-    print(f'today: {today}')
+    logger.debug('today: %s', today)
 
     # Get the latest timestamp in the DataFrame
     latest_date = df.index.max()
-    print(f'latest_date:{latest_date}')
+    logger.debug('latest_date:%s', latest_date)
 
     if time_freq == 'w':
         # Check if the latest_date is in the current week
@@ -371,8 +679,9 @@ def clean_dates(df, time_freq):
         # Default case for daily cleaning
         df = df[df.index < today]
 
-    print(f'df index: {df.index}')
-    df.sort_index(ascending=True, inplace=True)
+    logger.debug('df index: %s', df.index)
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(ascending=True)
     
     return df
    
@@ -385,48 +694,279 @@ def latest_values(series):
     # Format the values
     formatted_val = f"{l_val:,.0f}"
     formatted_date = l_date.strftime('%m-%d-%Y')
-    print(f'latest date: {formatted_date}, last value: {formatted_val}')
+    logger.debug('latest date: %s, last value: %s', formatted_date, formatted_val)
     
     return formatted_val, formatted_date
 
 def colors(shuffle=False):
-    # Existing Plotly palettes
-    color_palette = pc.qualitative.Plotly[::-1]
-    distinct_palette = pc.qualitative.Dark24 + pc.qualitative.Set3
-    
-    # Add Matplotlib colors
-    matplotlib_colors = [to_hex(cm.tab10(i)) for i in range(10)] + \
-                        [to_hex(cm.Set1(i)) for i in range(9)]
-    
-    # Add Colorcet colors
-    colorcet_colors = cc.palette['glasbey_dark'] + cc.palette['glasbey_light']
-
-    # Combine all palettes
-    lib_colors = distinct_palette + color_palette + matplotlib_colors + colorcet_colors
+    # Plotly Dark24 + Set3, Plotly reversed, matplotlib tab10 + Set1 and the
+    # colorcet glasbey palettes, precomputed in palettes.py
+    lib_colors = list(get_palette('combined'))
 
     if shuffle:
         random.shuffle(lib_colors)
 
-    # print(f'Combined colors: {lib_colors} \nCombined colors length: {len(lib_colors)}')
-    
     return lib_colors
 
+def default_colors():
+    """The palette used when a chart gets colors=None (the same colors as colors())."""
+    return get_palette('combined')
+
+def _stored_index(schema):
+    # Whether an Arrow schema carries a pandas index as a column
+    metadata = schema.pandas_metadata or {}
+    return any(isinstance(col, str) for col in metadata.get('index_columns', []))
+
+def _batch_reader(path, chunksize=1_000_000):
+    # Iterator of Arrow record batches of at most chunksize rows for Parquet and Arrow
+    # files, or None for other formats and files with a stored pandas index (only
+    # rebuilt by a full read)
+    lower = str(path).lower()
+    if lower.endswith(PARQUET_EXTENSIONS):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        schema, batches = parquet_file.schema_arrow, parquet_file.iter_batches(batch_size=chunksize)
+    elif lower.endswith(ARROW_EXTENSIONS):
+        import pyarrow as pa
+
+        source = pa.memory_map(path)
+        reader = pa.ipc.open_stream(source) if lower.endswith('.arrows') else pa.ipc.open_file(source)
+        schema = reader.schema
+        batches = reader if lower.endswith('.arrows') else (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        return None
+
+    if _stored_index(schema):
+        return None
+    # Record batches can be any size, so they're sliced (zero-copy) to chunksize rows
+    return (batch.slice(start, chunksize) for batch in batches for start in range(0, batch.num_rows, chunksize))
+
+def _chunk_reader(path, delimiter=',', columns=None, time_col=None, dtypes=None, dayfirst=False, chunksize=1_000_000,
+                  parse_time=True):
+    # Iterator of DataFrame chunks, or None when the format can't be streamed
+    lower = str(path).lower()
+    if lower.endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS):
+        batches = _batch_reader(path, chunksize)
+        if batches is None:
+            return None
+        return (_batch_frame(batch, columns, time_col) for batch in batches)
+
+    if lower.endswith(('.xlsx', '.xls')):
+        return None
+
+    return _read_csv(path, delimiter=delimiter, columns=columns, time_col=time_col, dtypes=dtypes,
+                     parse_time=parse_time, dayfirst=dayfirst, chunksize=chunksize)
+
+def _batch_frame(batch, columns=None, time_col=None, rows=None):
+    # The projected columns of a record batch (its `rows` only, a boolean mask) as a DataFrame
+    if columns is not None:
+        batch = batch.select(project_columns(batch.schema.names, columns, time_col))
+    if rows is not None:
+        import pyarrow as pa
+
+        batch = batch.filter(pa.array(rows))
+    return batch.to_pandas()
+
+def _combine_hashes(columns, rows):
+    # Row hashes from an iterable of column Series, one column at a time, so a chunk is
+    # never copied as a whole. Integers are hashed as floats so a column that reads as
+    # int in one chunk and float in another (NaNs elsewhere) still matches, as it would
+    # in one frame
+    hashes = np.zeros(rows, dtype=np.uint64)
+    for col in columns:
+        if pd.api.types.is_integer_dtype(col) or pd.api.types.is_bool_dtype(col):
+            col = col.astype('float64')
+        hashes = (hashes ^ pd.util.hash_pandas_object(col, index=False).to_numpy()) * np.uint64(1099511628211)
+    return hashes
+
+def _hash_rows(chunk):
+    return _combine_hashes((col for _, col in chunk.items()), len(chunk))
+
+def _unseen_rows(hashes, seen):
+    # Mask of the rows whose hash is neither repeated earlier in hashes nor in seen,
+    # and seen with them added. seen stays sorted: membership is a binary search, and
+    # appending a sorted block is a cheap merge for the stable (run-detecting) sort
+    pos = np.minimum(np.searchsorted(seen, hashes), max(len(seen) - 1, 0))
+    already = seen[pos] == hashes if len(seen) else np.zeros(len(hashes), dtype=bool)
+    keep = ~pd.Series(hashes).duplicated().to_numpy() & ~already
+    seen = np.concatenate([seen, np.sort(hashes[keep])])
+    seen.sort(kind='stable')
+    return keep, seen
+
+def _combine_last(partials, stamps):
+    # Per column, keep the partial whose last non-null value is latest in time; ties go
+    # to the later chunk, matching resample().last() over the whole file
+    values = pd.concat(partials)
+    times = pd.concat(stamps)
+    combined = {}
+    for col in values.columns:
+        frame = pd.DataFrame({'value': values[col], 'stamp': times[col]})
+        frame = frame[frame['stamp'].notna()].rename_axis('label').reset_index()
+        frame = frame.sort_values(['label', 'stamp'], kind='stable')
+        combined[col] = frame.groupby('label')['value'].last()
+    return pd.DataFrame(combined, columns=values.columns)
+
+def stream_resample(path, resample_freq, agg_func='sum', chunksize=1_000_000, delimiter=',', cols=None, sort_col=None,
+                    time_col=None, dayfirst=False, dtypes=None, drop_duplicates=True, dropna=False, fillna=False,
+                    dropna_col=False, ffill=False, keepna=False, start_date=None, end_date=None,
+                    drop_mid_timefreq=True, project_cols=True):
+    """
+    Resample a CSV, Parquet or Arrow file chunk by chunk so memory is bounded by chunksize and
+    the number of buckets rather than by the file.
+
+    Follows the in-memory steps of data_processing (dedup, NaN handling, to_time, cols,
+    date range, resample, sort_col merge) and returns (df, time_freq). Returns None when
+    the file has to go through the in-memory path instead (Excel inputs, NaNs
+    left for manual cleaning, dropna_col hitting a time/sort column). Sums can differ
+    from the in-memory result in the last floating point digit.
+    """
+    columns = None
+    if project_cols and cols is not None and not isinstance(cols, str):
+        columns = list(cols) + ([sort_col] if sort_col is not None else [])
+
+    # Duplicates are whole-row duplicates, so with drop_duplicates chunks are projected
+    # after deduplicating
+    chunks = _chunk_reader(path, delimiter=delimiter, columns=None if drop_duplicates else columns,
+                           time_col=time_col, dtypes=dtypes, dayfirst=dayfirst, chunksize=chunksize)
+    if chunks is None:
+        return None
+
+    seen = np.empty(0, dtype=np.uint64)
+    nan_cols = set()
+    int_cols = None
+    carry = None
+    time_freq = 'd'
+    first_ts = last_ts = index_name = None
+    partials, stamps, aligned = [], [], []
+
+    for chunk in chunks:
+        if drop_duplicates:
+            keep, seen = _unseen_rows(_hash_rows(chunk), seen)
+            chunk = chunk.loc[keep, project_columns(chunk.columns, columns, time_col)] if columns is not None else chunk[keep]
+
+        if dropna:
+            chunk = chunk.dropna()
+        elif fillna:
+            chunk = chunk.fillna(0)
+        elif dropna_col:
+            # Dropped once every chunk has been seen
+            nan_cols.update(chunk.columns[chunk.isna().any()])
+        elif ffill:
+            chunk = pd.concat([carry, chunk]).ffill().iloc[1:] if carry is not None else chunk.ffill()
+            if len(chunk):
+                carry = chunk.iloc[[-1]]
+        elif not keepna and chunk.isna().any().any():
+            # data_processing hands the raw frame back for manual cleaning here
+            return None
+
+        if chunk.empty:
+            continue
+
+        chunk, time_freq = to_time(chunk, time_col, dayfirst, drop_mid_timefreq=drop_mid_timefreq)
+
+        if cols is not None and not isinstance(cols, str) and len(cols) > 0:
+            chunk = chunk[cols]
+
+        if start_date is not None:
+            chunk = chunk[chunk.index >= pd.to_datetime(start_date)]
+        if end_date is not None:
+            chunk = chunk[chunk.index <= pd.to_datetime(end_date)]
+        if chunk.empty:
+            continue
+
+        index_name = chunk.index.name
+        first_ts = chunk.index.min() if first_ts is None else min(first_ts, chunk.index.min())
+        last_ts = chunk.index.max() if last_ts is None else max(last_ts, chunk.index.max())
+
+        values = chunk
+        if sort_col is not None:
+            # Rows stamped on a bucket label are the ones the sort_col merge keeps
+            labels = chunk.resample(resample_freq).size().index
+            aligned.append(chunk.loc[chunk.index.isin(labels), sort_col])
+            values = chunk.drop(columns=sort_col)
+
+        chunk_ints = {col for col in values.columns if pd.api.types.is_integer_dtype(values[col])}
+        int_cols = chunk_ints if int_cols is None else int_cols & chunk_ints
+
+        if agg_func == 'sum':
+            partials.append(values.resample(resample_freq).sum())
+        else:
+            partials.append(values.resample(resample_freq).last())
+            stamp = np.where(values.notna().to_numpy(), values.index.to_numpy()[:, None], np.datetime64('NaT'))
+            stamps.append(pd.DataFrame(stamp, index=values.index, columns=values.columns).resample(resample_freq).max())
+
+    if not partials:
+        return None
+
+    # Same bucket labels a single resample over the whole file would produce
+    skeleton = pd.Series(0, index=pd.DatetimeIndex([first_ts, last_ts])).resample(resample_freq).size().index
+
+    if agg_func == 'sum':
+        df = pd.concat(partials).groupby(level=0).sum().reindex(skeleton, fill_value=0)
+    else:
+        df = _combine_last(partials, stamps).reindex(skeleton)
+        for col in int_cols or ():
+            if df[col].notna().all():
+                df[col] = df[col].astype('int64')
+    df.index.name = index_name
+
+    if nan_cols:
+        explicit = set(cols) if cols is not None and not isinstance(cols, str) else set()
+        if nan_cols & explicit or not nan_cols <= set(df.columns):
+            return None
+        df = df.drop(columns=sorted(nan_cols))
+
+    if resample_freq == 'Q':
+        df.index = df.index.to_period('Q').strftime('Q%q %y')
+
+    if sort_col is not None:
+        df = df.merge(pd.concat(aligned), left_index=True, right_index=True, how='inner')
+
+    logger.debug('df after streamed resample: %s', df)
+    return df, time_freq
+
 def data_processing(path=None, file=None, time_col=None, dayfirst=False, turn_to_time=True, dropna=False, fillna=False, ffill=False, resample_freq=None,
                     delimiter=',', start_date=None, end_date=None, cols=None, dropna_col=False,
                     keepna=False, drop_duplicates=True, set_time_col=False,drop_mid_timefreq=True,agg_func='sum',
-                    to_clean_dates=True,sort_col=None):
-    print(f'turning to df')
+                    to_clean_dates=True,sort_col=None,cache=False,project_cols=True,dtypes=None,csv_engine=None,chunksize=None,
+                    categorical=True):
+    logger.debug('turning to df')
     if path is None:
         path = f'../data/{file}'
+
+    # cache=True uses the shared cache.default_cache; a cache.data_cache instance can also be passed
+    if cache:
+        options = dict(locals())
+        del options['cache'], options['file']
+        store = get_default_cache() if cache is True else cache
+        return store.fetch(path, options, lambda: data_processing(**options))
+
+    # Large files: resample chunk by chunk instead of loading everything
+    if chunksize and resample_freq is not None and turn_to_time and agg_func in ('sum', 'last'):
+        streamed = stream_resample(path, resample_freq, agg_func=agg_func, chunksize=chunksize, delimiter=delimiter,
+                                   cols=cols, sort_col=sort_col, time_col=time_col, dayfirst=dayfirst, dtypes=dtypes,
+                                   drop_duplicates=drop_duplicates, dropna=dropna, fillna=fillna, dropna_col=dropna_col,
+                                   ffill=ffill, keepna=keepna, start_date=start_date, end_date=end_date,
+                                   drop_mid_timefreq=drop_mid_timefreq, project_cols=project_cols)
+        if streamed is not None:
+            df, time_freq = streamed
+            if to_clean_dates:
+                logger.debug('cleaning dates')
+                df = clean_dates(df, time_freq)
+            return encode_groups(df, sort_col, categorical)
+        logger.debug('%s cannot be streamed, processing in memory', path)
     
-    df = to_df(path, delimiter)  # Assuming to_df is defined elsewhere
-    
-    if drop_duplicates:
-        print(f'Dropping Duplicates')
-        df.drop_duplicates(inplace=True)
+    # Only the plotted columns (plus sort_col and time columns) are kept; to_df drops
+    # duplicates on whole rows while reading
+    columns = None
+    if project_cols and cols is not None and not isinstance(cols, str):
+        columns = list(cols) + ([sort_col] if sort_col is not None else [])
+    df = to_df(path, delimiter, columns=columns, time_col=time_col, dtypes=dtypes,
+               parse_time=turn_to_time, dayfirst=dayfirst, engine=csv_engine, drop_duplicates=drop_duplicates)
 
-    print(f'turn to time: {turn_to_time}')
-    print(f'set time col: {set_time_col}')
+    logger.debug('turn to time: %s', turn_to_time)
+    logger.debug('set time col: %s', set_time_col)
 
     # If turn_to_time is False, handle accordingly
     if not turn_to_time:
@@ -434,10 +974,10 @@ def data_processing(path=None, file=None, time_col=None, dayfirst=False, turn_to
             df = df.fillna(0)
         
         if dropna:
-            print(f'NaN detected, Dropping NaN Values')
+            logger.debug('NaN detected, Dropping NaN Values')
             df.dropna(inplace=True)
         elif dropna_col:
-            print(f'NaN detected, Dropping NaN Values in specified column')
+            logger.debug('NaN detected, Dropping NaN Values in specified column')
             df = df.dropna(axis=1)
         elif keepna:
             df = df.copy()
@@ -452,26 +992,26 @@ def data_processing(path=None, file=None, time_col=None, dayfirst=False, turn_to
         if cols is not None and len(cols) > 0:  # Check if cols is a list and not empty
             df = df[cols]
 
-        return df
+        return encode_groups(df, sort_col, categorical)
 
-    print(f'turning to dt')
+    logger.debug('turning to dt')
     
     # Handle NaN values before converting to datetime
     if df.isna().any().any():
         if dropna:
-            print(f'NaN detected, Dropping NaN Values')
+            logger.debug('NaN detected, Dropping NaN Values')
             df.dropna(inplace=True)
         elif fillna:
-            print(f'NaN detected, Filling NaN w/ 0')
+            logger.debug('NaN detected, Filling NaN w/ 0')
             df = df.fillna(0)
         elif dropna_col:
-            print(f'NaN detected, Dropping NaN Values in specified column')
+            logger.debug('NaN detected, Dropping NaN Values in specified column')
             df = df.dropna(axis=1)
         elif ffill:
-            print(f'NaN detected, Filling NaN w/ Forward Fill')
+            logger.debug('NaN detected, Filling NaN w/ Forward Fill')
             df = df.ffill()
         elif not keepna:
-            print(f'NaN detected, requires manual cleaning')
+            logger.debug('NaN detected, requires manual cleaning')
             return df
     
     # Convert time columns to datetime if turn_to_time is True
@@ -493,86 +1033,103 @@ def data_processing(path=None, file=None, time_col=None, dayfirst=False, turn_to
 
     # Resample the DataFrame if resample_freq is specified
     if resample_freq is not None:
-        original_df = df.copy()
-        print(f'resampling: {resample_freq}, how: {agg_func}')
+        # Only the sort_col values are needed back after resampling
+        groups = df[sort_col] if sort_col is not None else None
+        logger.debug('resampling: %s, how: %s', resample_freq, agg_func)
         if resample_freq == 'Q':
             if agg_func == 'sum':
                 df = df.resample(resample_freq).sum()
             elif agg_func == 'last':
                 df = df.resample(resample_freq).last()
             df.index = df.index.to_period('Q').strftime('Q%q %y')
-            print(df.index)
+            logger.debug('%s', df.index)
         else:
             if agg_func == 'sum':
                 df = df.resample(resample_freq).sum()
             elif agg_func == 'last':
                 df = df.resample(resample_freq).last()
-            print(df.index)
-        print(f'df after resample: {df}')
+            logger.debug('%s', df.index)
+        logger.debug('df after resample: %s', df)
         
         if sort_col != None:
-            print(f'sort_col: {sort_col}')
-            df = df.drop(columns=sort_col).merge(original_df[sort_col], left_index=True, right_index=True, how='inner')
-            print(f'df after merge: {df}')
+            logger.debug('sort_col: %s', sort_col)
+            df = df.drop(columns=sort_col).merge(groups, left_index=True, right_index=True, how='inner')
+            logger.debug('df after merge: %s', df)
     if to_clean_dates:
-        print(f'cleaning dates')
+        logger.debug('cleaning dates')
         df = clean_dates(df,time_freq)  # Assuming clean_dates is defined elsewhere
     
-    print(df.columns)
+    logger.debug('%s', df.columns)
 
-    return df
+    # Grouping values become category codes once the frame is final (resampling can't sum them)
+    return encode_groups(df, sort_col, categorical)
+
+GROUP_ENCODINGS = ('category', 'arrow')
+
+def _group_dtype(categorical):
+    if categorical is True or categorical == 'category':
+        return 'category'
+    if categorical != 'arrow':
+        raise ValueError(f"categorical must be one of {GROUP_ENCODINGS}, True or False, not {categorical!r}")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        logger.warning('Arrow-backed categories need pyarrow (%s), using a plain Categorical.', e)
+        return 'category'
+    return pd.StringDtype('pyarrow')
+
+def encode_groups(df, cols, categorical=True):
+    """
+    Store the grouping columns as integer-coded categories, so grouping, ranking and
+    filtering on them compare codes instead of hashing strings again.
+
+    categorical=True (or 'category') makes them pandas Categoricals, 'arrow' Categoricals
+    whose categories (the dictionary) are Arrow strings, False leaves df as it is.
+    Numeric and already encoded columns are left alone.
+    """
+    if not categorical:
+        return df
+    cols = [cols] if isinstance(cols, str) else list(cols or [])
+    cols = [col for col in cols if col in df.columns and df[col].dtype == object]
+    if not cols:
+        return df
+
+    dtype = _group_dtype(categorical)
+    if dtype == 'category':
+        return df.astype({col: 'category' for col in cols})
+    encoded = {}
+    for col in cols:
+        categorical_col = df[col].astype('category')
+        try:
+            categorical_col = categorical_col.cat.set_categories(categorical_col.cat.categories.astype(dtype))
+        except (TypeError, ValueError) as e:
+            # Arrow strings only hold text; mixed columns keep object categories
+            logger.debug('could not store %s categories as %s: %s', col, dtype, e)
+        encoded[col] = categorical_col
+    return df.assign(**encoded)
+
+def group_positions(df, sort_col):
+    """
+    Row positions of every sort_col value from one groupby pass, so per-category
+    traces can take df.iloc[positions] instead of rescanning df[df[sort_col] == i].
+    Values not present map to no rows via positions.get(value, NO_ROWS).
+    """
+    return df.groupby(sort_col, sort=False, observed=True).indices
+
+NO_ROWS = np.empty(0, dtype=np.intp)
 
 def rank_by_col(df, sort_col, num_col, descending=True, cumulative_sort=False, colors=None):
-    print(f"df @ rank_by_col: {df}")
-
-    df.sort_index(inplace=True)
-
-    # Generate cumulative sort order
-    if cumulative_sort:
-        # Calculate cumulative sum and sort by `num_col`
-        cumulative_sorted_list = (
-            df.groupby(sort_col)[num_col]
-            .sum()
-            .sort_values(ascending=not descending)
-            .index
-            .tolist()
-        )
-    else:
-        cumulative_sorted_list = []
-
-    # Generate plot/legend order based on the latest values
-    all_signers = df[sort_col].unique()
-    last_day = df.index.max()
-    last_records = df.groupby(sort_col).tail(1)
-    last_day_records = last_records[last_records.index == last_day]
-
-    missing_signers = set(all_signers) - set(last_day_records[sort_col])
-    missing_df = pd.DataFrame({
-        sort_col: list(missing_signers),
-        num_col: 0
-    })
-    combined_df = pd.concat([last_day_records, missing_df])
-    combined_df = combined_df.sort_values(by=num_col, ascending=not descending).drop_duplicates()
-
-    # Generate the sorted list for plotting
-    latest_sorted_list = combined_df.reset_index()[sort_col].values.tolist()
-
-    # Generate the color map based on cumulative or latest sort
-    if colors:
-        if cumulative_sort:
-            # Colors based on cumulative rank
-            if descending:
-                color_map = {val: colors[idx % len(colors)] for idx, val in enumerate(cumulative_sorted_list)}
-            else:
-                color_map = {val: colors[idx % len(colors)] for idx, val in enumerate(reversed(cumulative_sorted_list))}
-        else:
-            # Colors based on latest value rank
-            if descending:
-                color_map = {val: colors[idx % len(colors)] for idx, val in enumerate(latest_sorted_list)}
-            else:
-                color_map = {val: colors[idx % len(colors)] for idx, val in enumerate(reversed(latest_sorted_list))}
-    else:
-        color_map = {}
+    logger.debug('df @ rank_by_col: %s', df)
+
+    # Ranked in date order; callers that plot df sort it themselves
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    ranked = get_ranking(df, sort_col, num_col)
+
+    # Plot/legend order by the latest values, colors by cumulative or latest rank
+    latest_sorted_list = ranked.latest_order(descending=descending)
+    color_map = ranked.color_map(colors, cumulative=cumulative_sort, descending=descending) if colors else {}
 
     return latest_sorted_list, color_map
 
@@ -615,15 +1172,10 @@ def rank_by_columns(df, cumulative=False, descending=True):
     Returns:
     - pd.Index: Ordered column names based on ranking.
     """
-    if cumulative:
-        # Rank by cumulative sum
-        sort_list = df.select_dtypes(include=['number']).sum().sort_values(ascending=not descending)
-    else:
-        # Rank by the latest row
-        sort_list = df.iloc[-1].sort_values(ascending=not descending)
+    sort_list = get_ranking(df).order(cumulative=cumulative, descending=descending)
 
-    print(f"Ranked columns: {sort_list}")
-    return sort_list.index
+    logger.debug('Ranked columns: %s', sort_list)
+    return sort_list
 
 def top_ten_with_others(df, rank_col, sort_col, top_n=9):
 
@@ -648,7 +1200,7 @@ def top_ten_with_others(df, rank_col, sort_col, top_n=9):
 
         # Combine the top shows and the "Other" group
         combined_df = pd.concat([top_df, other_df], ignore_index=False)
-        print(f'index: {combined_df}')
+        logger.debug('index: %s', combined_df)
 
         # combined_df.drop_duplicates(inplace=True)
         return combined_df
@@ -659,23 +1211,22 @@ def top_ten(df, rank_col,topn=5):
     return top_df
 
 def ranked_cleaning(df, num_col, sort_col, descending=True,use_sort_list=True): 
-    df_copy = df.copy()
-    df_copy = df_copy[[sort_col, num_col]]
-    print(f'df in ranked cleaning: {df_copy}')
-    print(f'orig sort order: {df_copy[sort_col].unique()}')
-    print(f'use_sort_list: {use_sort_list}')
+    ranked = df.loc[:, [sort_col, num_col]]
+    logger.debug('df in ranked cleaning: %s', ranked)
+    logger.debug('orig sort order: %s', lazy(lambda: ranked[sort_col].unique()))
+    logger.debug('use_sort_list: %s', use_sort_list)
 
     if use_sort_list==True:
 
         # Sort by the transaction number column based on the descending parameter
-        df_copy.sort_values(by=num_col, inplace=True, ascending=not descending)  # Use `not descending` for the sort order
-        sort_list = df_copy[sort_col].unique()
+        ranked = ranked.sort_values(by=num_col, ascending=not descending)  # Use `not descending` for the sort order
+        sort_list = ranked[sort_col].unique()
     else:
         #We keep original sort order
-        sort_list = df_copy[sort_col].unique()
-    df_copy.drop_duplicates(inplace=True)
+        sort_list = ranked[sort_col].unique()
+    ranked = ranked.drop_duplicates()
 
-    return df_copy, sort_list
+    return ranked, sort_list
 
 
 # def to_percentage(df, sum_col, index_col):
@@ -696,22 +1247,20 @@ def ranked_cleaning(df, num_col, sort_col, descending=True,use_sort_list=True):
 
 def to_percentage(df, sum_col, index_col, percent=True):
 
-    df_copy = df.copy()
-
-    df_copy = df_copy.groupby(index_col)[sum_col].sum().reset_index()
+    df_copy = df.groupby(index_col, observed=True)[sum_col].sum().reset_index()
 
     # Calculate total usd_revenue
     total = df[sum_col].sum()
 
     if percent:
 
-        # Add a new column for percentage
-        df_copy['percentage'] = (df_copy[sum_col] / total) * 100
-        df_copy['legend_label'] = df_copy.apply(lambda x: f"{x[index_col]} ({x['percentage']:.1f}%)", axis=1)
+        # Add a new column for percentage (0% everywhere when the total is 0)
+        df_copy['percentage'] = share_of(df_copy[sum_col], total)
+        df_copy['legend_label'] = df_copy[index_col].astype(str) + ' (' + df_copy['percentage'].map('{:.1f}'.format) + '%)'
         df_copy.set_index('legend_label', inplace=True)
     else:
         df_copy.set_index(index_col, inplace=True)
-        print(f'df_copy: {df_copy}')
+        logger.debug('df_copy: %s', df_copy)
     
     df_copy.sort_values(by=sum_col, ascending=False, inplace=True)
     df_copy.drop_duplicates(inplace=True)
@@ -719,124 +1268,76 @@ def to_percentage(df, sum_col, index_col, percent=True):
     return df_copy, total
 
 def normalize_to_percent(df,num_col=None):
-    print(f'num_col: {num_col}')
+    logger.debug('num_col: %s', num_col)
 
     if num_col == None:
-    
-        df_copy = df.copy()
-
-        df_copy['total'] = df_copy.sum(axis=1)
-        # Exclude the 'total_transactions' column from the percentage calculation
-        chains_columns = df_copy.columns.difference(['total'])
 
-        for col in chains_columns:
-            df_copy[f'{col}_percentage'] = (df_copy[col] / df_copy['total']) * 100
+        # Share of each row's total; a 'total' column is left out and columns come out sorted
+        chains_columns = df.columns.difference(['total'])
+        df_copy = row_shares(df, columns=chains_columns)
 
-        # Drop the 'total_transactions' column if you don't need it
-        df_copy = df_copy.drop(columns=['total'])
-
-        percent_cols = [col for col in df_copy.columns if '_percentage' in col]
-        df_copy = df_copy[percent_cols]
-
-        df_copy.columns = df_copy.columns.str.replace('_percentage', '', regex=False)
-
-        print(f'percent_cols:{df_copy.columns}')
+        logger.debug('percent_cols:%s', df_copy.columns)
+        duplicated = duplicated_rows(df_copy)
     else:
-        df_copy = df.copy()
-        total = df_copy.groupby(df_copy.index)[num_col].sum()
-        total = total.to_frame(f'total_{num_col}')
-        df_copy = df_copy.merge(total, left_index=True, right_index=True, how='inner')
-        # Calculate percentage of daily active users for each app
-        df_copy['percentage'] = (df_copy[num_col] / df_copy[f'total_{num_col}']) * 100
+        # Rows without a date have no daily total
+        if df.index.hasnans:
+            df = df[df.index.notna()]
 
-        # Drop the total_active_users column if no longer needed
-        df_copy = df_copy.drop(columns=[f'total_{num_col}'])
-        df_copy.drop(columns=num_col,inplace=True)
+        # Share of each date's total, e.g. of daily active users for each app; num_col goes last
+        df_copy = df.drop(columns=num_col)
+        df_copy[num_col] = group_shares(df[num_col]).to_numpy()
+        duplicated = df_copy.duplicated().to_numpy()
 
-        df_copy.rename(columns={"percentage":num_col},inplace=True)
-
-    df_copy.drop_duplicates(inplace=True)
+    if duplicated.any():
+        df_copy = df_copy[~duplicated]
 
     return df_copy
 
 def top_by_col(df, sort_col, sum_col, num=10, latest=True):
-    # Step 1: Group by 'make' and calculate the sum of 'mints_per_week'
-    if latest==True:
-        recent = df.groupby(sort_col).tail(1).sort_values(by=sum_col,ascending=False).head(num)[sort_col].values.tolist()
-        filtered_df = df[df[sort_col].isin(recent)]
-
-    else:
-        top = df.groupby(sort_col)[sum_col].sum()
-
-        # Step 2: Sort the makes by the sum of 'mints_per_week' in descending order and keep the top 10
-        top_10 = top.nlargest(num).index
-
-        # Step 3: Filter the original DataFrame to keep only rows with the top 10 makes
-        filtered_df = df[df[sort_col].isin(top_10)]
+    # Keep the rows of the top `num` sort_col values, by latest row or by total
+    filtered_df = df[group_mask(df, [sort_col], sum_col, num, latest=latest)]
 
-        # Optionally, reset the index
-        # filtered_df = filtered_df.reset_index()
-
-    filtered_df.drop_duplicates(inplace=True)
-
-    return filtered_df
+    return filtered_df.drop_duplicates()
 
 def top_other_by_col(df, sort_col, sum_col, num=10, latest=True):
-    # Step 1: Group by 'make' and calculate the sum of 'mints_per_week'
-    if latest==True:
-        recent = df.groupby(sort_col).tail(1).sort_values(by=sum_col,ascending=False).head(num)[sort_col].values.tolist()
-        filtered_df = df[df[sort_col].isin(recent)]
-
-        other = df[~df[sort_col].isin(recent)]
-        other_values = other.groupby(sort_col)[sum_col].sum()
-
-        other_df = pd.DataFrame({
-        sort_col: [f'Other'] * len(other_values),
-        sum_col: other_values.values
-        })
-
-        combined = pd.concat([filtered_df,other_df], ignore_index=True)
-        combined.sort_index(inplace=True)
-    else:
-        top = df.groupby(sort_col)[sum_col].sum()
-
-        # Step 2: Sort the makes by the sum of 'mints_per_week' in descending order and keep the top 10
-        top_10 = top.nlargest(num).index
-
-        # Step 3: Filter the original DataFrame to keep only rows with the top 10 makes
-        filtered_df = df[df[sort_col].isin(top_10)]
+    keep = group_mask(df, [sort_col], sum_col, num, latest=latest)
+    top_df, dtype = _with_other(df[keep], sort_col)
 
-        other = df[~df[sort_col].isin(recent)]
-        other_values = other.groupby(sort_col)[sum_col].sum()
-
-        other_df = pd.DataFrame({
-        sort_col: [f'Other'] * len(other_values),
-        sum_col: other_values.values
-        })
-
-        combined = pd.concat([filtered_df,other_df], ignore_index=True)
-        combined.sort_index(inplace=True)
-
-        # Optionally, reset the index
-        # filtered_df = filtered_df.reset_index()
+    # Every other sort_col value becomes an 'Other' row holding its total
+    other_values = df[~keep].groupby(sort_col, observed=True)[sum_col].sum()
+    other_df = pd.DataFrame({
+        sort_col: pd.Series('Other', index=range(len(other_values)), dtype=dtype),
+        sum_col: other_values.to_numpy()
+    })
 
-    # combined.drop_duplicates(inplace=True)
+    combined = pd.concat([top_df, other_df], ignore_index=True)
 
     return combined
 
 # For timeseries
 
-def top_other_ts_by_col(df,num_col, sort_col, topn=9):
-    list = rank_by_col(df=df,sort_col=sort_col,num_col=num_col)
-    list = list[0]
-    top_df = df[df[sort_col].isin(list[0:topn])]
+def _with_other(df, sort_col):
+    # df with a sort_col that can also hold 'Other', and the dtype to build 'Other' rows with
+    dtype = label_dtype(df[sort_col], 'Other')
+    if dtype is not None and dtype != df[sort_col].dtype:
+        df = df.astype({sort_col: dtype})
+    return df, dtype
+
+def _by_date(df):
+    return df if df.index.is_monotonic_increasing else df.sort_index()
 
-    other = df[~df[sort_col].isin(list[0:topn])]
-    # other_num = len(other.columns)
-    other_values = other.groupby(other.index)[num_col].sum()
+def top_other_ts_by_col(df,num_col, sort_col, topn=9):
+    df = _by_date(df)
+    top = top_labels(get_ranking(df, sort_col, num_col).latest, topn)
+    keep = label_mask(df[sort_col], top)
+    top_df, dtype = _with_other(df[keep], sort_col)
+
+    # One 'Other' row per date with the total of every other series
+    other = df[num_col][~keep]
+    other_values = other.groupby(other.index).sum()
     other_df = pd.DataFrame({
-        sort_col: [f'Other'] * len(other_values),
-        num_col: other_values.values
+        sort_col: pd.Series('Other', index=other_values.index, dtype=dtype),
+        num_col: other_values.to_numpy()
     }, index=other_values.index)
 
     combined = pd.concat([top_df,other_df], ignore_index=False)
@@ -844,33 +1345,45 @@ def top_other_ts_by_col(df,num_col, sort_col, topn=9):
 
     return combined
 
+# Rows summed per chunk by row_sum, so the selected columns are never copied whole
+ROW_SUM_CHUNK_BYTES = 8 * 2**20
+
+def row_sum(df, cols):
+    """
+    df.loc[:, cols].sum(axis=1), copying only a chunk of rows of those columns at a time.
+
+    Rows are reduced independently, so the result is identical to the one-shot sum.
+    """
+    step = max(ROW_SUM_CHUNK_BYTES // (8 * max(len(cols), 1)), 1)
+    if len(df) <= step:
+        return df.loc[:, cols].sum(axis=1)
+    return pd.concat([df.iloc[start:start + step].loc[:, cols].sum(axis=1) for start in range(0, len(df), step)])
+
 def top_other_ts_by_columns(df, topn=9, num_other = False):
-    list = rank_by_columns(df)
-    print(f'top {topn} cols: {list[0:topn]}')
-    other_cols = [col for col in df.columns if col not in(list[0:topn])]
-    print(f'other cols: {other_cols}')
-    top = df[list[0:topn]]
-    other_df = df[other_cols]
-    other_df = other_df.sum(axis=1).to_frame('Other')
-    combined = pd.merge(top,other_df,left_index=True, right_index=True, how='inner')
-    if num_other == True:
-        combined.rename(columns={'Other':f'Others ({len(other_cols)})'},inplace=True)
+    top = top_labels(get_ranking(df).latest, topn)
+    other_cols = ~df.columns.isin(top)
+    logger.debug('top %s cols: %s', topn, top)
+    logger.debug('other cols: %s', lazy(lambda: df.columns[other_cols]))
+
+    other_name = f'Others ({other_cols.sum()})' if num_other == True else 'Other'
+    combined = df.loc[:, top]
+    combined[other_name] = row_sum(df, df.columns[other_cols])
 
     return combined
 
 def top_ts_by_col(df,num_col, sort_col, topn=9):
-    list = rank_by_col(df=df,sort_col=sort_col,num_col=num_col)
-    list = list[0]
-    print(f'list: {list}')
-    top_df = df[df[sort_col].isin(list[0:topn])]
+    df = _by_date(df)
+    top = top_labels(get_ranking(df, sort_col, num_col).latest, topn)
+    logger.debug('top: %s', top)
+    top_df = df[label_mask(df[sort_col], top)]
 
     return top_df
 
 def top_ts_only_by_columns(df, topn=9):
-    list = rank_by_columns(df)
-    print(f'top {topn} cols: {list[0:topn]}')
-    top = [col for col in df.columns if col in(list[0:topn])]
-    df_new = df[top]
+    top = top_labels(get_ranking(df).latest, topn)
+    logger.debug('top %s cols: %s', topn, top)
+    # In the frame's own column order
+    df_new = df.loc[:, df.columns.isin(top)]
 
     return df_new
 
@@ -881,29 +1394,45 @@ def clean_string(value, capwords, clean_words):
     # Check for capitalization based on capwords
     for word in cleaned_value.split():
         if word.upper() in capwords:
-            print(f"'{value}' matches capword. Keeping as uppercase: {word.upper()}")
+            logger.debug("'%s' matches capword. Keeping as uppercase: %s", value, word.upper())
             cleaned_value = cleaned_value.replace(word, word.upper())
         else:
-            print(f"'{value}' does not match capword. Converting to title case: {word.title()}")
+            logger.debug("'%s' does not match capword. Converting to title case: %s", value, word.title())
 
     # Replace words based on the clean_words mapping
     for old_word, new_word in clean_words.items():
         cleaned_value = cleaned_value.replace(old_word, new_word)
 
-    print(f"Cleaned string: '{cleaned_value}'")
+    logger.debug("Cleaned string: '%s'", cleaned_value)
     return cleaned_value
 
+def _replace_keeping_categories(df, categorical, old_word, new_word):
+    # Categoricals are cleaned through their categories (once per distinct value)
+    df = share(df)
+    others = df.columns.difference(categorical, sort=False)
+    df[others] = df[others].replace(old_word, new_word, regex=True)
+    for col in categorical:
+        categories = df[col].cat.categories
+        cleaned = categories.str.replace(old_word, new_word, regex=True) if pd.api.types.is_string_dtype(categories) else categories
+        if cleaned.is_unique:
+            df[col] = df[col].cat.rename_categories(cleaned)
+        else:
+            # Two values cleaned to the same label: merge them into one category
+            df[col] = pd.Categorical(cleaned[df[col].cat.codes].where(df[col].cat.codes >= 0))
+    return df
+
 def cleaning(df, cols_to_plot, bar_col, line_col, groupby, num_col, y1_list=None, y2_list=None, capwords=None, clean_words=None):
     # Ensure capwords is a list of uppercase words
     capwords = [word.upper() for word in (capwords or [])]
-    print(f'capwords: {capwords}')
+    logger.debug('capwords: %s', capwords)
 
-    print(f'y1_list: {y1_list} \ny2_list: {y2_list}')
+    logger.debug('y1_list: %s \ny2_list: %s', y1_list, y2_list)
     
     # Prepare the replacement mapping if clean_words is provided
     clean_words = clean_words or {}
 
-    # Clean the DataFrame column names
+    # Clean the DataFrame column names (on a shallow copy, so df's own labels are left alone)
+    df = df.copy(deep=False)
     df.columns = [
         col.replace('_', ' ').title() if not any(word.upper() in capwords for word in col.replace('_', ' ').split())
         else col.replace('_', ' ').title()  # Replace underscores and convert to title case initially
@@ -917,8 +1446,9 @@ def cleaning(df, cols_to_plot, bar_col, line_col, groupby, num_col, y1_list=None
     ]
 
     # Replace words in the DataFrame based on the clean_words dictionary
+    categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
     for old_word, new_word in clean_words.items():
-        df = df.replace(old_word, new_word, regex=True)
+        df = df.replace(old_word, new_word, regex=True) if not categorical else _replace_keeping_categories(df, categorical, old_word, new_word)
 
     # Explicitly check if variables are None before cleaning
     cols_to_plot = [] if cols_to_plot is None else list(cols_to_plot)
@@ -940,32 +1470,33 @@ def cleaning(df, cols_to_plot, bar_col, line_col, groupby, num_col, y1_list=None
     # Clean the groupby column (single string)
     if groupby:
         groupby_cleaned = clean_string(groupby, capwords, clean_words)
-        print(f"Cleaned groupby: {groupby_cleaned}")
+        logger.debug('Cleaned groupby: %s', groupby_cleaned)
     else:
         groupby_cleaned = groupby
 
     # Clean the num_col column (single string)
     if num_col:
         num_col_cleaned = clean_string(num_col, capwords, clean_words)
-        print(f"Cleaned num_col: {num_col_cleaned}")
+        logger.debug('Cleaned num_col: %s', num_col_cleaned)
     else:
         num_col_cleaned = num_col
 
     # Print cleaned columns for verification
-    print("Cleaned DataFrame columns:", df.columns.tolist())
-    print("Cleaned cols_to_plot:", cols_to_plot)
-    print("Cleaned bar_col:", bar_col)
-    print("Cleaned line_col:", line_col)
-    print("Cleaned y1_list:", y1_list)
-    print("Cleaned y2_list:", y2_list)
-    print("Cleaned groupby:", groupby_cleaned)
-    print("Cleaned num_col:", num_col_cleaned)
+    logger.debug('Cleaned DataFrame columns: %s', lazy(lambda: df.columns.tolist()))
+    logger.debug('Cleaned cols_to_plot: %s', cols_to_plot)
+    logger.debug('Cleaned bar_col: %s', bar_col)
+    logger.debug('Cleaned line_col: %s', line_col)
+    logger.debug('Cleaned y1_list: %s', y1_list)
+    logger.debug('Cleaned y2_list: %s', y2_list)
+    logger.debug('Cleaned groupby: %s', groupby_cleaned)
+    logger.debug('Cleaned num_col: %s', num_col_cleaned)
 
     return df, cols_to_plot, bar_col, line_col, y1_list, y2_list, groupby_cleaned, num_col_cleaned
 
 
 
 def cleaning_values(df):
+    df = df.copy(deep=False)
     for col in df.columns:
         df[col] = (
             df[col]
@@ -1006,13 +1537,13 @@ def get_submission_df(submissions_data, submission_num, submission_directory):
                     df = pd.read_csv(csv_path)
                 data_struct[csv_filename] = df
             except FileNotFoundError:
-                print(f"Warning: File {csv_path} not found.")
+                logger.warning('Warning: File %s not found.', csv_path)
             except pd.errors.EmptyDataError:
-                print(f"Warning: File {csv_path} is empty.")
+                logger.warning('Warning: File %s is empty.', csv_path)
             except UnicodeDecodeError:
-                print(f"Error: {csv_path} contains invalid encoding.")
+                logger.error('Error: %s contains invalid encoding.', csv_path)
             except Exception as e:
-                print(f"Error loading {csv_path}: {e}")
+                logger.error('Error loading %s: %s', csv_path, e)
 
         # Get image URL
         img_url = submission['image'].get(img_key)
@@ -1031,6 +1562,8 @@ def get_submission_df(submissions_data, submission_num, submission_directory):
     return submission
 
 def show_file_and_img(submission,index=0):
+    from IPython.display import Image, display
+
     # Show the file and image
     for key in submission.keys():
         if key == 'project':
@@ -1061,7 +1594,7 @@ def main(fig, title=None,subtitle=None,title_xy=dict(x=0.1,y=0.9),date_xy=dict(x
          show=True,show_index_and_cols=True,clean_values=False,clean_words=None,dt_index=True,add_the_date=True,groupby=False,groupbyHow='sum',
          date=None,dashed_line=False,annotation_text=None,axis='y1'):
     
-    print(f'save:{save}')
+    logger.debug('save:%s', save)
     
     if clean_values == True:
         fig.clean_values()
@@ -1101,12 +1634,12 @@ def open_json(file_name):
     try:
         with open(file_name, 'r', encoding='utf-8') as file:
             data = json.load(file)
-        print("JSON data loaded successfully!")
-        print(data)  # Print the JSON content (optional)
+        logger.debug('JSON data loaded successfully!')
+        logger.debug('%s', data)  # Print the JSON content (optional)
     except FileNotFoundError:
-        print(f"File {file_name} not found.")
+        logger.error('File %s not found.', file_name)
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
+        logger.error('Error decoding JSON: %s', e)
     return data
 
 
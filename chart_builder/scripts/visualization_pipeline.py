@@ -1,41 +1,32 @@
 import plotly.io as pio
 
-import sys
-# sys.path.append('E:\Projects\ournetwork\chart_builder\scripts')  
 import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Append the pipeline scripts directory to sys.path
-# sys.path.append(os.path.join(current_dir, 'chart_builder', 'scripts'))
-if current_dir not in sys.path:
-    sys.path.append(current_dir)
+from chart_builder.scripts.diagnostics import logger, lazy
+from chart_builder.scripts.render import write_image, write_html, to_webgl, WEBGL_THRESHOLD
 
-print("sys.path:", sys.path)
-print("Current working directory:", os.getcwd())
-print("Current directory:", current_dir)
-# Now you can import data_pipeline
-# from pipeline import data_pipeline  # Adjust the import based on your actual module structure
+logger.debug('Current working directory: %s', lazy(os.getcwd))
+logger.debug('Current directory: %s', current_dir)
 
-from chart_builder.scripts.utils import colors, clean_values, clean_values_dollars, ranked_cleaning, to_percentage, rank_by_col, rank_by_columns, normalize_to_percent, data_processing, top_other_ts_by_col, top_other_ts_by_columns, top_ts_by_col, top_ts_only_by_columns, cleaning, cleaning_values, top_by_col, top_other_by_col,to_time
+from chart_builder.scripts.utils import default_colors, clean_values, clean_values_dollars, ranked_cleaning, to_percentage, rank_by_col, rank_by_columns, normalize_to_percent, data_processing, top_other_ts_by_col, top_other_ts_by_columns, top_ts_by_col, top_ts_only_by_columns, cleaning, cleaning_values, top_by_col, top_other_by_col,to_time, encode_groups
 from chart_builder.scripts.plots import simple_bar_plot, simple_line_plot, sorted_bar_chart, sorted_multi_line, ranked_bar_chart, line_and_bar, pie_chart, datetime_format
+from chart_builder.scripts.incremental import merge_rows, rank_state, append_values
+from chart_builder.scripts.ranking import ranking_scope
+from chart_builder.scripts.ticks import datetime_ticks
+from chart_builder.scripts.frames import share
 
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
-import plotly.express as px
 import plotly.io as pio
 import plotly.offline as pyo
 import plotly.colors as pc
 
 import pandas as pd
-import svgwrite
-import base64
-from io import BytesIO
-
-combined_colors = colors()
 
 class visualization_pipeline():
     def __init__(self,chart_type, title, file=None, df=None,cols_to_plot='All', is_file_path=False, watermark=None,dimensions=dict(height=400,width=730), 
-                 subtitle=None, colors=combined_colors, axes_data=dict(y1=[],y2=[]), axes_titles=dict(y1=None,y2=None),
+                 subtitle=None, colors=None, axes_data=dict(y1=[],y2=[]), axes_titles=dict(y1=None,y2=None),
                   mode='lines',area=False, fill=None,tickprefix=dict(y1=None,y2=None), ticksuffix=dict(y1=None,y2=None),
                   annotation_prefix=None,annotation_suffix=None, legend_orientation='v',show_legend=False, annotations=False, 
                   max_annotation=False,bgcolor='rgba(0,0,0,0)', tickangle=None, legend_placement=dict(x=0.2,y=0.9),
@@ -50,7 +41,7 @@ class visualization_pipeline():
                 set_time_col=False,drop_mid_timefreq=True,agg_func='sum',clean_dates=True,ffill=False,font_family='Cardo',font_color='black',
                 directory='../img',custom_annotation=None,buffer=None,textinfo='percent+label',ytick_num=6,
                 axes_font_colors=dict(y1='black',y2='black'),file_type='svg',texttemplate='%{label}<br>%{percent}',use_single_color=False,
-                days_first=False,autosize=True,legend_background=dict(bgcolor='white',bordercolor='black',
+                days_first=False,autosize=True,cache=False,dtypes=None,csv_engine=None,chunksize=None,downsample=None,render_mode='auto',webgl_threshold=WEBGL_THRESHOLD,validate=True,categorical=True,legend_background=dict(bgcolor='white',bordercolor='black',
                                                                                                     borderwidth=1, itemsizing='constant',
                                                                                                     yanchor="top",xanchor="center" )):
         
@@ -83,7 +74,7 @@ class visualization_pipeline():
 
             # If only y1 data is passed, handle it
             if cols_to_plot is None and axes_data:
-                print(f'Adding axes_data from y1')
+                logger.debug('Adding axes_data from y1')
                 cols_to_plot = axes_data.get('y1', [])  # Default to y1 axis data if available
                 if y2:  # Add y2 data if it's available
                     cols_to_plot += axes_data['y2']
@@ -93,7 +84,7 @@ class visualization_pipeline():
                     'y1': cols_to_plot if cols_to_plot else [],  # Use cols_to_plot if available
                     'y2': []  # Keep y2 as empty unless specified
                 }
-            print(f'Initialized axes_data: {axes_data}')
+            logger.debug('Initialized axes_data: %s', axes_data)
 
             # Proceed with the rest of your logic for plotting...
 
@@ -114,20 +105,21 @@ class visualization_pipeline():
             df = data_processing(path=func_file,file=None,cols=cols_to_plot,turn_to_time=turn_to_time,time_col=time_col,
                              fillna=fillna,keepna=keepna,dropna_col=dropna_col,dropna=dropna,start_date=start_date,end_date=end_date,drop_duplicates=drop_duplicates,
                              resample_freq=resample_freq,set_time_col=set_time_col,drop_mid_timefreq=drop_mid_timefreq,agg_func=agg_func,
-                             to_clean_dates=clean_dates,sort_col=groupby,dayfirst=days_first)
-        else:
-            df=df.copy()
+                             to_clean_dates=clean_dates,sort_col=groupby,dayfirst=days_first,cache=cache,
+                             dtypes=dtypes,csv_engine=csv_engine,chunksize=chunksize,categorical=categorical)
+        elif groupby is not None:
+            df = encode_groups(df, groupby, categorical)
 
         if tick0 == 'min' and turn_to_time==True:
             tick0 = df.index.min()
         else:
             tick0==None
 
-        print(f'tick0: {tick0}')
-        print(f'turn_to_time: {turn_to_time}')
+        logger.debug('tick0: %s', tick0)
+        logger.debug('turn_to_time: %s', turn_to_time)
 
         if groupby is not None:
-            print(f'df sort order at init: {df[groupby].unique()}')
+            logger.debug('df sort order at init: %s', lazy(lambda: df[groupby].unique()))
         
         if cols_to_plot == 'All':
             cols_to_plot = df.columns  # Select all columns
@@ -135,16 +127,21 @@ class visualization_pipeline():
                 axes_data['y1'] = cols_to_plot
 
         if normalize == True:
-            print(f'normalizing...')
+            logger.debug('normalizing...')
             df = normalize_to_percent(df=df,num_col=num_col)
-            print(f'df: {df}')
+            logger.debug('df: %s', df)
                
-        cols_to_plot = list(set(cols_to_plot))
+        # Deduplicated in order: columns in the frame's own order are a view under copy-on-write
+        cols_to_plot = list(dict.fromkeys(cols_to_plot))
+
+        # The chart's own frame: a copy of the plotted columns, or under copy-on-write
+        # a view of them until written to. The input frame is never modified.
+        df = df.loc[:, cols_to_plot]
 
         if to_percent == True:
             if groupby == None:
-                df[cols_to_plot] = df[cols_to_plot] * 100
-            else:
+                df = df * 100
+            elif num_col in df.columns:
                 df[num_col] = df[num_col]*100
 
         if descending == False:
@@ -152,8 +149,7 @@ class visualization_pipeline():
         
         # axes_data['y1'] = cols_to_plot if axes_data.any() # if no specific axis we default plotting cols to y1
 
-        df = df[cols_to_plot]
-        self.df = df.copy()
+        self.df = df
         self.autosize = autosize
         self.legend_background = legend_background
         self.use_single_color=use_single_color
@@ -193,6 +189,11 @@ class visualization_pipeline():
         self.barmode = barmode
         self.mode = mode
         self.colors = colors
+        self.downsample = downsample
+        self.render_mode = render_mode
+        self.webgl_threshold = webgl_threshold
+        self.validate = validate
+        self.categorical = categorical
         self.fill = fill
         self.topn = topn
         self.textinfo = textinfo
@@ -220,6 +221,9 @@ class visualization_pipeline():
         self.plot_orientation = orientation
         self.to_reverse = to_reverse
         self.turn_to_time = turn_to_time
+        self.time_col = time_col
+        self.days_first = days_first
+        self.drop_mid_timefreq = drop_mid_timefreq
         self.connectgaps = connectgaps
         self.auto_title = auto_title
         self.max_annotation = max_annotation
@@ -232,31 +236,207 @@ class visualization_pipeline():
         self.annotation_suffix = annotation_suffix
         self.sort_list = sort_list
         self.buffer = buffer
+        self.to_percent = to_percent
+        self.normalize = normalize
+        # For refresh(): running ranking inputs and the post-build steps to replay
+        self._rank_state = None
+        self._steps = []
+        self._replaying = False
 
     def create_fig(self):
-        print(f'logo path: {self.logo}')
+        logger.debug('logo path: %s', self.logo)
+        if not self._replaying:
+            # A fresh build: forget the title/date/... steps and ranking of the last one
+            self._steps = []
+            self._rank_state = None
+        # Helpers ranking the same frame share one pass, for this build only
+        with ranking_scope():
+            if self.chart_type == 'line':
+                self.line_plot()
+            elif self.chart_type == 'bar':
+                self.bar_plot()
+            elif self.chart_type == 'line and bar':
+                self.line_and_bar_plot()
+            elif self.chart_type == 'pie':
+                self.turn_to_time = False
+                self.pie_plot()
+            elif self.chart_type == 'ranked bar':
+                self.turn_to_time = False
+                # self.group_data()
+                self.ranked_bar_plot()
+
+    def refresh(self, new_rows):
+        """
+        Add new rows to the chart without rerunning the whole pipeline.
+
+        new_rows is a DataFrame shaped like the processed frame (return_df()): a
+        datetime index and the same columns, after any keep_top_n/clean_columns
+        steps. A row replaces an existing one with the same timestamp (and groupby
+        value). Only the tail of the frame from the first new timestamp on is
+        rebuilt, and the ranking totals are updated from that tail.
+
+        When the figure's trace order and colours are unchanged, the existing
+        traces, legend values, x range/ticks and date label are patched in place.
+        Otherwise (order or colour changed, a new series, annotations, text labels,
+        downsampling, custom ticks, or a chart type other than line / line and bar)
+        the figure is rebuilt from the updated frame and the add_title/add_date/...
+        steps applied to it are replayed. Returns the figure.
+        """
+        if new_rows is None or len(new_rows) == 0:
+            return self.fig
+
+        new_rows = self._prepare_rows(new_rows)
+        state = self._rank_state
+        if state is None:
+            state = self._rank_state = rank_state(self.df, groupby=self.groupby, num_col=self.num_col)
+
+        keys = self._trace_keys() if self.fig is not None else []
+        old_legend = {key: self._legend_text(key) for key in keys if key is not None}
+        old_last = state.last
+
+        merged, old_tail, new_tail = merge_rows(self.df, new_rows, groupby=self.groupby)
+        self.df = merged
+        state.update(merged, old_tail, new_tail)
+
+        if self.fig is None:
+            return None
+
+        reason = self._patch_blocker(keys)
+        if reason is None:
+            self._patch_fig(keys, old_legend, old_last, old_tail, new_tail)
+            logger.debug('refresh: patched %s traces with %s rows', len(keys), len(new_tail))
+        else:
+            logger.debug('refresh: rebuilding the figure (%s)', reason)
+            self._replaying = True
+            try:
+                self.create_fig()
+                for name, kwargs in self._steps:
+                    getattr(self, name)(**kwargs)
+            finally:
+                self._replaying = False
+        return self.fig
+
+    def _prepare_rows(self, new_rows):
+        # Bring raw appended rows into the shape of self.df
+        new_rows = new_rows.copy()
+        if self.turn_to_time and not isinstance(new_rows.index, pd.DatetimeIndex):
+            new_rows, _ = to_time(new_rows, time_col=self.time_col, dayfirst=self.days_first,
+                                  drop_mid_timefreq=self.drop_mid_timefreq)
+        new_rows = new_rows.reindex(columns=self.df.columns)
+        if self.normalize:
+            new_rows = normalize_to_percent(df=new_rows, num_col=self.num_col)
+        if self.to_percent:
+            if self.groupby is None:
+                new_rows[list(self.df.columns)] = new_rows[list(self.df.columns)] * 100
+            else:
+                new_rows[self.num_col] = new_rows[self.num_col] * 100
+        return new_rows
+
+    def _remember_step(self, name, **kwargs):
+        # Post-build steps (title, date, ...) that refresh() replays on a rebuilt figure
+        if not self._replaying:
+            self._steps.append((name, kwargs))
+
+    def _trace_keys(self):
+        # Series behind each trace, read back from its '<key> (<value>)' legend name
+        candidates = self._rank_state.totals.index if self.groupby is not None else self.df.columns
+        candidates = sorted(candidates, key=lambda key: len(str(key)), reverse=True)
+        keys = []
+        for trace in self.fig.data:
+            name = trace.name or ''
+            keys.append(next((key for key in candidates if name.startswith(f'{key} (')), None))
+        return keys
+
+    def _legend_text(self, key):
+        # The value a legend name shows for a series, formatted as the plots do
+        state = self._rank_state
+        if self.groupby is not None and key not in state.present:
+            return '0'
+        return str(clean_values(state.latest[key], decimals=self.decimals, decimal_places=self.decimal_places))
+
+    def _expected_traces(self):
+        # (key, colour) of every trace a fresh build would draw, in order, from the rank state
+        state = self._rank_state
+        colors = default_colors() if self.colors is None else self.colors
+
+        if self.groupby is None:
+            if self.sort_list:
+                color_order = state.cumulative_order(descending=True)
+                plot_order = state.latest_order(descending=self.descending)
+            else:
+                color_order = plot_order = list(self.df.columns)
+            color_map = {col: colors[idx % len(colors)] for idx, col in enumerate(color_order)}
+            y2 = list(self.axes_data['y2'] or [])
+            y1 = [col for col in self.axes_data['y1'] if col not in y2]
+            order = [col for col in plot_order if col in y1] + [col for col in plot_order if col in y2]
+        else:
+            order = state.latest_order(descending=self.descending)
+            color_order = state.cumulative_order(descending=self.descending) if self.cumulative_sort else order
+            if not self.descending:
+                color_order = color_order[::-1]
+            color_map = {key: colors[idx % len(colors)] for idx, key in enumerate(color_order)}
+        return [(key, color_map.get(key)) for key in order]
+
+    def _patch_blocker(self, keys):
+        # Why the figure can't be patched in place, or None if it can
+        if self.chart_type not in ('line', 'line and bar'):
+            return f'chart type {self.chart_type}'
+        if self.downsample or self.text or self.annotations or self.max_annotation or self.custom_annotation or self.custom_ticks:
+            return 'annotations, text labels, downsampling or custom ticks'
+        if not isinstance(self.df.index, pd.DatetimeIndex):
+            return 'not a datetime index'
+        if None in keys:
+            return 'unrecognised traces'
+        if self.groupby is not None and len(keys) != len(self._rank_state.totals):
+            return 'new series'
         if self.chart_type == 'line':
-            self.line_plot()
-        elif self.chart_type == 'bar':
-            self.bar_plot()
-        elif self.chart_type == 'line and bar':
-            self.line_and_bar_plot()
-        elif self.chart_type == 'pie':
-            self.turn_to_time = False
-            self.pie_plot()
-        elif self.chart_type == 'ranked bar':
-            self.turn_to_time = False
-            # self.group_data()
-            self.ranked_bar_plot()
+            actual = [(key, trace.line.color) for key, trace in zip(keys, self.fig.data)]
+            if actual != self._expected_traces():
+                return 'trace order or colours changed'
+        return None
+
+    def _patch_fig(self, keys, old_legend, old_last, old_tail, new_tail):
+        state = self._rank_state
+        with self.fig.batch_update():
+            for key, trace in zip(keys, self.fig.data):
+                if self.groupby is None:
+                    replaced, rows = len(old_tail), new_tail
+                    values = rows[key]
+                else:
+                    replaced = int((old_tail[self.groupby] == key).sum())
+                    rows = new_tail[new_tail[self.groupby] == key]
+                    values = rows[self.num_col]
+                keep = len(trace.x) - replaced
+                trace.x = append_values(trace.x, rows.index.values, keep)
+                trace.y = append_values(trace.y, values.to_numpy(), keep)
+
+                prefix = f'{key} ('
+                trace.name = prefix + trace.name[len(prefix):].replace(old_legend[key], self._legend_text(key), 1)
+
+            shift = state.last - old_last
+            xaxis = self.fig.layout.xaxis
+            if xaxis.range is not None and shift:
+                xaxis.range = [xaxis.range[0], pd.Timestamp(xaxis.range[1]) + shift]
+            if xaxis.tickvals is not None:
+                xaxis.tickvals = datetime_ticks(self.df.index, freq=state.freq, width=self.dimensions['width'])
+
+            # The add_date label, if it shows the last timestamp
+            old_date, new_date = old_last.strftime(datetime_format), state.last.strftime(datetime_format)
+            for annotation in self.fig.layout.annotations:
+                if annotation.text == old_date:
+                    annotation.text = new_date
 
     def return_df(self):
-        return self.df.copy()
+        # Free under copy-on-write; a full copy otherwise
+        return share(self.df)
     
     def show_fig(self,browser=False):
+        # Interactive output only: large line/scatter traces switch to WebGL per render_mode
+        fig = to_webgl(self.fig, render_mode=self.render_mode, threshold=self.webgl_threshold)
         if browser==False:
-            pyo.iplot(self.fig)
+            pyo.iplot(fig)
         else:
-            pyo.plot(self.fig, filename=f'{self.title}.html',auto_open=True)
+            pyo.plot(fig, filename=f'{self.title}.html',auto_open=True)
     
     def clean_columns(self, capwords=None, clean_words=None):
         # Extract y1 and y2 lists from axes_data
@@ -287,11 +467,12 @@ class visualization_pipeline():
         self.df = cleaning_values(df=self.df)
 
     def show_index_and_cols(self):
+        # Display helper for main(show_index_and_cols=True), so it prints rather than logs
         return print(f'Columns: {self.df.columns} \nIndex: {self.df.index}')
     
     def keep_top_n(self, topn=None, other=True):
-        print(f'topn: {topn}')
-        print(f'other: {other}')
+        logger.debug('topn: %s', topn)
+        logger.debug('other: %s', other)
         if topn != None:
             self.topn = topn
         if self.turn_to_time == False:
@@ -319,11 +500,11 @@ class visualization_pipeline():
                 if isinstance(self.axes_data['y1'], list):
                     self.axes_data['y1'].append('Other')
                     
-                print(f'self.axes_data: {self.axes_data["y1"]}')
+                logger.debug('self.axes_data: %s', self.axes_data['y1'])
 
                 self.cols_to_plot.append('Other')
 
-                print(f'self.cols_to_plot: {self.cols_to_plot}')
+                logger.debug('self.cols_to_plot: %s', self.cols_to_plot)
                 
             else:
                 if self.groupby == None:
@@ -332,15 +513,15 @@ class visualization_pipeline():
                     self.df = top_ts_by_col(df=self.df, num_col=self.num_col, sort_col=self.groupby, topn=self.topn)
             
 
-        print(f'df after: {self.df}')
+        logger.debug('df after: %s', self.df)
 
     def line_plot(self):
-        print("Generating line plot...")
-        print(f'axes titles at viz pipeline: {self.axes_titles}')
+        logger.debug('Generating line plot...')
+        logger.debug('axes titles at viz pipeline: %s', self.axes_titles)
         if self.groupby == None:
-            print(f'No GroupBy Col')
-            print(f'cols to plot: {self.cols_to_plot}')
-            print(f'axes data to plot: {self.axes_data}')
+            logger.debug('No GroupBy Col')
+            logger.debug('cols to plot: %s', self.cols_to_plot)
+            logger.debug('axes data to plot: %s', self.axes_data)
             
             y1_columns = self.axes_data['y1']
             y2_columns = self.axes_data['y2']
@@ -359,12 +540,13 @@ class visualization_pipeline():
                                 remove_zero=self.remove_zero, custom_ticks=self.custom_ticks,font_family=self.font_family,font_color=self.font_color,directory=self.directory,colors=self.colors,
                                 custom_annotation=self.custom_annotation,ytick_num=self.ytick_num,axes_font_colors=self.axes_font_colors,
                                 auto_title=self.auto_title,file_type = self.file_type,buffer=self.buffer,cumulative_sort=self.cumulative_sort,marker_size=self.marker_size,line_width=self.line_width,
-                                sort_list=self.sort_list,datetime_tick=self.datetime_tick,autosize=self.autosize,legend_background=self.legend_background, font_size=self.font_size)
+                                sort_list=self.sort_list,datetime_tick=self.datetime_tick,autosize=self.autosize,legend_background=self.legend_background, font_size=self.font_size,
+                                downsample=self.downsample)
             self.fig = fig
             return fig
         else:
 
-            print(f'GroupBy Col: {self.groupby}')
+            logger.debug('GroupBy Col: %s', self.groupby)
             fig = sorted_multi_line(df=self.df, title=self.title,col=self.num_col, sort_col=self.groupby,area=self.area,legend_orientation=self.legend_orientation,
                                     legend_placement=self.legend_placement,margin=self.margin,
                                     dtick=self.dtick,mode=self.mode, tickprefix=self.tick_prefix['y1'],
@@ -372,15 +554,16 @@ class visualization_pipeline():
                                     connectgaps=self.connectgaps,descending=self.descending,traceorder=self.traceorder,tickangle=self.tickangle, show_legend=self.show_legend,tick0=self.tick0
                                     ,remove_zero=self.remove_zero, custom_ticks=self.custom_ticks,font_family=self.font_family,font_color=self.font_color,directory=self.directory,colors=self.colors
                                     ,custom_annotation=self.custom_annotation,decimal_places=self.decimal_places,decimals=self.decimals,file_type = self.file_type,cumulative_sort=self.cumulative_sort,
-                                    marker_size=self.marker_size,line_width=self.line_width, font_size=self.font_size,legend_background=self.legend_background)
+                                    marker_size=self.marker_size,line_width=self.line_width, font_size=self.font_size,legend_background=self.legend_background,
+                                    downsample=self.downsample,validate=self.validate)
             self.fig = fig
             return fig
 
     def bar_plot(self):
-        print("Generating bar plot...")
+        logger.debug('Generating bar plot...')
         if self.groupby == None:
-            print(f'No GroupBy Col')
-            print(f'auto_title: {self.auto_title}')
+            logger.debug('No GroupBy Col')
+            logger.debug('auto_title: %s', self.auto_title)
    
             fig = simple_bar_plot(df=self.df, title=self.title, annotations=self.annotations, show_legend=self.show_legend,
                                 legend_orientation=self.legend_orientation,
@@ -396,7 +579,7 @@ class visualization_pipeline():
             self.fig = fig
             return fig
         else:
-            print(f'GroupBy Col: {self.groupby}')
+            logger.debug('GroupBy Col: %s', self.groupby)
             # sorted_bar_chart(df, title, save=False, combined_colors=combined_colors, col=None, sort_col=None, sort_list=True,
             #         tickprefix=None, ticksuffix=None, font_size=18,
             #         bgcolor='rgba(0,0,0,0)', legend_orientation='h', bar_orientation='v', tickangle=None,
@@ -404,7 +587,7 @@ class visualization_pipeline():
             #         tickformat=None,legend_placement=dict(x=0.01,y=1.1),legend_font_size=16,decimal_places=1,
             #         barmode='stack',dimensions=dict(width=730,height=400)):
 
-            print(f'legend_orientation: {self.legend_orientation}')
+            logger.debug('legend_orientation: %s', self.legend_orientation)
 
             fig = sorted_bar_chart(df=self.df, title=self.title,col=self.num_col, sort_col=self.groupby,legend_orientation=self.legend_orientation,
                                     legend_placement=self.legend_placement,margin=self.margin,
@@ -413,27 +596,28 @@ class visualization_pipeline():
                                     dimensions=self.dimensions,descending=self.descending,traceorder=self.traceorder,tickangle=self.tickangle,colors=self.colors,
                                      show_legend=self.show_legend,tick0=self.tick0,remove_zero=self.remove_zero, custom_ticks=self.custom_ticks,font_family=self.font_family,font_color=self.font_color,directory=self.directory,
                                 custom_annotation=self.custom_annotation,decimal_places=self.decimal_places,decimals=self.decimals,buffer=self.buffer,ytick_num=self.ytick_num,
-                                  file_type = self.file_type,cumulative_sort=self.cumulative_sort,text=self.text,text_freq=self.text_freq, text_position=self.textposition,text_font_size=self.text_font_size,autosize=self.autosize,legend_background=self.legend_background,font_size=self.font_size)
+                                  file_type = self.file_type,cumulative_sort=self.cumulative_sort,text=self.text,text_freq=self.text_freq, text_position=self.textposition,text_font_size=self.text_font_size,autosize=self.autosize,legend_background=self.legend_background,font_size=self.font_size,validate=self.validate)
             self.fig = fig
             return fig
     
     def line_and_bar_plot(self):
-        print("Generating line and bar plot...")
+        logger.debug('Generating line and bar plot...')
 
-        print(f'axes titles: {self.axes_titles}')
+        logger.debug('axes titles: %s', self.axes_titles)
 
         fig = line_and_bar(df=self.df,title=self.title,y2_axis=self.y2,bar_col=self.bar_col,line_col=self.line_col,
                            axes_title=self.axes_titles, tickprefix=self.tick_prefix,ticksuffix=self.ticksuffix,dimensions=self.dimensions,
                            margin=self.margin,auto_title=self.auto_title,tickformat=self.tickformat,barmode=self.barmode,tickangle=self.tickangle, fill=self.fill,
                            area=self.area,colors = self.colors,tick0=self.tick0,dtick=self.dtick,remove_zero=self.remove_zero, custom_ticks=self.custom_ticks,font_family=self.font_family,font_color=self.font_color,directory=self.directory,
                            custom_annotation=self.custom_annotation,decimal_places=self.decimal_places,decimals=self.decimals,buffer=self.buffer,ytick_num=self.ytick_num,file_type = self.file_type,show_legend=self.show_legend,axes_font_colors=self.axes_font_colors,
-                           legend_placement=self.legend_placement,line_color=self.line_color,bgcolor=self.bgcolor,autosize=self.autosize,legend_background=self.legend_background,legend_font_size=self.legend_font_size, font_size=self.font_size,mode=self.mode)
+                           legend_placement=self.legend_placement,line_color=self.line_color,bgcolor=self.bgcolor,autosize=self.autosize,legend_background=self.legend_background,legend_font_size=self.legend_font_size, font_size=self.font_size,mode=self.mode,
+                           downsample=self.downsample)
         self.fig = fig
         return fig
     
     def pie_plot(self):
-        print('Generating pie chart...')
-        print(f'self.textinfo: {self.textinfo}')
+        logger.debug('Generating pie chart...')
+        logger.debug('self.textinfo: %s', self.textinfo)
         # def pie_chart(df, sum_col, index_col, title, save=False,colors=combined_colors,bgcolor='rgba(0,0,0,0)',annotation_prefix="$", annotation_font_size=25,
         #       decimals=True,legend_font_size=16,font_size=18, legend_placement=dict(x=0.01,y=1.1),margin=dict(l=0, r=0, t=0, b=0),hole_size=.6,line_width=0,
         #       legend_orientation='v',decimal_places=1,itemsizing='constant',dimensions=dict(width=730,height=400)):
@@ -448,26 +632,26 @@ class visualization_pipeline():
         return fig
 
     def ranked_bar_plot(self):
-        print("Generating ranked bar plot...")
-        print(f'sort_list vis pipe: {self.sort_list}')
-        print(f'df sort order before ranked bar funct: {self.df[self.groupby].unique()}')
+        logger.debug('Generating ranked bar plot...')
+        logger.debug('sort_list vis pipe: %s', self.sort_list)
+        logger.debug('df sort order before ranked bar funct: %s', lazy(lambda: self.df[self.groupby].unique()))
         fig = ranked_bar_chart(df=self.df,title=self.title, col=self.num_col, sort_col=self.groupby,
                      tickprefix=self.tick_prefix['y1'], ticksuffix=self.ticksuffix['y1'],
                      bgcolor=self.bgcolor, legend_orientation=self.legend_orientation, tickangle=self.tickangle, textposition=self.textposition, orientation=self.plot_orientation,
                      legend_placement=self.legend_placement, minsize=self.text_font_size, legend_font_size=self.legend_font_size,margin=self.margin,showlegend=self.show_legend,
                      decimals=self.decimals,traceorder=self.traceorder,decimal_places=self.decimal_places, to_reverse=self.to_reverse,
                      tickformat=self.tickformat['y1'],dimensions=self.dimensions,descending=self.descending,use_sort_list=self.sort_list,show_text=self.text,font_family=self.font_family,font_color=self.font_color
-                    ,directory=self.directory,colors=self.colors,file_type = self.file_type,use_single_color=self.use_single_color, font_size=self.font_size)
+                    ,directory=self.directory,colors=self.colors,file_type = self.file_type,use_single_color=self.use_single_color, font_size=self.font_size,validate=self.validate)
         self.fig = fig
         return fig
 
     def save_fig(self, filetype='svg'):
         """Believe it saves to local img directory where this is being accessed"""
-        print(f'../img/{self.title}.{filetype}')
+        logger.debug('../img/%s.%s', self.title, filetype)
         if filetype != 'html':
-            self.fig.write_image(f'../img/{self.title}.{filetype}', engine="kaleido")
+            write_image(self.fig, f'../img/{self.title}.{filetype}')
         else:
-            self.fig.write_html(f'../img/{self.title}.html', engine="kaleido")
+            write_html(self.fig, f'../img/{self.title}.html', render_mode=self.render_mode, threshold=self.webgl_threshold)
 
     def return_fig(self):
         # Check if self.fig is a Plotly Figure
@@ -477,39 +661,40 @@ class visualization_pipeline():
             raise ValueError("The fig is not a valid Plotly Figure object.")
 
     def group_data(self,how='sum'):
-        print(f'grouping by {self.groupby}... w/ {how}')
+        logger.debug('grouping by %s... w/ %s', self.groupby, how)
         if self.turn_to_time == False:
             if how == 'sum':
-                self.df =  self.df.groupby(self.groupby)[self.num_col].sum().reset_index().sort_values(by=self.num_col,ascending=True)
-                print(f'{self.df}')
+                self.df =  self.df.groupby(self.groupby, observed=True)[self.num_col].sum().reset_index().sort_values(by=self.num_col,ascending=True)
+                logger.debug('%s', self.df)
             elif how == 'mean':
-                self.df = self.df.groupby(self.groupby)[self.num_col].mean().reset_index().sort_values(by=self.num_col,ascending=True)
+                self.df = self.df.groupby(self.groupby, observed=True)[self.num_col].mean().reset_index().sort_values(by=self.num_col,ascending=True)
             elif how == 'median':
-                self.df = self.df.groupby(self.groupby)[self.num_col].median().reset_index().sort_values(by=self.num_col,ascending=True)
+                self.df = self.df.groupby(self.groupby, observed=True)[self.num_col].median().reset_index().sort_values(by=self.num_col,ascending=True)
             elif how == 'last':
-                self.df = self.df.groupby(self.groupby)[self.num_col].last().reset_index().sort_values(by=self.num_col,ascending=True)
-                print(f'{self.df}')
+                self.df = self.df.groupby(self.groupby, observed=True)[self.num_col].last().reset_index().sort_values(by=self.num_col,ascending=True)
+                logger.debug('%s', self.df)
             elif how == 'first':
-                self.df = self.df.groupby(self.groupby)[self.num_col].first().reset_index().sort_values(by=self.num_col,ascending=True)
-                print(f'{self.df}')
+                self.df = self.df.groupby(self.groupby, observed=True)[self.num_col].first().reset_index().sort_values(by=self.num_col,ascending=True)
+                logger.debug('%s', self.df)
         else:
             if how == 'sum':
-                self.df = self.df.groupby([self.df.index,self.groupby])[[self.num_col]].sum().reset_index().sort_values(by=self.num_col,ascending=True)
+                self.df = self.df.groupby([self.df.index,self.groupby], observed=True)[[self.num_col]].sum().reset_index().sort_values(by=self.num_col,ascending=True)
                 self.df = to_time(self.df)
                 self.df = self.df[0]
-                print(f'self.df @ groupby: {self.df}')
+                logger.debug('self.df @ groupby: %s', self.df)
             elif how == 'mean':
                 self.df = self.df.groupby(self.df.index)[self.num_col].mean().reset_index().sort_values(by=self.num_col,ascending=True)
             elif how == 'median':
                 self.df = self.df.groupby(self.df.index)[self.num_col].median().reset_index().sort_values(by=self.num_col,ascending=True)
             elif how == 'last':
                 self.df = self.df.groupby(self.df.index)[self.num_col].last().reset_index().sort_values(by=self.num_col,ascending=True)
-                print(f'{self.df}')
+                logger.debug('%s', self.df)
             elif how == 'first':
                 self.df = self.df.groupby(self.df.index)[self.num_col].first().reset_index().sort_values(by=self.num_col,ascending=True)
-                print(f'{self.df}')
+                logger.debug('%s', self.df)
 
     def add_title(self,title=None,subtitle=None, x=None, y=None):
+        self._remember_step('add_title', title=title, subtitle=subtitle, x=x, y=y)
         # Add a title and subtitle
         if not hasattr(self, 'title_position') or self.title_position is None:
             self.title_position = {'x': None, 'y': None}
@@ -546,6 +731,7 @@ class visualization_pipeline():
         )
 
     def add_watermark(self):
+        self._remember_step('add_watermark')
         self.fig.add_layout_image(
             dict(
                 source=self.watermark,
@@ -563,12 +749,13 @@ class visualization_pipeline():
         )
 
     def add_dashed_line(self, date, annotation_text):
+        self._remember_step('add_dashed_line', date=date, annotation_text=annotation_text)
         # Ensure the date matches the index type
         if self.df.index.dtype == 'datetime64[ns]':
             date = pd.to_datetime(date)
 
         if date not in self.df.index:
-            print(f"Error: {date} is not in the DataFrame index.")
+            logger.error('Error: %s is not in the DataFrame index.', date)
             return
 
         # Validate number_col
@@ -579,7 +766,7 @@ class visualization_pipeline():
             # Validate cols_to_plot
             for col in self.cols_to_plot:
                 if col not in self.df.columns:
-                    print(f"Error: {col} is not in DataFrame columns.")
+                    logger.error('Error: %s is not in DataFrame columns.', col)
                     return
 
             self.df['max_value'] = self.df[self.cols_to_plot].max(axis=1)
@@ -589,13 +776,13 @@ class visualization_pipeline():
 
         # Validate column and calculate value
         if number_col not in self.df.columns:
-            print(f"Error: {number_col} is not a valid column in the DataFrame.")
+            logger.error('Error: %s is not a valid column in the DataFrame.', number_col)
             return
 
         # import pdb; pdb.set_trace()
 
         if pd.isna(yvalue):
-            print(f"Warning: Missing value at {date} for {number_col}.")
+            logger.warning('Warning: Missing value at %s for %s.', date, number_col)
             return
 
         # Add the dashed line and annotation
@@ -620,6 +807,7 @@ class visualization_pipeline():
 
 
     def add_logo(self):
+        self._remember_step('add_logo')
         # Set the logo as a layout image
         self.fig.update_layout(
             images=[
@@ -640,6 +828,7 @@ class visualization_pipeline():
         )
 
     def add_horizontal_line_below_plot(self, y_value=-0.1, image_width=1):
+        self._remember_step('add_horizontal_line_below_plot', y_value=y_value, image_width=image_width)
         # Add a horizontal line below the plot area
         self.fig.add_shape(
             type="line",
@@ -657,6 +846,7 @@ class visualization_pipeline():
         )
 
     def add_date(self,date=None,x=0.5,y=1.1,dt_index=True):
+        self._remember_step('add_date', date=date, x=x, y=y, dt_index=dt_index)
         if not hasattr(self, 'date_position') or self.date_position is None:
             self.date_position = {'x': None, 'y': None}
 
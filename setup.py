@@ -15,11 +15,11 @@ setup(
         "numpy",
         "plotly",
         "kaleido",
-        "svgwrite",                # Only keep necessary dependencies
-        "python-dotenv",
-        "colorcet",
-        "matplotlib"
+        "python-dotenv"
     ],
+    extras_require={
+        "arrow": ["pyarrow"],      # Parquet/Feather/Arrow IPC inputs and the on-disk data cache
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
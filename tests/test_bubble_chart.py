@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from chart_builder.scripts.plots import bubble_chart
+from chart_builder.scripts.utils import encode_groups
+
+def test_bubble_chart_categorical_groups_with_nan():
+    # Grouping columns are Categoricals by default; a NaN value must not try to fill them with 0
+    df = pd.DataFrame({'chain': ['a', 'b', 'c', 'd', 'e'],
+                       'tvl': [1e10, np.nan, 3e10, 4e10, 2e10]})
+    df = encode_groups(df, ['chain'])
+    assert isinstance(df['chain'].dtype, pd.CategoricalDtype)
+
+    fig = bubble_chart(df, 'chain', 'tvl')
+
+    labels = [label for trace in fig.data if trace.text is not None for label in trace.text]
+    assert len(labels) == 4
+    assert all('text' in trace.mode for trace in fig.data if trace.text is not None)
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from chart_builder.scripts.visualization_pipeline import visualization_pipeline
+
+def _long_frame(n=60):
+    rng = np.random.default_rng(0)
+    idx = pd.date_range('2024-01-01', periods=n, freq='D')
+    wide = pd.DataFrame({'a': rng.random(n) * 10 + 50, 'b': rng.random(n) * 10 + 20,
+                         'c': rng.random(n)}, index=idx)
+    long = wide.rename_axis('date').reset_index().melt(id_vars='date', var_name='g', value_name='v')
+    return long.set_index('date').sort_index(kind='stable')
+
+def _build(df):
+    pipeline = visualization_pipeline(chart_type='line', title='t', df=df, groupby='g', num_col='v')
+    pipeline.create_fig()
+    pipeline.add_title(title='T', subtitle='s')
+    return pipeline
+
+def test_refresh_with_raw_rows():
+    long = _long_frame()
+    base, new = long.iloc[:-6], long.iloc[-6:]
+
+    pipeline = _build(base.copy())
+    # Raw rows as read from a source: the time column is not the index yet
+    raw = new.reset_index()
+    raw['date'] = raw['date'].dt.strftime('%Y-%m-%d')
+    fig = pipeline.refresh(raw)
+
+    full = _build(long.copy())
+    assert len(pipeline.df) == len(full.df)
+    assert isinstance(pipeline.df.index, pd.DatetimeIndex)
+    assert pipeline.df.index.max() == long.index.max()
+    assert fig.to_json() == full.fig.to_json()